@@ -0,0 +1,36 @@
+import sys
+import os
+import timeit
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_templates
+
+# Mede o custo de renderização dos e-mails com os templates pré-compilados
+
+def make_plcs(count):
+    return [
+        SimpleNamespace(
+            plc_name=str(20 + i), main_value=123456 + i, total_cups=9876543 + i, feed_value=1.2345,
+            status='PROGRAMADA' if i % 5 == 0 else 'ATIVO', bobina_saida=f"B{i}", bobina_consumida=f"C{i}",
+            size='269ml', update_time='17/10/2026 10:00:00'
+        )
+        for i in range(count)
+    ]
+
+def bench(label, func, number=200):
+    total = timeit.timeit(func, number=number)
+    print(f"{label:<40} {total / number * 1000:8.3f} ms/render")
+
+if __name__ == "__main__":
+    config = {'plc_config': {'ip_address': '10.0.0.1'}, 'tag_config': {'lote_tag': 'LOTE'}}
+    for count in (2, 20, 200):
+        plcs = make_plcs(count)
+        lotes = {f"Cupper_{p.plc_name}": f"L{p.plc_name}" for p in plcs}
+        bench(f"format_production_report ({count} PLCs)", lambda: email_templates.format_production_report(plcs, lotes))
+    bench("format_lote_notification", lambda: email_templates.format_lote_notification('123456', 'Cupper_22', config), 2000)
+    bench("format_late_lot_alert", lambda: email_templates.format_late_lot_alert('Cupper_22', 'L1'), 2000)
+    bench("format_feed_unknown_alert_email",
+          lambda: email_templates.format_feed_unknown_alert_email('22', 1.5, 'L1', 'B1', '17/10/2026 10:00:00'), 2000)
+    bench("format_plc_error_message", lambda: email_templates.format_plc_error_message('22', 'Timeout'), 2000)
@@ -0,0 +1,98 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plc_handler
+from plc_handler import PLCHandler
+from src.database_handler import DatabaseHandler
+from src.db_connection import connection_manager
+from timezone_utils import SAO_PAULO_TZ
+
+CONFIG = {
+    'plc_config': {'ip_address': '127.0.0.1', 'processor_slot': 0},
+    'tag_config': {'feed_tag': 'Feed', 'bobina_tag': 'Bobina'},
+    'connection_config': {},
+    'cup_size_config': {'tolerance': 0.1, 'sizes': {'350ml': 10.0}},
+}
+
+class FakeResponse:
+    def __init__(self, tag, value):
+        self.TagName = tag
+        self.Value = value
+        self.Status = "Success"
+
+class FakePLC:
+    """Devolve os valores de tag definidos pelo teste a cada leitura."""
+    def __init__(self):
+        self.values = {}
+
+    def Read(self, tags):
+        return [FakeResponse(tag, self.values[tag]) for tag in tags]
+
+class TestCoilShiftBreakdown(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Banco temporário: o DB_FILE de produção nunca é tocado
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.original_db_file = connection_manager.db_file
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = os.path.join(cls.tmp_dir, "test_coil.db")
+        DatabaseHandler.init_db()
+
+    @classmethod
+    def tearDownClass(cls):
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = cls.original_db_file
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def setUp(self):
+        self.handler = PLCHandler(CONFIG, "PRENSA_TESTE", None, None, None)
+        self.handler.plc = FakePLC()
+        self.handler.connected = True
+
+    def cycle(self, stroke, shift, trigger=0, tool_size=2.5):
+        self.handler.plc.values = {
+            'IGN_Total_Stroke_Counter': stroke, 'IGN_Tool_Size': tool_size,
+            'Feed': 10.0, 'Bobina': 2, 'Coil_change': trigger,
+        }
+        now = SAO_PAULO_TZ.localize(datetime(2026, 3, 10, 12, 0, 0))
+        with mock.patch.object(plc_handler, "get_current_shift", return_value=shift), \
+             mock.patch.object(plc_handler, "get_current_sao_paulo_time", return_value=now):
+            self.handler.process_plc_data()
+
+    def test_breakdown_sums_to_consumed_quantity(self):
+        # 7 + 9 + 5 golpes x 2.5: truncar cada trecho (17 + 22 + 12 = 51) perderia copos frente a int(21 x 2.5) = 52
+        self.handler.current_shift_tracker = "A"
+        self.cycle(1000, "A")
+        self.cycle(1007, "B")
+        self.cycle(1016, "C")
+        self.cycle(1021, "C", trigger=1)
+
+        with DatabaseHandler._get_connection() as conn:
+            coil = conn.execute(
+                "SELECT id, consumed_quantity FROM coil_consumption_lot WHERE machine_name = ? ORDER BY id DESC LIMIT 1",
+                ("PRENSA_TESTE",)).fetchone()
+        self.assertEqual(coil['consumed_quantity'], 52)
+
+        breakdown = DatabaseHandler.get_stored_shift_breakdowns([coil['id']])[coil['id']]
+        self.assertEqual([b['shift'] for b in breakdown], ["A", "B", "C"])
+        self.assertEqual(sum(b['total_cups'] for b in breakdown), coil['consumed_quantity'])
+        self.assertEqual(self.handler.coil_shift_segments, [])
+
+    def test_conversion_keeps_per_segment_values_close(self):
+        self.handler.shift_segment_date = datetime(2026, 3, 10).date()
+        for shift, strokes in (("A", 3), ("B", 3), ("A", 3)):
+            self.handler._add_coil_shift_segment(shift, strokes)
+        breakdown = self.handler._coil_shift_breakdown(1.5, int(9 * 1.5))
+        # Trechos repetidos do mesmo turno/dia são agrupados
+        self.assertEqual([(b['shift'], b['total_cups']) for b in breakdown], [("A", 9), ("B", 4)])
+        self.assertEqual(sum(b['total_cups'] for b in breakdown), 13)
+
+if __name__ == "__main__":
+    unittest.main()
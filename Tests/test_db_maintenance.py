@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db_maintenance as maintenance_module
+from src.db_maintenance import DatabaseMaintenance
+from timezone_utils import SAO_PAULO_TZ
+
+STATS = {"wal_bytes": 128 * 1024 * 1024, "auto_vacuum": "INCREMENTAL", "freelist_pages": 0, "page_size": 4096}
+
+def at_hour(hour):
+    return mock.patch.object(maintenance_module, "get_current_sao_paulo_time",
+                             return_value=SAO_PAULO_TZ.localize(datetime(2026, 3, 10, hour, 0)))
+
+class TestWalCheckpoint(unittest.TestCase):
+    """Checkpoint agendado: só PASSIVE; TRUNCATE apenas com frames pendentes, na janela ociosa ou manual."""
+    def setUp(self):
+        self.modes = []
+        self.passive = {"busy": False, "wal_pages": 1000, "checkpointed_pages": 1000}
+
+        def wal_checkpoint(mode="PASSIVE"):
+            self.modes.append(mode)
+            return dict(self.passive) if mode == "PASSIVE" else {"busy": False, "wal_pages": 0, "checkpointed_pages": 0}
+
+        for patcher in (
+            mock.patch.object(maintenance_module.DatabaseHandler, "wal_checkpoint", side_effect=wal_checkpoint),
+            mock.patch.object(maintenance_module.DatabaseHandler, "get_storage_stats", return_value=dict(STATS)),
+            mock.patch.object(maintenance_module, "DB_MAINT_IDLE_HOURS", "2-5"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.maintenance = DatabaseMaintenance()
+
+    def test_scheduled_checkpoint_is_passive_during_production(self):
+        self.passive.update(checkpointed_pages=600)  # Leitor ativo deixou frames para trás
+        with at_hour(14):
+            self.maintenance.run_due()
+        self.assertEqual(self.modes, ["PASSIVE"])
+        self.assertEqual(self.maintenance.tasks["checkpoint"]["last_result"]["mode"], "PASSIVE")
+
+    def test_complete_passive_is_never_escalated(self):
+        with at_hour(3):
+            self.maintenance.run_due()
+        self.maintenance.run_task("checkpoint", manual=True)
+        self.assertEqual(self.modes, ["PASSIVE", "PASSIVE"])
+
+    def test_frames_left_behind_escalate_in_idle_hours(self):
+        self.passive.update(checkpointed_pages=600)
+        with at_hour(3):
+            self.maintenance.run_due()
+        self.assertEqual(self.modes, ["PASSIVE", "TRUNCATE"])
+        self.assertEqual(self.maintenance.tasks["checkpoint"]["last_result"]["mode"], "PASSIVE+TRUNCATE")
+
+    def test_admin_request_escalates_at_any_hour(self):
+        self.passive.update(checkpointed_pages=600)
+        with at_hour(14):
+            self.maintenance.run_task("checkpoint", manual=True)
+        self.assertEqual(self.modes, ["PASSIVE", "TRUNCATE"])
+
+    def test_idle_window_can_cross_midnight(self):
+        with mock.patch.object(maintenance_module, "DB_MAINT_IDLE_HOURS", "22-4"):
+            for hour, expected in ((23, True), (1, True), (4, False), (12, False)):
+                with at_hour(hour):
+                    self.assertEqual(DatabaseMaintenance._in_idle_hours(), expected, hour)
+        with mock.patch.object(maintenance_module, "DB_MAINT_IDLE_HOURS", ""), at_hour(3):
+            self.assertFalse(DatabaseMaintenance._in_idle_hours())
+
+if __name__ == "__main__":
+    unittest.main()
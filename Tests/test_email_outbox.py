@@ -0,0 +1,191 @@
+import os
+import sys
+import shutil
+import smtplib
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import email_outbox as outbox_module
+from src.email_outbox import EmailOutbox
+from src.database_handler import DatabaseHandler
+from src.db_connection import connection_manager
+
+MESSAGE = {'text': "Falha de leitura no PLC", 'html': "<p>Falha de leitura no PLC</p>"}
+
+class FakeNotifier:
+    """Falha as primeiras `failures` entregas com queda de sessão SMTP e registra as demais."""
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+        self.delivered = []
+
+    def deliver(self, subject, message, is_error, recipients=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.delivered.append((subject, message))
+        return True
+
+class EnqueueDuringSend(FakeNotifier):
+    """Registra uma nova ocorrência do mesmo alerta enquanto o SMTP está enviando."""
+    def __init__(self, outbox):
+        super().__init__()
+        self.outbox = outbox
+
+    def deliver(self, subject, message, is_error, recipients=None):
+        if self.calls == 0:
+            self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True, coalesce_key="plc:Cupper_22")
+        return super().deliver(subject, message, is_error, recipients)
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class TestEmailOutbox(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Banco temporário: o DB_FILE de produção nunca é tocado
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.original_db_file = connection_manager.db_file
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = os.path.join(cls.tmp_dir, "test_outbox.db")
+        DatabaseHandler.init_db()
+
+    @classmethod
+    def tearDownClass(cls):
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = cls.original_db_file
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def setUp(self):
+        with DatabaseHandler._get_connection() as conn:
+            conn.execute("DELETE FROM email_outbox")
+        self.clock = Clock(1_000_000.0)
+        for patcher in (
+            mock.patch("time.time", self.clock),
+            mock.patch.object(outbox_module, "EMAIL_RETRY_BASE", 30),
+            mock.patch.object(outbox_module, "EMAIL_RETRY_MAX", 3600),
+            mock.patch.object(outbox_module, "EMAIL_MAX_ATTEMPTS", 3),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.outbox = EmailOutbox(coalesce_window=600)
+
+    def row(self, email_id):
+        with DatabaseHandler._get_connection() as conn:
+            return dict(conn.execute("SELECT * FROM email_outbox WHERE id = ?", (email_id,)).fetchone())
+
+    def dispatch_at(self, now):
+        self.clock.now = now
+        return self.outbox._dispatch_due()
+
+    def test_retry_with_exponential_backoff_until_sent(self):
+        self.outbox.sender = FakeNotifier(failures=2)
+        email_id = self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True)
+        start = self.clock.now
+
+        self.dispatch_at(start)
+        row = self.row(email_id)
+        self.assertEqual((row['status'], row['attempts'], row['next_attempt_ts']), ('pending', 1, start + 30))
+        self.assertIn("Connection unexpectedly closed", row['last_error'])
+
+        # Antes do horário agendado nada é tentado
+        self.assertEqual(self.dispatch_at(start + 29), 0)
+        self.assertEqual(self.outbox.sender.calls, 1)
+
+        self.dispatch_at(start + 30)
+        row = self.row(email_id)
+        self.assertEqual((row['status'], row['attempts'], row['next_attempt_ts']), ('pending', 2, start + 30 + 60))
+
+        self.dispatch_at(start + 90)
+        row = self.row(email_id)
+        self.assertEqual((row['status'], row['attempts'], row['sent_ts']), ('sent', 3, start + 90))
+        self.assertIsNone(row['last_error'])
+        self.assertEqual(self.outbox.sender.delivered, [("Erro PLC", MESSAGE)])
+        self.assertEqual((self.outbox.failed_attempts, self.outbox.sent_count), (2, 1))
+
+    def test_backoff_is_capped_and_gives_up_after_max_attempts(self):
+        self.outbox.sender = FakeNotifier(failures=99)
+        email_id = self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True)
+        start = self.clock.now
+
+        with mock.patch.object(outbox_module, "EMAIL_RETRY_MAX", 45):
+            self.dispatch_at(start)
+            self.dispatch_at(start + 30)
+            self.assertEqual(self.row(email_id)['next_attempt_ts'], start + 30 + 45)  # 60s limitado a 45s
+            self.dispatch_at(start + 75)
+
+        row = self.row(email_id)
+        self.assertEqual((row['status'], row['attempts']), ('failed', 3))
+        self.assertEqual(self.outbox.given_up, 1)
+
+        # Descartado: não é mais tentado
+        self.dispatch_at(start + 100000)
+        self.assertEqual(self.outbox.sender.calls, 3)
+
+    def test_pending_alerts_are_coalesced_into_one_digest(self):
+        self.outbox.sender = FakeNotifier()
+        ids = {self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True, coalesce_key="plc:Cupper_22") for _ in range(3)}
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(self.row(ids.pop())['occurrences'], 3)
+
+        self.dispatch_at(self.clock.now)
+        subject, message = self.outbox.sender.delivered[0]
+        self.assertEqual(subject, "Erro PLC (3x)")
+        self.assertIn("ocorreu 3 vezes", message['text'])
+        self.assertIn("ocorreu 3 vezes", message['html'])
+
+    def test_repeat_after_send_waits_for_coalesce_window(self):
+        self.outbox.sender = FakeNotifier()
+        self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True, coalesce_key="plc:Cupper_22")
+        sent_at = self.clock.now
+        self.dispatch_at(sent_at)
+
+        self.clock.now = sent_at + 10
+        email_id = self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True, coalesce_key="plc:Cupper_22")
+        self.clock.now = sent_at + 20
+        self.assertEqual(self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True, coalesce_key="plc:Cupper_22"), email_id)
+        self.assertEqual(self.row(email_id)['next_attempt_ts'], sent_at + 600)
+
+        self.assertEqual(self.dispatch_at(sent_at + 599), 0)
+        self.dispatch_at(sent_at + 600)
+        self.assertEqual([s for s, _ in self.outbox.sender.delivered], ["Erro PLC", "Erro PLC (2x)"])
+        self.assertEqual(self.row(email_id)['status'], 'sent')
+
+    def test_occurrence_during_send_is_not_lost(self):
+        self.outbox.sender = EnqueueDuringSend(self.outbox)
+        first_id = self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True, coalesce_key="plc:Cupper_22")
+        self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True, coalesce_key="plc:Cupper_22")
+        sent_at = self.clock.now
+
+        self.dispatch_at(sent_at)
+        # O resumo enviado cobre só as 2 ocorrências lidas; a 3ª (durante o envio) fica em outra linha
+        self.assertEqual([s for s, _ in self.outbox.sender.delivered], ["Erro PLC (2x)"])
+        first = self.row(first_id)
+        self.assertEqual((first['status'], first['occurrences']), ('sent', 2))
+        with DatabaseHandler._get_connection() as conn:
+            pending = [dict(r) for r in conn.execute("SELECT * FROM email_outbox WHERE status = 'pending'")]
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(pending[0]['occurrences'], 1)
+        self.assertEqual(pending[0]['next_attempt_ts'], sent_at + 600)  # Respeita a janela de agrupamento
+
+        self.dispatch_at(sent_at + 600)
+        self.assertEqual([s for s, _ in self.outbox.sender.delivered], ["Erro PLC (2x)", "Erro PLC"])
+
+    def test_claimed_emails_are_released_after_interruption(self):
+        email_id = self.outbox.enqueue("Erro PLC", MESSAGE, is_error=True)
+        self.assertEqual([r['id'] for r in DatabaseHandler.claim_due_emails()], [email_id])
+        self.assertEqual(self.row(email_id)['status'], 'sending')
+        self.assertEqual(DatabaseHandler.claim_due_emails(), [])  # Reservado: não é entregue duas vezes
+
+        self.assertEqual(DatabaseHandler.release_claimed_emails(), 1)
+        self.assertEqual(self.row(email_id)['status'], 'pending')
+
+if __name__ == "__main__":
+    unittest.main()
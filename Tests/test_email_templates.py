@@ -0,0 +1,89 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_templates
+
+NOW = "17/10/2026 10:00:00"
+
+def make_plc(name, status='ATIVO', **overrides):
+    data = dict(
+        plc_name=name, main_value=123456, total_cups=9876543, feed_value=1.23456, status=status,
+        bobina_saida="B<1>", bobina_consumida="C1", size="269ml", update_time=NOW
+    )
+    data.update(overrides)
+    return SimpleNamespace(**data)
+
+class TestEmailTemplates(unittest.TestCase):
+    """Renderiza cada template com contexto fixo: campos principais e escape do HTML."""
+    def setUp(self):
+        patcher = mock.patch.object(email_templates, "_now", return_value=NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_production_report(self):
+        plcs = [make_plc("22"), make_plc("23", status='PROGRAMADA')]
+        report = email_templates.format_production_report(plcs, {"Cupper_22": "L&22", "Cupper_23": "L23"})
+
+        text, html = report['text'], report['html']
+        for expected in ("22", "L&22", "123.456", "9.876.543", "1.2346", "269ml", "B<1>", NOW, "Monitorando"):
+            self.assertIn(expected, text)
+
+        self.assertIn("L&amp;22", html)
+        self.assertNotIn("L&22", html)
+        self.assertIn("123.456", html)
+        self.assertIn(NOW, html)
+        self.assertNotIn(email_templates._ReportLayout.TIME_PLACEHOLDER, html)
+        # Layout estático preservado em volta da seção renderizada
+        self.assertTrue(html.startswith("<!DOCTYPE html>"))
+        self.assertIn("Informações Adicionais", html)
+        # Máquina programada não exibe contadores no HTML
+        self.assertEqual(html.count("123.456"), 1)
+
+    def test_lote_notification(self):
+        config = {'plc_config': {'ip_address': '10.0.0.1'}, 'tag_config': {'lote_tag': 'LOTE'}}
+        message = email_templates.format_lote_notification("L&22<x>", "Cupper_22", config)
+        for expected in ("L&22<x>", "Cupper_22", "10.0.0.1", "LOTE", NOW):
+            self.assertIn(expected, message['text'])
+        self.assertIn("L&amp;22&lt;x&gt;", message['html'])
+        self.assertNotIn("<x>", message['html'])
+        for expected in ("Cupper_22", "10.0.0.1", "LOTE", NOW):
+            self.assertIn(expected, message['html'])
+
+    def test_feed_unknown_alert(self):
+        with mock.patch.dict(os.environ, {"ADMIN_EMAIL": "admin@example.com"}):
+            message = email_templates.format_feed_unknown_alert_email("22", 1.5, "L&22", "B1", NOW)
+        for expected in ("22", "1.5", "L&22", "B1", NOW, "admin@example.com"):
+            self.assertIn(expected, message['text'])
+        self.assertIn("L&amp;22", message['html'])
+        self.assertIn("admin@example.com", message['html'])
+
+    def test_late_lot_alert(self):
+        message = email_templates.format_late_lot_alert("Cupper_22", "L&22")
+        for part in ('text', 'html'):
+            self.assertIn("Cupper_22", message[part])
+            self.assertIn("CUPPER_22", message[part])
+        self.assertIn("L&22", message['text'])
+        self.assertIn("L&amp;22", message['html'])
+
+    def test_plain_text_messages(self):
+        # Templates .txt não passam por escape
+        plc_error = email_templates.format_plc_error_message("22", "Timeout <CIP> & retry")
+        self.assertIn("Timeout <CIP> & retry", plc_error)
+        self.assertIn(NOW, plc_error)
+
+        status = email_templates.format_system_status_message("Banco & disco")
+        self.assertIn("Banco & disco", status)
+        self.assertIn(NOW, status)
+
+        critical = email_templates.format_critical_error_message("Falha geral")
+        self.assertIn("Falha geral", critical)
+        self.assertIn("Não disponível", critical)
+        self.assertIn("Traceback X", email_templates.format_critical_error_message("Falha", "Traceback X"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import hostname_resolver as resolver_module
+from src.hostname_resolver import HostnameResolver, UNKNOWN
+
+class HungDNS:
+    """Consulta DNS que fica travada na thread até `release()`."""
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._released = threading.Event()
+
+    def __call__(self, ip_address):
+        with self._lock:
+            self.calls += 1
+        self._released.wait(5)
+        raise OSError("host not found")
+
+    def release(self):
+        self._released.set()
+
+async def no_nbtstat(ip_address):
+    return None
+
+class TestHostnameResolver(unittest.TestCase):
+    def setUp(self):
+        self.dns = HungDNS()
+        self.addCleanup(self.dns.release)
+        for name, value in (("_reverse_dns", self.dns), ("_fqdn", self.dns)):
+            patcher = mock.patch.object(resolver_module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.resolver = HostnameResolver(step_timeout=0.05, wait_budget=0.3, auth_ttl=60, dns_slots=2)
+        self.resolver._step_nbtstat = no_nbtstat
+
+    def test_hung_lookups_do_not_pile_up_in_dns_pool(self):
+        async def scenario():
+            names = await asyncio.gather(*(self.resolver.resolve(f"10.0.0.{i}") for i in range(1, 6)))
+            self.assertEqual(names, [UNKNOWN] * 5)
+            # Só `dns_slots` threads chegam a ficar presas; as demais etapas são puladas
+            self.assertEqual(self.dns.calls, 2)
+            self.assertGreater(self.resolver.dns_skipped, 0)
+
+            # Ao destravar, as vagas voltam e novas consultas voltam a usar o DNS
+            self.dns.release()
+            for _ in range(100):
+                if self.resolver._dns_running == 0:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertEqual(self.resolver._dns_running, 0)
+            self.resolver._cache.clear()
+            await self.resolver.resolve("10.0.0.9")
+            self.assertGreater(self.dns.calls, 2)
+        asyncio.run(scenario())
+
+    def test_failed_fresh_lookup_keeps_last_known_name(self):
+        async def scenario():
+            # Nome resolvido há 2 min: velho demais para autorização, ainda dentro do TTL normal
+            two_minutes_ago = time.monotonic() - 120
+            self.resolver._cache["10.0.0.7"] = ("TERMINAL07", two_minutes_ago, two_minutes_ago)
+
+            self.assertEqual(await self.resolver.resolve("10.0.0.7", fresh=True), "TERMINAL07")
+            self.assertEqual(self.dns.calls, 2)  # Consulta de fato refeita (e falhou)
+
+            # A falha não apaga o nome conhecido; só registra a tentativa
+            name, resolved_at, checked_at = self.resolver._cache["10.0.0.7"]
+            self.assertEqual((name, resolved_at), ("TERMINAL07", two_minutes_ago))
+            self.assertGreater(checked_at, two_minutes_ago)
+        asyncio.run(scenario())
+
+    def test_fresh_lookup_past_wait_budget_uses_last_known_name(self):
+        async def scenario():
+            resolver = HostnameResolver(step_timeout=2, wait_budget=0.05, auth_ttl=60, dns_slots=2)
+            resolver._step_nbtstat = no_nbtstat
+            two_minutes_ago = time.monotonic() - 120
+            resolver._cache["10.0.0.7"] = ("TERMINAL07", two_minutes_ago, two_minutes_ago)
+            self.assertEqual(await resolver.resolve("10.0.0.7", fresh=True), "TERMINAL07")
+            self.assertIn("10.0.0.7", resolver._inflight)  # A consulta segue em segundo plano
+            self.dns.release()
+            await resolver._inflight["10.0.0.7"]
+        asyncio.run(scenario())
+
+    def test_fresh_lookup_does_not_use_expired_name(self):
+        async def scenario():
+            long_ago = time.monotonic() - self.resolver.ttl - 1
+            self.resolver._cache["10.0.0.8"] = ("TERMINAL08", long_ago, long_ago)
+            self.assertEqual(await self.resolver.resolve("10.0.0.8", fresh=True), UNKNOWN)
+        asyncio.run(scenario())
+
+    def test_display_lookup_serves_stale_name(self):
+        async def scenario():
+            long_ago = time.monotonic() - self.resolver.ttl - 1
+            self.resolver._cache["10.0.0.8"] = ("TERMINAL08", long_ago, long_ago)
+            self.assertEqual(await self.resolver.resolve("10.0.0.8"), "TERMINAL08")
+            self.assertIn("10.0.0.8", self.resolver._inflight)  # Renovação em segundo plano
+        asyncio.run(scenario())
+
+if __name__ == "__main__":
+    unittest.main()
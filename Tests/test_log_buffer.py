@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import logging
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.log_buffer import RingBufferHandler
+
+def make_record(level, message, created):
+    record = logging.LogRecord("root", level, __file__, 0, message, None, None)
+    record.created = created
+    return record
+
+class TestRingBufferHandler(unittest.TestCase):
+    def setUp(self):
+        self.handler = RingBufferHandler(capacity=100)
+        self.handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        self.today_start = time.time() - 60
+        for i in range(5):
+            self.handler.emit(make_record(logging.INFO, f"ontem {i}", self.today_start - 3600 + i))
+        for i in range(3):
+            self.handler.emit(make_record(logging.INFO, f"hoje {i}", self.today_start + i))
+        self.handler.emit(make_record(logging.ERROR, "erro hoje", self.today_start + 10))
+
+    def test_since_excludes_previous_days(self):
+        logs = self.handler.tail(50, since=self.today_start)
+        self.assertEqual(logs, ["INFO hoje 0", "INFO hoje 1", "INFO hoje 2", "ERROR erro hoje"])
+
+    def test_since_with_level(self):
+        self.assertEqual(self.handler.tail(50, "info", since=self.today_start), ["INFO hoje 0", "INFO hoje 1", "INFO hoje 2"])
+
+    def test_returns_fewer_than_limit_when_today_is_short(self):
+        # O /api/logs usa o tamanho do retorno para decidir a leitura do arquivo
+        self.assertLess(len(self.handler.tail(10, since=self.today_start)), 10)
+
+    def test_limit_keeps_most_recent(self):
+        self.assertEqual(self.handler.tail(2), ["INFO hoje 2", "ERROR erro hoje"])
+
+class TestUnevenEviction(unittest.TestCase):
+    def setUp(self):
+        # INFO movimentado descarta linhas que WARNING/ERROR (mais calmos) ainda guardam
+        self.handler = RingBufferHandler(capacity=10)
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+        self.emitted = []
+        now = time.time()
+        sequence = [(logging.ERROR, f"e{i}") for i in range(10)]
+        sequence += [(logging.WARNING, f"w{i}") for i in range(10)]
+        sequence += [(logging.INFO, f"i{i}") for i in range(15)]
+        sequence += [(logging.WARNING, f"w{i}") for i in range(10, 15)]
+        sequence += [(logging.INFO, f"i{i}") for i in range(15, 30)]
+        for n, (level, message) in enumerate(sequence):
+            self.handler.emit(make_record(level, message, now + n))
+            self.emitted.append(message)
+
+    def test_merged_tail_has_no_gaps(self):
+        logs = self.handler.tail(25)
+        # Sempre um sufixo contíguo do que foi registrado; curto demais -> /api/logs lê o arquivo
+        self.assertEqual(logs, self.emitted[-len(logs):])
+        self.assertLess(len(logs), 25)
+        self.assertEqual(logs, [f"i{i}" for i in range(20, 30)])
+
+    def test_limit_within_capacity_is_exact(self):
+        self.assertEqual(self.handler.tail(10), self.emitted[-10:])
+
+    def test_single_level_is_unaffected(self):
+        self.assertEqual(self.handler.tail(25, "warning"), [f"w{i}" for i in range(5, 15)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import queue
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest import mock
+
+from plc_handler import PLCHandler
+from src.acquisition_engine import AsyncAcquisitionEngine
+from src.database_handler import DatabaseHandler
+from src.db_connection import connection_manager
+from src.plc_manager import PLCMonitorManager, SharedPLCData
+
+CONFIG = {
+    'plc_config': {'ip_address': '127.0.0.1', 'processor_slot': 0},
+    'tag_config': {'feed_tag': 'Feed', 'bobina_tag': 'Bobina', 'lote_tag': 'Lote'},
+    'connection_config': {},
+}
+
+class FakeWriteResponse:
+    Status = "Success"
+
+class FakePLC:
+    """Registra as escritas em vez de enviá-las ao controlador."""
+    def __init__(self):
+        self.writes = []
+        self.closed = False
+
+    def Close(self):
+        self.closed = True
+
+    def Write(self, tag, value):
+        self.writes.append((tag, value))
+        return FakeWriteResponse()
+
+class TestPLCCommandQueue(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Banco temporário: o DB_FILE de produção nunca é tocado
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.original_db_file = connection_manager.db_file
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = os.path.join(cls.tmp_dir, "test_commands.db")
+        DatabaseHandler.init_db()
+
+    @classmethod
+    def tearDownClass(cls):
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = cls.original_db_file
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def setUp(self):
+        self.handler = PLCHandler(CONFIG, "PRENSA_TESTE", None, None, None)
+        self.handler.plc = FakePLC()
+        self.handler.connected = True
+
+    def test_command_runs_only_when_drained(self):
+        future = self.handler.submit_write_lote("L22")
+        self.assertFalse(future.done())
+        self.assertEqual(self.handler.plc.writes, [])
+
+        self.handler.drain_commands()
+        self.assertTrue(future.result(timeout=0))
+        self.assertEqual(self.handler.plc.writes, [("Lote", "L22")])
+
+    def test_expired_command_is_not_written(self):
+        future = self.handler.submit_write_lote("L22", timeout=0.01)
+        time.sleep(0.02)
+        self.handler.drain_commands()
+        self.assertFalse(future.result(timeout=0))
+        self.assertEqual(self.handler.plc.writes, [])
+
+    def test_cancelled_command_is_skipped(self):
+        future = self.handler.submit_write_lote("L22")
+        self.assertTrue(future.cancel())
+        self.handler.drain_commands()
+        self.assertEqual(self.handler.plc.writes, [])
+
+    def test_full_queue_rejects_immediately(self):
+        self.handler.commands = queue.Queue(maxsize=2)
+        accepted = [self.handler.submit_write_lote(f"L{i}") for i in range(2)]
+        rejected = self.handler.submit_write_lote("L99")
+        self.assertTrue(rejected.done())
+        self.assertFalse(rejected.result(timeout=0))
+        self.assertFalse(any(f.done() for f in accepted))
+
+        self.handler.drain_commands()
+        self.assertEqual(self.handler.plc.writes, [("Lote", "L0"), ("Lote", "L1")])
+
+    def test_drain_is_limited_per_cycle(self):
+        futures = [self.handler.submit_write_lote(f"L{i}") for i in range(3)]
+        self.handler.drain_commands(max_commands=2)
+        self.assertEqual([f.done() for f in futures], [True, True, False])
+        self.handler.drain_commands(max_commands=2)
+        self.assertTrue(futures[2].result(timeout=0))
+
+    def test_pending_commands_fail_when_machine_is_removed(self):
+        manager = PLCMonitorManager(SharedPLCData(), mode="thread")
+        manager.handlers["PRENSA_TESTE"] = self.handler
+        manager.stop_events["PRENSA_TESTE"] = threading.Event()
+        futures = [self.handler.submit_write_lote(f"L{i}") for i in range(2)]
+
+        manager.remove_machine("PRENSA_TESTE")
+
+        self.assertEqual([f.result(timeout=0) for f in futures], [False, False])
+        self.assertNotIn("PRENSA_TESTE", manager.handlers)
+        self.assertTrue(self.handler.commands.empty())
+        self.assertEqual(self.handler.plc.writes, [])
+
+    def test_cycle_in_flight_does_not_register_removed_machine(self):
+        manager = PLCMonitorManager(SharedPLCData(), mode="thread")
+        stop_event = threading.Event()
+        plc = FakePLC()
+
+        def connect(handler):
+            handler.plc = plc
+            stop_event.set()  # remove_machine chega enquanto a conexão está sendo aberta
+            return True
+
+        with mock.patch.object(PLCHandler, "attempt_plc_connection", connect):
+            handler, wait = manager._run_cycle(CONFIG, "PRENSA_TESTE", None, None, None,
+                                               is_active=lambda: not stop_event.is_set())
+
+        self.assertIsNone(handler)
+        self.assertNotIn("PRENSA_TESTE", manager.handlers)
+        self.assertTrue(plc.closed)
+
+class TestAsyncEngineShutdown(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.original_db_file = connection_manager.db_file
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = os.path.join(cls.tmp_dir, "test_engine.db")
+
+    @classmethod
+    def tearDownClass(cls):
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = cls.original_db_file
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_stop_closes_worker_connections(self):
+        engine = AsyncAcquisitionEngine(manager=None, max_workers=3)
+        engine.start()
+        barrier = threading.Barrier(3)
+
+        def open_connection():
+            barrier.wait(5)  # Garante uma conexão em cada worker
+            DatabaseHandler._get_connection()
+            return threading.get_ident()
+
+        workers = {f.result(timeout=5) for f in [engine.executor.submit(open_connection) for _ in range(3)]}
+        self.assertEqual(len(workers), 3)
+        self.assertTrue(workers <= set(connection_manager._registry))
+
+        engine.stop()
+        self.assertFalse(workers & set(connection_manager._registry))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import database_handler
+from src.database_handler import DatabaseHandler, PROD_DATE_SQL
+from src.db_connection import connection_manager
+from timezone_utils import SAO_PAULO_TZ
+
+# (horário do evento, data industrial esperada, turno, lote, copos)
+EVENTS = [
+    (datetime(2026, 3, 9, 22, 0, 0), "2026-03-09", "NOITE (18-06)", "L1", 100),
+    (datetime(2026, 3, 10, 5, 59, 59), "2026-03-09", "NOITE (18-06)", "L1", 50),
+    (datetime(2026, 3, 10, 6, 0, 29), "2026-03-09", "NOITE (18-06)", "L1", 7),   # Ainda no buffer de 30s
+    (datetime(2026, 3, 10, 6, 0, 30), "2026-03-10", "DIA (06-18)", "L1", 11),    # Primeiro segundo do novo dia
+    (datetime(2026, 3, 10, 6, 0, 31), "2026-03-10", "DIA (06-18)", "L2", 13),
+    (datetime(2026, 3, 10, 17, 0, 0), "2026-03-10", "DIA (06-18)", "L2", 200),
+]
+
+PRODUCTION_GROUP_BY = """
+    SELECT machine_name, production_date, shift, coil_number, COALESCE(can_size, '') AS can_size,
+           COALESCE(consumption_type, '') AS consumption_type,
+           SUM(cups_produced) AS total_cups, COUNT(*) AS record_count, MIN(timestamp) AS first_event, MAX(timestamp) AS last_event
+    FROM production_records
+    GROUP BY machine_name, production_date, shift, coil_number, COALESCE(can_size, ''), COALESCE(consumption_type, '')
+    ORDER BY 1, 2, 3, 4, 5, 6
+"""
+PRODUCTION_ROLLUP = """
+    SELECT machine_name, production_date, shift, coil_number, can_size, consumption_type,
+           total_cups, record_count, first_event, last_event
+    FROM production_rollup ORDER BY 1, 2, 3, 4, 5, 6
+"""
+COIL_GROUP_BY = """
+    SELECT machine_name, production_date, shift, lot_number, consumption_type,
+           COUNT(*) AS coil_count, SUM(consumed_quantity) AS consumed_quantity
+    FROM coil_consumption_lot
+    GROUP BY machine_name, production_date, shift, lot_number, consumption_type
+    ORDER BY 1, 2, 3, 4, 5
+"""
+COIL_ROLLUP = """
+    SELECT machine_name, production_date, shift, lot_number, consumption_type, coil_count, consumed_quantity
+    FROM coil_rollup ORDER BY 1, 2, 3, 4, 5
+"""
+
+def rows(sql):
+    with DatabaseHandler._get_connection() as conn:
+        return [tuple(row) for row in conn.execute(sql).fetchall()]
+
+class TestProductionRollups(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Banco temporário: o DB_FILE de produção nunca é tocado
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.original_db_file = connection_manager.db_file
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = os.path.join(cls.tmp_dir, "test_rollups.db")
+        DatabaseHandler.init_db()
+
+        for moment, _, shift, lot, cups in EVENTS:
+            now = SAO_PAULO_TZ.localize(moment)
+            with mock.patch.object(database_handler, "get_current_sao_paulo_time", return_value=now):
+                DatabaseHandler.insert_production_record("Cupper_22", lot, cups, "Fechamento Turno", shift, 0, "M", "350ml")
+        # Duas bobinas do mesmo lote/turno/dia (agregadas) e uma do dia seguinte
+        for start, end, production_date, shift, quantity in (
+            (datetime(2026, 3, 9, 20, 0), datetime(2026, 3, 10, 2, 0), "2026-03-09", "NOITE (18-06)", 300),
+            (datetime(2026, 3, 10, 2, 0), datetime(2026, 3, 10, 6, 0, 29), "2026-03-09", "NOITE (18-06)", 120),
+            (datetime(2026, 3, 10, 6, 0, 30), datetime(2026, 3, 10, 12, 0), "2026-03-10", "DIA (06-18)", 400),
+        ):
+            DatabaseHandler.insert_coil_consumption_record(
+                "Cupper_22", f"L1-{end:%H%M%S}", "L1", SAO_PAULO_TZ.localize(start), SAO_PAULO_TZ.localize(end),
+                quantity, "cups", production_date, shift, "Completa", coil_type="M", shift_breakdown=[])
+
+    @classmethod
+    def tearDownClass(cls):
+        DatabaseHandler.close_all_connections()
+        connection_manager.db_file = cls.original_db_file
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_production_date_uses_industrial_boundary(self):
+        stored = rows("SELECT timestamp, production_date FROM production_records ORDER BY id")
+        self.assertEqual([d for _, d in stored], [expected for _, expected, *_ in EVENTS])
+        # A expressão SQL usada em migrações/consultas concorda com get_production_date
+        recomputed = rows(f"SELECT {PROD_DATE_SQL} FROM production_records ORDER BY id")
+        self.assertEqual([d for (d,) in recomputed], [expected for _, expected, *_ in EVENTS])
+
+    def test_incremental_rollups_match_group_by(self):
+        self.assertEqual(rows(PRODUCTION_ROLLUP), rows(PRODUCTION_GROUP_BY))
+        self.assertEqual(rows(COIL_ROLLUP), rows(COIL_GROUP_BY))
+
+    def test_rebuilt_rollups_match_group_by(self):
+        incremental_production, incremental_coil = rows(PRODUCTION_ROLLUP), rows(COIL_ROLLUP)
+        self.assertTrue(DatabaseHandler.rebuild_rollups())
+        self.assertEqual(rows(PRODUCTION_ROLLUP), rows(PRODUCTION_GROUP_BY))
+        self.assertEqual(rows(COIL_ROLLUP), rows(COIL_GROUP_BY))
+        self.assertEqual(rows(PRODUCTION_ROLLUP), incremental_production)
+        self.assertEqual(rows(COIL_ROLLUP), incremental_coil)
+
+    def test_production_by_shift_keeps_one_row_per_event(self):
+        # Contrato de /api/producao/turno: um registro por evento, Horário_Evento = horário do registro
+        rows_by_shift = DatabaseHandler.get_production_by_shift("Cupper_22", "2026-03-09", "2026-03-09")
+        self.assertEqual(
+            [(r['Horário_Evento'], r['Dt_turno'], r['Lote'], r['Quantidade'], r['Tipo_Reporte']) for r in rows_by_shift],
+            [(m.strftime("%Y-%m-%d %H:%M:%S"), d, lot, cups, "TURNO")
+             for m, d, _, lot, cups in reversed(EVENTS) if d == "2026-03-09"]
+        )
+
+    def test_shift_summary_reads_rollup(self):
+        summary = DatabaseHandler.get_production_shift_summary("Cupper_22", "2026-03-10", "2026-03-10")
+        self.assertEqual(
+            sorted((r['Lote'], r['Quantidade'], r['Registros'], r['Primeiro_Evento'], r['Ultimo_Evento']) for r in summary),
+            [("L1", 11, 1, "2026-03-10 06:00:30", "2026-03-10 06:00:30"),
+             ("L2", 213, 2, "2026-03-10 06:00:31", "2026-03-10 17:00:00")]
+        )
+
+    def test_production_by_lot_filters_by_calendar_date(self):
+        totals = {r['coil_number']: r['total'] for r in DatabaseHandler.get_production_by_lot("Cupper_22", "2026-03-09")}
+        self.assertEqual(totals, {"L1": 100})
+        totals = {r['coil_number']: r['total'] for r in DatabaseHandler.get_production_by_lot("Cupper_22", "2026-03-10")}
+        self.assertEqual(totals, {"L1": 68, "L2": 213})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import smtplib
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_utils
+from email_utils import SMTPConnectionPool
+
+class FakeSMTP:
+    """Sessão SMTP falsa: `dropped` simula uma conexão derrubada pelo relay."""
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.dropped = False
+        self.sent = []
+        FakeSMTP.instances.append(self)
+
+    def starttls(self): pass
+    def login(self, user, password): pass
+    def noop(self): return (250, b"OK")
+    def quit(self): pass
+    def close(self): pass
+
+    def send_message(self, msg):
+        if self.dropped:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.sent.append(msg)
+
+class TestSMTPConnectionPool(unittest.TestCase):
+    def setUp(self):
+        FakeSMTP.instances = []
+        patcher = mock.patch.object(email_utils.smtplib, "SMTP", FakeSMTP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # noop_interval alto: sessões ociosas voltam do pool sem NOOP, como logo após um envio
+        self.pool = SMTPConnectionPool(size=2, idle_timeout=300, noop_interval=300)
+
+    def fill_idle(self, count):
+        with self.pool.session():
+            if count > 1:
+                with self.pool.session():
+                    pass
+        return FakeSMTP.instances[:count]
+
+    def test_session_is_reused(self):
+        self.fill_idle(1)
+        self.pool.send_message("msg")
+        self.assertEqual(self.pool.connections_opened, 1)
+        self.assertEqual(FakeSMTP.instances[0].sent, ["msg"])
+
+    def test_retry_uses_new_connection_and_drops_idle_sessions(self):
+        for server in self.fill_idle(2):
+            server.dropped = True  # o relay derrubou todas as sessões ociosas
+
+        self.pool.send_message("msg")
+
+        self.assertEqual(self.pool.connections_opened, 3)
+        self.assertEqual(FakeSMTP.instances[-1].sent, ["msg"])
+        # A sessão nova é a única que volta ao pool
+        self.assertEqual([server for server, _ in self.pool._idle], [FakeSMTP.instances[-1]])
+
+    def test_fresh_session_ignores_idle(self):
+        self.fill_idle(1)
+        with self.pool.session(fresh=True) as server:
+            self.assertIsNot(server, FakeSMTP.instances[0])
+        self.assertEqual(self.pool.connections_opened, 2)
+
+if __name__ == "__main__":
+    unittest.main()
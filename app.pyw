@@ -16,11 +16,20 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from src.database_handler import DatabaseHandler
+from src.db_writer import BatchDatabaseWriter
+from src.async_db import shutdown_executors
+from src.lote_pipeline import lote_pipeline
+from src.email_outbox import email_outbox
+from src.db_maintenance import db_maintenance
+from src.monitor_utils import cleanup_legacy_email_locks
+from src.log_buffer import log_buffer, read_logs, log_file_for, parse_log_date
+from src.log_pipeline import start_logging, stop_logging
 from src.plc_manager import SharedPLCData, PLCMonitorManager
 from src.api_routes import router, init_api
-from email_utils import EmailNotifier
-from timezone_utils import get_current_sao_paulo_time
-from backup_utils import backup_database
+from email_utils import EmailNotifier, smtp_pool
+from datetime import datetime, time as dt_time
+from timezone_utils import get_current_sao_paulo_time, SAO_PAULO_TZ
+from backup_utils import backup_scheduler
 
 tags_metadata = [
     {
@@ -42,23 +51,9 @@ tags_metadata = [
 ]
 
 def setup_logging():
-    """Configura o sistema de logs."""
+    """Configura o sistema de logs (fila assíncrona, arquivo diário em logs/)."""
     log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir, exist_ok=True)
-    
-    # Backup log path as secondary (Configurable via .env)
-    secondary_log_dir = os.getenv("SECONDARY_LOG_DIR")
-    log_file = os.path.join(log_dir, f"plc_system_{get_current_sao_paulo_time().strftime('%Y%m%d')}.log")
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - [%(name)s] %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    start_logging(log_dir, level=logging.INFO)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -103,9 +98,12 @@ async def lifespan(app: FastAPI):
             DatabaseHandler.save_plc(p)
         existing_plcs = DatabaseHandler.get_all_plcs()
 
+    db_writer = BatchDatabaseWriter(DatabaseHandler._get_connection, DatabaseHandler.close_connection)
+    db_writer.start()
+    DatabaseHandler.attach_writer(db_writer)
+
     shared_data = SharedPLCData()
     monitor_manager = PLCMonitorManager(shared_data)
-    backup_database()
     plc_configs_db = {}
     plcs_to_monitor = []
     
@@ -150,11 +148,29 @@ async def lifespan(app: FastAPI):
 
     init_api(shared_data, plc_configs_db, monitor_manager)
     email_notifier = EmailNotifier(max_workers=4)
+    email_outbox.start(email_notifier)
+    email_notifier.attach_outbox(email_outbox)
     lock_dir = os.path.join(tempfile.gettempdir(), 'canpack_plc_monitor_locks')
+    cleanup_legacy_email_locks(lock_dir)
     
     monitor_manager.start_monitoring(plcs_to_monitor, email_notifier, lock_dir)
     logging.info(f"Monitoramento de {len(plcs_to_monitor)} PLCs iniciado.")
+    # Backup online em segundo plano (não atrasa mais a inicialização)
+    backup_scheduler.start()
+    db_maintenance.start()
     yield
+    logging.info("Encerrando sistema...")
+    backup_scheduler.stop()
+    db_maintenance.stop()
+    await lote_pipeline.drain()
+    monitor_manager.stop_monitoring()
+    email_outbox.stop()
+    DatabaseHandler.detach_writer()
+    db_writer.stop()
+    shutdown_executors()
+    smtp_pool.close_all()
+    DatabaseHandler.close_all_connections()
+    stop_logging()
 
 # Configuração da aplicação
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
@@ -229,30 +245,39 @@ async def redirect_to_docs():
 @app.get("/api/logs", tags=["Manutenção / Maintenance"])
 def get_system_logs(request: Request,
                     level: str = Query(None, description="Filtrar por nível: INFO, DEBUG, ERROR"), 
-                    limit: int = Query(500, description="Número máximo de linhas a retornar (padrão: 500)")):
+                    limit: int = Query(500, ge=1, le=10000, description="Número máximo de linhas a retornar (padrão: 500)"),
+                    start_date: str = Query(None, description="Data inicial (YYYY-MM-DD ou DD/MM/YYYY) / Start date"),
+                    end_date: str = Query(None, description="Data final (padrão: data inicial ou hoje) / End date")):
     # Proteção de token para logs do sistema
     token = request.headers.get("X-Terminal-Token")
     if token != os.getenv("API_MASTER_TOKEN"):
         raise HTTPException(status_code=403, detail="Acesso negado aos logs do servidor.")
         
     try:
+        today = get_current_sao_paulo_time().date()
+        start = parse_log_date(start_date) if start_date else None
+        end = parse_log_date(end_date) if end_date else (start or today)
+        start = start or end
+        if start > end:
+            raise HTTPException(status_code=400, detail="Data inicial maior que a final.")
+
+        # Hoje: buffer em memória, somente registros de hoje e apenas se já houver `limit` deles
+        if start == end == today:
+            today_start = SAO_PAULO_TZ.localize(datetime.combine(today, dt_time())).timestamp()
+            logs = log_buffer.tail(limit, level, since=today_start)
+            if len(logs) >= limit:
+                return {"count": len(logs), "logs": logs, "source": "memory"}
+
         log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
-        log_file = os.path.join(log_dir, f"plc_system_{get_current_sao_paulo_time().strftime('%Y%m%d')}.log")
-        
-        if not os.path.exists(log_file):
+        if end == today and start == end and not os.path.exists(log_file_for(log_dir, today)):
             return {"error": "Arquivo de log não encontrado para hoje."}
-            
-        from collections import deque
-        logs = deque(maxlen=limit)
-        with open(log_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                if level:
-                    if level.upper() in line:
-                        logs.append(line.strip())
-                else:
-                    logs.append(line.strip())
-                    
-        return {"count": len(logs), "logs": list(logs)}
+
+        logs = read_logs(log_dir, limit, level, start, end)
+        return {"count": len(logs), "logs": logs, "source": "file"}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         return {"error": f"Erro ao ler logs: {str(e)}"}
 
@@ -1,39 +1,329 @@
 import shutil
 import os
+import gzip
+import json
+import sqlite3
 import logging
+import threading
 from datetime import datetime
 import time
 
-def backup_database():
-    """Realiza o backup do banco de dados SQLite."""
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", 24))    # 0 desativa o agendamento
+BACKUP_INITIAL_DELAY = float(os.getenv("BACKUP_INITIAL_DELAY", 600))     # 1º backup após o boot (s)
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", 256))     # Páginas copiadas por etapa
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", 0.05))          # Pausa entre etapas (s)
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", 3))           # Reinícios tolerados antes da cópia única
+BACKUP_COMPRESS = os.getenv("BACKUP_COMPRESS", "false").lower() in ("1", "true", "yes", "sim")
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", 10))
+BACKUP_MODE = os.getenv("BACKUP_MODE", "full").lower()                   # full | incremental
+BACKUP_CHUNKS_PER_BASE = int(os.getenv("BACKUP_CHUNKS_PER_BASE", 30))    # Incrementais até uma nova base
+BACKUP_KEEP_CHAINS = int(os.getenv("BACKUP_KEEP_CHAINS", 2))             # Cadeias base+incrementais mantidas
+
+BACKUP_PREFIX = "production_backup_"
+CHAIN_PREFIX = "chain_"
+MANIFEST_FILE = "manifest.json"
+
+# Tabelas de histórico (somente INSERT, id crescente): exportadas por marca d'água de id
+APPEND_ONLY_TABLES = ("production_records", "production_detail", "coil_consumption_lot", "coil_shift_breakdown")
+# Tabelas pequenas de configuração/estado: copiadas inteiras em cada incremental
+SNAPSHOT_TABLES = ("current_production", "lote_config", "plc_machines", "email_recipients")
+
+class _BackupRestarted(Exception):
+    """O banco foi alterado por outra conexão durante a cópia em etapas."""
+
+def _online_copy(source_db, target_path, pages=BACKUP_PAGES_PER_STEP, step_sleep=BACKUP_STEP_SLEEP):
+    """Copia o banco com a API de backup do SQLite (consistente, inclui o conteúdo do -wal).
+
+    A cópia é feita em etapas de `pages` páginas com uma pausa entre elas, para não disputar
+    disco/CPU com a aquisição. Se outra conexão gravar no meio, o SQLite reinicia a cópia; após
+    BACKUP_MAX_RESTARTS reinícios a cópia é feita em uma única etapa (em WAL isso só mantém uma
+    transação de leitura e não bloqueia os escritores).
+    """
+    state = {"remaining": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > BACKUP_MAX_RESTARTS:
+                raise _BackupRestarted()
+        state["remaining"] = remaining
+        if remaining and step_sleep > 0:
+            time.sleep(step_sleep)
+
+    source = sqlite3.connect(source_db, timeout=30)
+    try:
+        target = sqlite3.connect(target_path)
+        try:
+            try:
+                source.backup(target, pages=pages, progress=progress)
+            except _BackupRestarted:
+                logging.info("Backup reiniciado repetidas vezes pelas gravações; copiando em etapa única.")
+                source.backup(target, pages=-1)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return state["restarts"]
+
+def _compress(path):
+    compressed_path = f"{path}.gz"
+    with open(path, 'rb') as src, gzip.open(compressed_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.remove(path)
+    return compressed_path
+
+def _rotate_backups(backup_dir, keep=BACKUP_KEEP):
+    # O nome contém o timestamp, então a ordem alfabética é a cronológica (.db e .db.gz)
+    backups = sorted(
+        os.path.join(backup_dir, f) for f in os.listdir(backup_dir)
+        if f.startswith(BACKUP_PREFIX) and (f.endswith(".db") or f.endswith(".db.gz"))
+    )
+    while len(backups) > keep:
+        oldest_backup = backups.pop(0)
+        os.remove(oldest_backup)
+        logging.info(f"Backup antigo removido: {oldest_backup}")
+
+def backup_database(compress=BACKUP_COMPRESS):
+    """Realiza o backup online do banco de dados SQLite. Retorna o caminho do arquivo ou None."""
     source_db = os.getenv("DB_FILE", "production_data.db")
     backup_dir = os.getenv("BACKUP_DIR", "backups")
-    
+
     if not os.path.exists(source_db):
         logging.error(f"Banco de dados {source_db} não encontrado para backup.")
-        return
+        return None
 
     os.makedirs(backup_dir, exist_ok=True)
-    
+
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = f"production_backup_{timestamp}.db"
+    backup_file = f"{BACKUP_PREFIX}{timestamp}.db"
     backup_path = os.path.join(backup_dir, backup_file)
-    
+    partial_path = f"{backup_path}.partial"
+
     try:
-        shutil.copy2(source_db, backup_path)
-        logging.info(f"Backup realizado com sucesso: {backup_path}")
-        
-        # Limpeza: Mantém apenas os últimos 10 backups
-        backups = sorted([os.path.join(backup_dir, f) for f in os.listdir(backup_dir) if f.startswith("production_backup_")])
-        while len(backups) > 10:
-            oldest_backup = backups.pop(0)
-            os.remove(oldest_backup)
-            logging.info(f"Backup antigo removido: {oldest_backup}")
-            
+        started = time.monotonic()
+        # Cópia em arquivo temporário: um backup interrompido nunca entra na rotação
+        restarts = _online_copy(source_db, partial_path)
+        os.replace(partial_path, backup_path)
+        if compress:
+            backup_path = _compress(backup_path)
+        logging.info(
+            f"Backup realizado com sucesso: {backup_path} "
+            f"({time.monotonic() - started:.1f}s, {restarts} reinícios)"
+        )
+
+        # Limpeza: Mantém apenas os últimos BACKUP_KEEP backups
+        _rotate_backups(backup_dir)
+        return backup_path
+
     except Exception as e:
         logging.error(f"Falha ao realizar backup: {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return None
+
+def _read_manifest(chain_dir):
+    with open(os.path.join(chain_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_manifest(chain_dir, manifest):
+    path = os.path.join(chain_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def _latest_chain(incremental_dir):
+    if not os.path.isdir(incremental_dir):
+        return None
+    chains = sorted(d for d in os.listdir(incremental_dir) if d.startswith(CHAIN_PREFIX))
+    for chain in reversed(chains):
+        chain_dir = os.path.join(incremental_dir, chain)
+        if os.path.exists(os.path.join(chain_dir, MANIFEST_FILE)):
+            return chain_dir
+    return None
+
+def _table_watermarks(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {
+        table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+        for table in APPEND_ONLY_TABLES if table in existing
+    }
+
+def _start_chain(source_db, incremental_dir, compress):
+    """Nova cadeia: cópia online completa (base) e marcas d'água lidas da própria base."""
+    chain_name = f"{CHAIN_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    chain_dir = os.path.join(incremental_dir, chain_name)
+    suffix = 1
+    while os.path.exists(chain_dir):
+        chain_dir = os.path.join(incremental_dir, f"{chain_name}_{suffix}")
+        suffix += 1
+    os.makedirs(chain_dir)
+    base_path = os.path.join(chain_dir, "base.db")
+    try:
+        _online_copy(source_db, f"{base_path}.partial")
+        os.replace(f"{base_path}.partial", base_path)
+
+        base = sqlite3.connect(base_path)
+        try:
+            watermarks = _table_watermarks(base)
+        finally:
+            base.close()
+        if compress:
+            base_path = _compress(base_path)
+
+        _write_manifest(chain_dir, {
+            "base": os.path.basename(base_path),
+            "created_at": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+            "watermarks": watermarks,
+            "chunks": [],
+        })
+    except Exception:
+        # Cadeia sem manifesto não é restaurável: não deixa resto no diretório
+        shutil.rmtree(chain_dir, ignore_errors=True)
+        raise
+    _rotate_chains(incremental_dir)
+    logging.info(f"Backup incremental: nova base em {base_path}")
+    return chain_dir
+
+def _rotate_chains(incremental_dir, keep=BACKUP_KEEP_CHAINS):
+    chains = sorted(d for d in os.listdir(incremental_dir) if d.startswith(CHAIN_PREFIX))
+    while len(chains) > keep:
+        oldest_chain = os.path.join(incremental_dir, chains.pop(0))
+        shutil.rmtree(oldest_chain, ignore_errors=True)
+        logging.info(f"Cadeia de backup antiga removida: {oldest_chain}")
+
+def _write_chunk(source_db, chunk_path, watermarks):
+    """Exporta as linhas novas (id > marca d'água) e as tabelas de estado em JSON Lines + gzip.
+
+    Todas as leituras ocorrem na mesma transação de leitura, então o pedaço é um retrato
+    consistente do banco. Retorna as novas marcas d'água e a quantidade de linhas por tabela.
+    """
+    source = sqlite3.connect(source_db, timeout=30, isolation_level=None)
+    new_watermarks = dict(watermarks)
+    row_counts = {}
+    try:
+        source.execute("BEGIN")
+        existing = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        with gzip.open(chunk_path, 'wt', encoding='utf-8', compresslevel=6) as out:
+            for table in APPEND_ONLY_TABLES + SNAPSHOT_TABLES:
+                if table not in existing:
+                    continue
+                append_only = table in APPEND_ONLY_TABLES
+                if append_only:
+                    cursor = source.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id", (watermarks.get(table, 0),))
+                else:
+                    cursor = source.execute(f"SELECT * FROM {table}")
+                columns = [col[0] for col in cursor.description]
+                out.write(json.dumps({"table": table, "mode": "append" if append_only else "replace", "columns": columns}) + "\n")
+                count = 0
+                id_index = columns.index("id") if append_only else None
+                for row in cursor:
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    count += 1
+                    if append_only:
+                        new_watermarks[table] = row[id_index]
+                row_counts[table] = count
+        source.execute("COMMIT")
+    finally:
+        source.close()
+    return new_watermarks, row_counts
+
+def incremental_backup(compress=BACKUP_COMPRESS):
+    """Backup incremental: exporta só as linhas adicionadas desde a última marca d'água.
+
+    Cada cadeia (BACKUP_DIR/incremental/chain_*) tem uma base completa e pedaços
+    chunk_NNNNN.jsonl.gz; depois de BACKUP_CHUNKS_PER_BASE pedaços uma nova base é criada.
+    Restauração: restore_backup.py. Retorna o caminho do arquivo gerado ou None.
+    """
+    source_db = os.getenv("DB_FILE", "production_data.db")
+    incremental_dir = os.path.join(os.getenv("BACKUP_DIR", "backups"), "incremental")
+
+    if not os.path.exists(source_db):
+        logging.error(f"Banco de dados {source_db} não encontrado para backup.")
+        return None
+
+    os.makedirs(incremental_dir, exist_ok=True)
+    chunk_path = None
+    try:
+        started = time.monotonic()
+        chain_dir = _latest_chain(incremental_dir)
+        manifest = _read_manifest(chain_dir) if chain_dir else None
+        if manifest is None or len(manifest["chunks"]) >= BACKUP_CHUNKS_PER_BASE:
+            chain_dir = _start_chain(source_db, incremental_dir, compress)
+            return os.path.join(chain_dir, _read_manifest(chain_dir)["base"])
+
+        seq = len(manifest["chunks"]) + 1
+        chunk_file = f"chunk_{seq:05d}.jsonl.gz"
+        chunk_path = os.path.join(chain_dir, chunk_file)
+        watermarks, row_counts = _write_chunk(source_db, f"{chunk_path}.partial", manifest["watermarks"])
+        os.replace(f"{chunk_path}.partial", chunk_path)
+
+        # O manifesto só avança depois que o pedaço está completo em disco
+        manifest["chunks"].append({
+            "file": chunk_file,
+            "created_at": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+            "from_watermarks": manifest["watermarks"],
+            "rows": row_counts,
+        })
+        manifest["watermarks"] = watermarks
+        _write_manifest(chain_dir, manifest)
+
+        new_rows = sum(row_counts.get(t, 0) for t in APPEND_ONLY_TABLES)
+        logging.info(
+            f"Backup incremental realizado: {chunk_path} ({new_rows} linhas novas, "
+            f"{os.path.getsize(chunk_path) / 1024:.0f} KiB, {time.monotonic() - started:.1f}s)"
+        )
+        return chunk_path
+
+    except Exception as e:
+        logging.error(f"Falha ao realizar backup incremental: {e}")
+        if chunk_path and os.path.exists(f"{chunk_path}.partial"):
+            os.remove(f"{chunk_path}.partial")
+        return None
+
+class BackupScheduler:
+    """Executa o backup (completo ou incremental, BACKUP_MODE) em uma thread própria,
+    fora do caminho de inicialização."""
+    def __init__(self, interval_hours=BACKUP_INTERVAL_HOURS, initial_delay=BACKUP_INITIAL_DELAY, mode=BACKUP_MODE):
+        self.interval = interval_hours * 3600
+        self.mode = mode
+        self.initial_delay = initial_delay
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.last_backup = None  # {"path", "finished_at", "ok"}
+
+    def start(self):
+        if self.interval <= 0:
+            logging.info("Backup agendado desativado (BACKUP_INTERVAL_HOURS=0).")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="DB-Backup")
+        self._thread.start()
+
+    def stop(self, timeout=30):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        delay = self.initial_delay
+        while not self._stop_event.wait(delay):
+            path = incremental_backup() if self.mode == "incremental" else backup_database()
+            self.last_backup = {
+                "path": path,
+                "finished_at": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+                "ok": path is not None,
+            }
+            delay = self.interval
+
+backup_scheduler = BackupScheduler()
 
 if __name__ == "__main__":
     # Configuração básica de log para rodar independente se necessário
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
-    backup_database()
+    import sys
+    if "--incremental" in sys.argv[1:]:
+        incremental_backup()
+    else:
+        backup_database()
@@ -3,9 +3,134 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import logging
 import os
-from smtp_config import SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_SENDER, ERROR_RECIPIENTS, PRODUCTION_RECIPIENTS
+import threading
+import time
+from smtp_config import (SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_SENDER, ERROR_RECIPIENTS,
+                         PRODUCTION_RECIPIENTS, SMTP_TIMEOUT, SMTP_POOL_SIZE, SMTP_IDLE_TIMEOUT,
+                         SMTP_NOOP_INTERVAL, RECIPIENTS_CACHE_TTL)
+
+class SMTPConnectionPool:
+    """Sessões SMTP autenticadas reutilizadas entre envios.
+
+    Evita um handshake STARTTLS + login por mensagem: a sessão volta ao pool após o envio,
+    é testada com NOOP se ficou ociosa por mais de `noop_interval`, é fechada se passou de
+    `idle_timeout` e, se o relay derrubar a conexão no meio do envio, as demais sessões ociosas
+    são descartadas (provavelmente caíram junto) e o envio é refeito uma vez em uma conexão nova.
+    """
+    _RETRYABLE = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError)
+
+    def __init__(self, size=SMTP_POOL_SIZE, idle_timeout=SMTP_IDLE_TIMEOUT, noop_interval=SMTP_NOOP_INTERVAL):
+        self.idle_timeout = idle_timeout
+        self.noop_interval = noop_interval
+        self._idle = []  # [(smtplib.SMTP, último_uso_monotônico)]
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, size))
+        self.connections_opened = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        try:
+            server.starttls()
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        except Exception:
+            self._close(server)
+            raise
+        self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_alive(self, server):
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _take_idle(self):
+        """Retorna uma sessão ociosa ainda utilizável (ou None)."""
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                server, last_used = self._idle.pop()
+            idle_for = now - last_used
+            if idle_for > self.idle_timeout:
+                self._close(server)
+            elif idle_for > self.noop_interval and not self._is_alive(server):
+                self._close(server)
+            else:
+                return server
+
+    @contextmanager
+    def session(self, fresh=False):
+        """Empresta uma sessão do pool; `fresh=True` ignora as ociosas e abre uma conexão nova."""
+        with self._slots:
+            server = (None if fresh else self._take_idle()) or self._connect()
+            try:
+                yield server
+            except Exception:
+                # Estado da sessão é incerto após um erro: não devolve ao pool
+                self._close(server)
+                raise
+            with self._lock:
+                self._idle.append((server, time.monotonic()))
+
+    def send_message(self, msg):
+        try:
+            with self.session() as server:
+                server.send_message(msg)
+        except self._RETRYABLE as e:
+            logging.warning(f"Sessão SMTP perdida ({e}); reconectando e reenviando.")
+            self.close_all()
+            with self.session(fresh=True) as server:
+                server.send_message(msg)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+class RecipientCache:
+    """Lista de e-mails dos destinatários ativos, recarregada do banco só após invalidação ou TTL."""
+    def __init__(self, ttl=RECIPIENTS_CACHE_TTL):
+        self.ttl = ttl
+        self._emails = None
+        self._loaded_at = 0.0
+        self._generation = 0  # Uma carga iniciada antes da invalidação não sobrescreve o cache
+        self._lock = threading.Lock()
+
+    def get(self):
+        emails, loaded_at = self._emails, self._loaded_at
+        if emails is not None and time.monotonic() - loaded_at < self.ttl:
+            return list(emails)
+        from src.database_handler import DatabaseHandler
+        generation = self._generation
+        emails = [r['email'] for r in DatabaseHandler.get_all_recipients(only_active=True)]
+        with self._lock:
+            if generation == self._generation:
+                self._emails, self._loaded_at = emails, time.monotonic()
+        return list(emails)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._emails = None
+
+smtp_pool = SMTPConnectionPool()
+recipient_cache = RecipientCache()
 
 class EmailNotifier:
     def __init__(self, max_workers=2):
@@ -15,63 +140,80 @@ class EmailNotifier:
         self.username = SMTP_USERNAME
         self.password = SMTP_PASSWORD
         self.email_pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.outbox = None
         
     def _get_database_recipients(self):
-        """Busca destinatários ativos do banco de dados."""
-        from src.database_handler import DatabaseHandler
-        active_recipients = DatabaseHandler.get_all_recipients(only_active=True)
-        return [r['email'] for r in active_recipients]
+        """Busca destinatários ativos (cache invalidado pelas rotas de administração)."""
+        return recipient_cache.get()
 
     def _send_email(self, subject, message, is_error=False, attachments=None): # attachments is now a list
         try:
-            # Fix subject encoding
-            subject = subject.encode('latin1', 'ignore').decode('latin1')
-            
-            # Tenta carregar do banco primeiro para priorizar escalabilidade do Admin
-            db_recipients = self._get_database_recipients()
-            if is_error:
-                recipients = ERROR_RECIPIENTS if ERROR_RECIPIENTS and ERROR_RECIPIENTS[0] else db_recipients
-            else:
-                recipients = db_recipients if db_recipients else PRODUCTION_RECIPIENTS
-
-            if not recipients:
-                logging.warning("Nenhum destinatário de e-mail configurado no banco ou .env")
-                return
-
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.sender_email
-            msg['To'] = ", ".join(recipients)
-            msg['Subject'] = subject
-
-            # Add HTML version
-            msg.attach(MIMEText(message['text'], 'plain', 'utf-8'))
-            msg.attach(MIMEText(message['html'], 'html', 'utf-8'))
-            
-            if attachments: # attachments is a list of dicts
-                for att_info in attachments:
-                    attachment_filename = att_info.get('filename')
-                    attachment_content = att_info.get('content')
-                    if attachment_filename and attachment_content:
-                        try:
-                            part = MIMEApplication(attachment_content)
-                            part.add_header('Content-Disposition', 'attachment', 
-                                          filename=attachment_filename)
-                            msg.attach(part)
-                            logging.info(f"Arquivo anexado: {attachment_filename}")
-                        except Exception as e:
-                            logging.error(f"Erro ao criar anexo MIME para {attachment_filename}: {str(e)}")
-
-            with smtplib.SMTP(self.smtp_server, self.port) as server:
-                server.starttls()
-                server.login(self.username, self.password)
-                server.send_message(msg)
-                logging.info(f"Email enviado: {subject}")
-                
+            self.deliver(subject, message, is_error, attachments)
         except Exception as e:
             logging.error(f"Erro ao enviar email: {str(e)}")
 
-    def send_notification(self, subject, message, is_error=False, attachments=None): # attachments is now a list
-        """Envia email de forma assíncrona usando thread pool"""
+    def resolve_recipients(self, is_error=False):
+        # Tenta carregar do banco primeiro para priorizar escalabilidade do Admin
+        db_recipients = self._get_database_recipients()
+        if is_error:
+            return ERROR_RECIPIENTS if ERROR_RECIPIENTS and ERROR_RECIPIENTS[0] else db_recipients
+        return db_recipients if db_recipients else PRODUCTION_RECIPIENTS
+
+    def deliver(self, subject, message, is_error=False, attachments=None, recipients=None):
+        """Envia imediatamente pela sessão SMTP do pool.
+
+        Propaga erros de envio (a outbox decide a retentativa); retorna False se não houver destinatários.
+        """
+        # Fix subject encoding
+        subject = subject.encode('latin1', 'ignore').decode('latin1')
+        recipients = [r for r in (recipients or self.resolve_recipients(is_error)) if r]
+
+        if not recipients:
+            logging.warning("Nenhum destinatário de e-mail configurado no banco ou .env")
+            return False
+
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.sender_email
+        msg['To'] = ", ".join(recipients)
+        msg['Subject'] = subject
+
+        # Add HTML version
+        msg.attach(MIMEText(message['text'], 'plain', 'utf-8'))
+        msg.attach(MIMEText(message['html'], 'html', 'utf-8'))
+
+        if attachments: # attachments is a list of dicts
+            for att_info in attachments:
+                attachment_filename = att_info.get('filename')
+                attachment_content = att_info.get('content')
+                if attachment_filename and attachment_content:
+                    try:
+                        part = MIMEApplication(attachment_content)
+                        part.add_header('Content-Disposition', 'attachment',
+                                      filename=attachment_filename)
+                        msg.attach(part)
+                        logging.info(f"Arquivo anexado: {attachment_filename}")
+                    except Exception as e:
+                        logging.error(f"Erro ao criar anexo MIME para {attachment_filename}: {str(e)}")
+
+        smtp_pool.send_message(msg)
+        logging.info(f"Email enviado: {subject}")
+        return True
+
+    def attach_outbox(self, outbox):
+        """Passa a gravar as notificações na outbox persistente em vez do pool em memória."""
+        self.outbox = outbox
+
+    def send_notification(self, subject, message, is_error=False, attachments=None, coalesce_key=None): # attachments is now a list
+        """Envia email de forma assíncrona (outbox persistente se ativa, senão thread pool).
+
+        `coalesce_key` agrupa alertas repetidos (ex.: mesma máquina/lote) em um único resumo.
+        """
+        if self.outbox and not attachments:
+            try:
+                self.outbox.enqueue(subject, message, is_error=is_error, coalesce_key=coalesce_key)
+                return
+            except Exception as e:
+                logging.error(f"Erro ao gravar e-mail na outbox, enviando pelo pool: {e}")
         self.email_pool.submit(self._send_email, subject, message, is_error, attachments)
     
     def __del__(self):
@@ -95,10 +237,9 @@ def send_email_direct(to, subject, message, attachments=None):
                     part = MIMEApplication(attachment_content)
                     part.add_header('Content-Disposition', 'attachment', filename=attachment_filename)
                     msg.attach(part)
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
-            logging.info(f"Email enviado para {to}: {subject}")
+        smtp_pool.send_message(msg)
+        logging.info(f"Email enviado para {to}: {subject}")
+        return True
     except Exception as e:
-        logging.error(f"Erro ao enviar email direto: {str(e)}")
\ No newline at end of file
+        logging.error(f"Erro ao enviar email direto: {str(e)}")
+        return False
\ No newline at end of file
@@ -6,6 +6,8 @@ import os
 import subprocess
 import platform
 import tempfile
+import queue
+from concurrent.futures import Future
 from datetime import datetime, timedelta
 
 from timezone_utils import get_current_sao_paulo_time
@@ -14,7 +16,13 @@ from email_templates import format_plc_error_message, format_late_lot_alert
 from src.database_handler import DatabaseHandler
 from src.models import PLCReportData
 from src.data_handler import ProductionDataHandler
-from src.monitor_utils import get_current_shift
+from src.monitor_utils import get_current_shift, get_production_date
+from src.metrics import PLC_READ_SECONDS, PLC_READ_FAILURES, PLC_RECONNECTS, PLC_CYCLE_ERRORS, PLC_TRIGGER_EVENTS, PLC_DB_WRITE_SECONDS
+
+# Canal de comandos (escritas vindas da API), drenado pela thread de aquisição entre leituras
+PLC_COMMAND_TIMEOUT = float(os.getenv("PLC_COMMAND_TIMEOUT", 15))      # Prazo padrão de cada comando (s)
+PLC_COMMANDS_PER_CYCLE = int(os.getenv("PLC_COMMANDS_PER_CYCLE", 5))   # Máximo executado por ciclo
+PLC_COMMAND_QUEUE_SIZE = int(os.getenv("PLC_COMMAND_QUEUE_SIZE", 20))
 
 class PLCHandler:
     def __init__(self, config, plc_name, shared_data_manager, email_notifier, email_lock_dir):
@@ -36,6 +44,8 @@ class PLCHandler:
         self.day_start_stroke = None          # Referência para produção diária (06:00)
         self.initial_stroke_counter = None    # Referência para a bobina atual (Troca de Bobina)
         self.last_shift_sync_stroke = None    # Referência para o turno atual (Virada de Turno)
+        self.shift_segment_date = None        # Data industrial em que o trecho de turno atual começou
+        self.coil_shift_segments = []         # Golpes por turno da bobina atual (convertidos em copos na troca)
         
         self.last_reset_date = None
         self.connected = False
@@ -52,6 +62,8 @@ class PLCHandler:
         self.last_cup_size = None
         self.last_bobina_value = None
         self.pending_lot_checks = [] # Lista de alertas pendentes [{time, lot}]
+        self.commands = queue.Queue(maxsize=PLC_COMMAND_QUEUE_SIZE) # [(descrição, função, args, prazo, future)]
+        self.last_cycle_started = None # time.monotonic() do último ciclo (métrica de deriva do loop)
         self._load_persisted_state()
 
     def _load_persisted_state(self):
@@ -64,13 +76,10 @@ class PLCHandler:
                 if last_update_str:
                     now = get_current_sao_paulo_time()
                     # Regra industrial: Dia começa as 06:00 (com buffer de 30s)
-                    def get_prod_date(dt):
-                        return (dt - timedelta(hours=6, seconds=30)).date()
-                    
                     last_update = datetime.strptime(last_update_str, "%Y-%m-%d %H:%M:%S")
-                    if get_prod_date(last_update) == get_prod_date(now):
+                    if get_production_date(last_update) == get_production_date(now):
                         self.count_discharge_total = record.get('daily_total', 0)
-                        self.last_reset_date = get_prod_date(now)
+                        self.last_reset_date = get_production_date(now)
                         logging.info(f"[{self.plc_name}] ♻️ Estado recuperado: Total Diário = {self.count_discharge_total}")
         except Exception as e:
             logging.error(f"[{self.plc_name}] Falha ao carregar estado: {e}")
@@ -88,13 +97,16 @@ class PLCHandler:
             if test_read.Status == "Success":
                 self.connected = True
                 self.reconnect_attempt = 0
+                PLC_RECONNECTS.inc(self.plc_name, "success")
                 return True
             else:
                 logging.warning(f"[{self.plc_name}] Falha de leitura na conexão: {test_read.Status}")
+                PLC_RECONNECTS.inc(self.plc_name, "failure")
                 self.plc.Close()
                 return False
         except Exception as e:
             logging.error(f"[{self.plc_name}] Erro ao conectar: {e}")
+            PLC_RECONNECTS.inc(self.plc_name, "failure")
             return False
 
     def determine_cup_size(self, feed_value):
@@ -130,8 +142,10 @@ class PLCHandler:
 
             # --- 2. LEITURA EM LOTE (PERFORMANCE) ---
             tags = [stroke_tag, tool_size_tag, feed_tag, bobina_tag, trigger_coil_tag]
-            results = self.plc.Read(tags)
+            with PLC_READ_SECONDS.time(self.plc_name):
+                results = self.plc.Read(tags)
             if any(r.Status != 'Success' for r in results):
+                PLC_READ_FAILURES.inc(self.plc_name)
                 self.connected = False
                 return
 
@@ -145,13 +159,11 @@ class PLCHandler:
             current_cup_size = self.determine_cup_size(current_feed_val)
 
             # --- 3. GESTÃO DE REFERÊNCIAS (RESET DIÁRIO) ---
-            def get_prod_date(dt):
-                return (dt - timedelta(hours=6, seconds=30)).date()
-            
-            current_prod_date = get_prod_date(now_sp)
+            current_prod_date = get_production_date(now_sp)
             if self.last_reset_date is None or self.last_reset_date < current_prod_date:
                 self.day_start_stroke = current_stroke
                 self.last_reset_date = current_prod_date
+                PLC_TRIGGER_EVENTS.inc(self.plc_name, "new_day")
                 logging.info(f"[{self.plc_name}] 🌅 Novo dia industrial: {current_prod_date} | Stroke referência {current_stroke}")
 
             # Inicialização de emergência
@@ -159,6 +171,7 @@ class PLCHandler:
             if self.initial_stroke_counter is None: self.initial_stroke_counter = current_stroke
             if self.last_shift_sync_stroke is None: self.last_shift_sync_stroke = current_stroke
             if self.last_coil_start_time is None: self.last_coil_start_time = now_sp
+            if self.shift_segment_date is None: self.shift_segment_date = current_prod_date
 
             # --- 4. CÁLCULOS TIPO "TRIGGER" (SUBTRAÇÃO E MULTIPLICAÇÃO) ---
             # Total Diário: (Atual - Início do Dia) * Ferramenta
@@ -171,73 +184,91 @@ class PLCHandler:
             lote_atual = DatabaseHandler.get_lote_from_db(self.plc_name)
             current_shift = get_current_shift()
             
-            DatabaseHandler.update_current_production(
-                machine_name=self.plc_name,
-                current_cups=current_main_value,
-                shift=current_shift,
-                coil_number=lote_atual,
-                feed_value=current_feed_val,
-                size=current_cup_size,
-                status='ATIVO',
-                daily_total=self.count_discharge_total
-            )
+            with PLC_DB_WRITE_SECONDS.time(self.plc_name, "current_production"):
+                DatabaseHandler.update_current_production(
+                    machine_name=self.plc_name,
+                    current_cups=current_main_value,
+                    shift=current_shift,
+                    coil_number=lote_atual,
+                    feed_value=current_feed_val,
+                    size=current_cup_size,
+                    status='ATIVO',
+                    daily_total=self.count_discharge_total
+                )
 
             # --- 6. TRIGGER: MUDANÇA DE TURNO ---
             if self.current_shift_tracker != current_shift:
+                PLC_TRIGGER_EVENTS.inc(self.plc_name, "shift_change")
                 strokes_turno = current_stroke - self.last_shift_sync_stroke
                 if strokes_turno > 0:
                     prod = int(strokes_turno * current_tool_size)
                     try:
-                        DatabaseHandler.insert_production_record(
-                            machine_name=self.plc_name,
-                            coil_number=lote_atual,
-                            cups_produced=prod,
-                            consumption_type="Fechamento Turno",
-                            shift=self.current_shift_tracker,
-                            absolute_counter=current_main_value,
-                            coil_type=get_bobina_type_from_config(self.plc_name),
-                            can_size=current_cup_size
-                        )
+                        coil_type = DatabaseHandler.get_bobina_type_from_db(self.plc_name)
+                        with PLC_DB_WRITE_SECONDS.time(self.plc_name, "production_record"):
+                            DatabaseHandler.insert_production_record(
+                                machine_name=self.plc_name,
+                                coil_number=lote_atual,
+                                cups_produced=prod,
+                                consumption_type="Fechamento Turno",
+                                shift=self.current_shift_tracker,
+                                absolute_counter=current_main_value,
+                                coil_type=coil_type,
+                                can_size=current_cup_size
+                            )
                         logging.info(f"[{self.plc_name}] 🌓 Turno finalizado. Produção: {prod}")
+                        self._notify_production_record()
                     except Exception as e: logging.error(f"Erro turno: {e}")
+                    self._add_coil_shift_segment(self.current_shift_tracker, strokes_turno)
                 self.last_shift_sync_stroke = current_stroke
                 self.current_shift_tracker = current_shift
+                self.shift_segment_date = current_prod_date
 
             # --- 7. TRIGGER: TROCA DE BOBINA ---
             if current_trigger_coil == 1 and not self.coil_change_active:
                 self.coil_change_active = True
+                PLC_TRIGGER_EVENTS.inc(self.plc_name, "coil_change")
                 strokes_bobina = current_stroke - self.initial_stroke_counter
                 total_bobina = int(max(0, strokes_bobina) * current_tool_size)
                 tipo = "Completa" if current_bobina_val == 2 else "Parcial"
+
+                # Fecha o trecho do turno corrente: o detalhamento por turno da bobina fica completo
+                strokes_trecho = current_stroke - self.last_shift_sync_stroke
+                if strokes_trecho > 0:
+                    self._add_coil_shift_segment(current_shift, strokes_trecho)
+                shift_breakdown = self._coil_shift_breakdown(current_tool_size, total_bobina)
                 
                 try:
                     c_type = DatabaseHandler.get_bobina_type_from_db(self.plc_name)
                     # Registro para Consumo
-                    DatabaseHandler.insert_coil_consumption_record(
-                        machine_name=self.plc_name,
-                        coil_id=f"{lote_atual}-{now_sp.strftime('%H%M%S')}",
-                        lot_number=lote_atual,
-                        start_time=self.last_coil_start_time,
-                        end_time=now_sp,
-                        consumed_quantity=total_bobina,
-                        unit="cups",
-                        production_date=self.last_reset_date.strftime('%Y-%m-%d'),
-                        shift=current_shift,
-                        consumption_type=tipo,
-                        coil_type=c_type
-                    )
+                    with PLC_DB_WRITE_SECONDS.time(self.plc_name, "coil_consumption"):
+                        DatabaseHandler.insert_coil_consumption_record(
+                            machine_name=self.plc_name,
+                            coil_id=f"{lote_atual}-{now_sp.strftime('%H%M%S')}",
+                            lot_number=lote_atual,
+                            start_time=self.last_coil_start_time,
+                            end_time=now_sp,
+                            consumed_quantity=total_bobina,
+                            unit="cups",
+                            production_date=self.last_reset_date.strftime('%Y-%m-%d'),
+                            shift=current_shift,
+                            consumption_type=tipo,
+                            coil_type=c_type,
+                            shift_breakdown=shift_breakdown
+                        )
                     # Registro para Reporte ERP
-                    DatabaseHandler.insert_production_record(
-                        machine_name=self.plc_name,
-                        coil_number=lote_atual,
-                        cups_produced=total_bobina,
-                        consumption_type=f"REPORTE TOTAL - {tipo}",
-                        shift=current_shift,
-                        absolute_counter=current_main_value,
-                        coil_type=c_type,
-                        can_size=current_cup_size
-                    )
+                    with PLC_DB_WRITE_SECONDS.time(self.plc_name, "production_record"):
+                        DatabaseHandler.insert_production_record(
+                            machine_name=self.plc_name,
+                            coil_number=lote_atual,
+                            cups_produced=total_bobina,
+                            consumption_type=f"REPORTE TOTAL - {tipo}",
+                            shift=current_shift,
+                            absolute_counter=current_main_value,
+                            coil_type=c_type,
+                            can_size=current_cup_size
+                        )
                     logging.info(f"[{self.plc_name}] 🏁 Bobina finalizada. Total: {total_bobina}")
+                    self._notify_production_record()
                 except Exception as e: logging.error(f"Erro trigger bobina: {e}")
 
                 # Agenda verificação de Lote para daqui a 3 horas
@@ -253,6 +284,8 @@ class PLCHandler:
                 self.initial_stroke_counter = current_stroke
                 self.last_shift_sync_stroke = current_stroke
                 self.last_coil_start_time = now_sp
+                self.coil_shift_segments = []
+                self.shift_segment_date = current_prod_date
 
             if current_trigger_coil == 0:
                 self.coil_change_active = False
@@ -267,6 +300,7 @@ class PLCHandler:
                     if current_lote_check == check['lot']:
                         # Envia o alerta com informações de timing
                         self._send_late_lot_alert(check['lot'], check.get('start_time'), now_sp)
+                        PLC_TRIGGER_EVENTS.inc(self.plc_name, "late_lot_alert")
                         logging.warning(f"[{self.plc_name}] ⏱️ ALERTA 3H DISPARADO: Lote '{check['lot']}' não foi alterado após 3 horas de produção")
                     else:
                         logging.info(f"[{self.plc_name}] ✓ Lote foi alterado antes do disparo do alerta (de '{check['lot']}' para '{current_lote_check}')")
@@ -277,7 +311,8 @@ class PLCHandler:
 
             # --- 8. LOGS LOCAIS E CACHE ---
             if current_main_value != self.last_main_value:
-                self.data_handler.log_production(current_main_value, current_feed_val, current_cup_size)
+                with PLC_DB_WRITE_SECONDS.time(self.plc_name, "production_detail"):
+                    self.data_handler.log_production(current_main_value, current_feed_val, current_cup_size)
                 self.last_main_value = current_main_value
                 self.main_value = current_main_value
                 self.feed_value = current_feed_val
@@ -286,8 +321,41 @@ class PLCHandler:
 
         except Exception as e:
             logging.error(f"[{self.plc_name}] Erro no ciclo: {e}")
+            PLC_CYCLE_ERRORS.inc(self.plc_name)
             self.connected = False
 
+    def _notify_production_record(self):
+        """Avisa os painéis conectados ao stream que há um novo registro de produção."""
+        if self.shared_data_manager:
+            self.shared_data_manager.notify_production_record(self.plc_name)
+
+    def _add_coil_shift_segment(self, shift, strokes):
+        """Acumula os golpes de um trecho de turno na bobina atual (agrupando turno/dia repetidos)."""
+        production_date = self.shift_segment_date.strftime('%Y-%m-%d')
+        for segment in self.coil_shift_segments:
+            if segment['shift'] == shift and segment['production_date'] == production_date:
+                segment['strokes'] += strokes
+                return
+        self.coil_shift_segments.append({'shift': shift, 'production_date': production_date, 'strokes': strokes})
+
+    def _coil_shift_breakdown(self, tool_size, consumed_quantity):
+        """Converte os golpes por turno em copos de uma vez, no fechamento da bobina.
+
+        A conversão é acumulada (cada trecho recebe a diferença entre os totais truncados), de modo que
+        a soma dos trechos é exatamente `consumed_quantity`; qualquer sobra fica com o último trecho.
+        """
+        breakdown = []
+        strokes_acc = 0
+        cups_acc = 0
+        for segment in self.coil_shift_segments:
+            strokes_acc += segment['strokes']
+            cups = int(strokes_acc * tool_size) - cups_acc
+            cups_acc += cups
+            breakdown.append({'shift': segment['shift'], 'production_date': segment['production_date'], 'total_cups': cups})
+        if breakdown:
+            breakdown[-1]['total_cups'] += consumed_quantity - cups_acc
+        return breakdown
+
     def _send_late_lot_alert(self, old_lot, start_time=None, alert_time=None):
         """Envia email de alerta se o lote não foi trocado após 3 horas.
         
@@ -305,7 +373,9 @@ class PLCHandler:
         # Tenta usar email_notifier se disponível, senão usa método direto
         try:
             if self.email_notifier:
-                self.email_notifier.send_notification(subject, message, is_error=False)
+                # Repetições do mesmo alerta (máquina/lote) dentro da janela viram um único resumo
+                self.email_notifier.send_notification(subject, message, is_error=False,
+                                                      coalesce_key=f"late_lot:{self.plc_name}:{old_lot}")
                 logging.info(f"[{self.plc_name}] 📧 Email de alerta do lote '{old_lot}' agendado no pool (3h).")
             else:
                 # Fallback para envio direto
@@ -314,8 +384,54 @@ class PLCHandler:
         except Exception as e:
             logging.error(f"[{self.plc_name}] ❌ Erro ao enviar alerta de lote {old_lot}: {e}")
 
+    def submit_write_lote(self, lote_value, timeout=PLC_COMMAND_TIMEOUT) -> Future:
+        """Enfileira a gravação do lote; o resultado (bool) chega pelo Future retornado."""
+        return self._submit_command(f"write_lote({lote_value})", self.write_lote, (lote_value,), timeout)
+
+    def _submit_command(self, description, func, args, timeout):
+        future = Future()
+        try:
+            self.commands.put_nowait((description, func, args, time.monotonic() + timeout, future))
+        except queue.Full:
+            logging.warning(f"[{self.plc_name}] Fila de comandos cheia, descartando {description}")
+            future.set_result(False)
+        return future
+
+    def drain_commands(self, max_commands=PLC_COMMANDS_PER_CYCLE):
+        """Executa os comandos pendentes na thread de aquisição (mesma sessão CIP das leituras).
+
+        Limitado a `max_commands` por ciclo para manter a cadência de leitura; comandos com
+        prazo vencido ou cancelados pelo chamador são descartados sem tocar no PLC.
+        """
+        for _ in range(max_commands):
+            try:
+                description, func, args, deadline, future = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            if time.monotonic() > deadline:
+                logging.warning(f"[{self.plc_name}] Comando expirado antes da execução: {description}")
+                future.set_result(False)
+                continue
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                logging.error(f"[{self.plc_name}] Erro ao executar {description}: {e}")
+                future.set_exception(e)
+
+    def fail_pending_commands(self):
+        """Resolve com False os comandos que não serão mais executados (handler descartado)."""
+        while True:
+            try:
+                _, _, _, _, future = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if future.set_running_or_notify_cancel():
+                future.set_result(False)
+
     def write_lote(self, lote_value):
-        """Grava o lote no PLC."""
+        """Grava o lote no PLC. Chamar apenas pela thread de aquisição (use submit_write_lote)."""
         if not self.connected or not self.plc: return False
         lote_tag = self.TAG_CONFIG.get('lote_tag')
         if not lote_tag: return False
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Script de Manutenção: Reconstrói as tabelas de rollup (production_rollup / coil_rollup)
+a partir de todo o histórico de production_records e coil_consumption_lot.
+
+Maintenance Script: Rebuilds the rollup tables from the full production history.
+"""
+
+from src.database_handler import DatabaseHandler
+
+def rebuild():
+    """Recria os rollups em uma única transação."""
+    DatabaseHandler.init_db()
+    print("🔄 Reconstruindo rollups de produção...")
+    if DatabaseHandler.rebuild_rollups():
+        print("✅ Rollups reconstruídos com sucesso.")
+        return True
+    print("❌ Falha ao reconstruir rollups (verifique os logs).")
+    return False
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if rebuild() else 1)
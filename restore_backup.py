@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Script de Restauração: Reconstrói um banco a partir de uma cadeia de backup incremental
+(base completa + pedaços chunk_NNNNN.jsonl.gz) e recalcula os rollups.
+
+Restore Script: Rebuilds a database from an incremental backup chain (base + chunks)
+and recomputes the rollup tables.
+
+Uso / Usage:
+    python restore_backup.py <backups/incremental/chain_...> <destino.db> [--until=N]
+"""
+
+import os
+import sys
+import gzip
+import json
+import shutil
+import sqlite3
+from src.database_handler import DatabaseHandler
+from backup_utils import MANIFEST_FILE
+
+def _copy_base(base_path, target_db):
+    if base_path.endswith(".gz"):
+        with gzip.open(base_path, 'rb') as src, open(target_db, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    else:
+        shutil.copyfile(base_path, target_db)
+
+def _apply_chunk(conn, chunk_path):
+    """Aplica um pedaço: histórico com INSERT OR IGNORE (idempotente por id), estado substituído."""
+    applied = {}
+    table, sql = None, None
+    with gzip.open(chunk_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                table = record["table"]
+                columns = record["columns"]
+                if record["mode"] == "replace":
+                    conn.execute(f"DELETE FROM {table}")
+                placeholders = ", ".join("?" for _ in columns)
+                sql = f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+                applied.setdefault(table, 0)
+                continue
+            conn.execute(sql, record)
+            applied[table] += 1
+    return applied
+
+def restore(chain_dir, target_db, until=None):
+    """Restaura a base e aplica os pedaços em ordem (até o pedaço `until`, se informado)."""
+    if os.path.exists(target_db):
+        print(f"❌ O destino {target_db} já existe; escolha outro arquivo.")
+        return False
+
+    with open(os.path.join(chain_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    chunks = manifest["chunks"][:until] if until else manifest["chunks"]
+
+    print(f"🔄 Restaurando base {manifest['base']} ({manifest['created_at']})...")
+    _copy_base(os.path.join(chain_dir, manifest["base"]), target_db)
+
+    conn = sqlite3.connect(target_db)
+    try:
+        for chunk in chunks:
+            applied = _apply_chunk(conn, os.path.join(chain_dir, chunk["file"]))
+            print(f"   + {chunk['file']} ({chunk['created_at']}): {sum(applied.values())} linhas")
+        print("🔄 Reconstruindo rollups de produção...")
+        DatabaseHandler._rebuild_rollups(conn)
+        conn.commit()
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Falha na restauração: {e}")
+        return False
+    finally:
+        conn.close()
+
+    if result != "ok":
+        print(f"❌ Verificação de integridade falhou: {result}")
+        return False
+    print(f"✅ Banco restaurado em {target_db} ({len(chunks)} incrementais aplicados).")
+    return True
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--until=")]
+    until = next((int(a.split("=", 1)[1]) for a in sys.argv[1:] if a.startswith("--until=")), None)
+    if len(args) != 2:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(0 if restore(args[0], args[1], until) else 1)
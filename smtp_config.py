@@ -12,6 +12,10 @@ SMTP_USE_AUTH = os.getenv("SMTP_USE_AUTH", "True") == "True"
 SMTP_AUTH_TYPE = os.getenv("SMTP_AUTH_TYPE", "basic")
 SMTP_TIMEOUT = int(os.getenv("SMTP_TIMEOUT", 30))
 SMTP_MAX_SIZE = int(os.getenv("SMTP_MAX_SIZE", 20))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 2))            # Sessões SMTP simultâneas reutilizáveis
+SMTP_IDLE_TIMEOUT = int(os.getenv("SMTP_IDLE_TIMEOUT", 120))     # Sessão ociosa além disso é fechada (s)
+SMTP_NOOP_INTERVAL = int(os.getenv("SMTP_NOOP_INTERVAL", 15))    # Ociosa além disso é testada com NOOP (s)
+RECIPIENTS_CACHE_TTL = int(os.getenv("RECIPIENTS_CACHE_TTL", 300))
 NOTIFICATION_RECIPIENTS = os.getenv("NOTIFICATION_RECIPIENTS", "").split(",")
 ERROR_RECIPIENTS = os.getenv("ERROR_RECIPIENTS", "").split(",")
 PRODUCTION_RECIPIENTS = os.getenv("PRODUCTION_RECIPIENTS", "").split(",")
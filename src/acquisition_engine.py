@@ -0,0 +1,125 @@
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class AsyncAcquisitionEngine:
+    """Agenda a leitura de todos os PLCs em um único event loop.
+
+    Cada máquina vira uma task asyncio leve; as chamadas bloqueantes (pylogix e SQLite)
+    rodam em um pool fixo de workers. Adicionar linhas não cria novas threads de SO.
+    """
+    def __init__(self, manager, max_workers=4):
+        self.manager = manager
+        self.max_workers = max_workers
+        self.loop = None
+        self.executor = None
+        self.tasks = {}  # {plc_name: asyncio.Task}
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        """Sobe o event loop em uma thread dedicada e aguarda ele ficar pronto."""
+        if self._thread and self._thread.is_alive():
+            return
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="PLC-Worker")
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True, name="PLC-Acquisition")
+        self._thread.start()
+        self._ready.wait()
+        logging.info(f"Motor de aquisição assíncrono iniciado ({self.max_workers} workers).")
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def _call(self, coro, timeout=5):
+        """Executa uma corrotina no loop do motor a partir de outra thread (API, lifespan)."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(timeout=timeout)
+
+    def add_machine(self, plc_name: str, config: dict):
+        self._call(self._add_machine(plc_name, config))
+
+    def remove_machine(self, plc_name: str):
+        self._call(self._remove_machine(plc_name))
+
+    def is_running(self, plc_name: str) -> bool:
+        task = self.tasks.get(plc_name)
+        return task is not None and not task.done()
+
+    def stop(self):
+        """Cancela todas as tasks, encerra o loop e o pool de workers."""
+        if not self.loop or not self.loop.is_running():
+            return
+        try:
+            self._call(self._remove_all(), timeout=10)
+        except Exception as e:
+            logging.error(f"Erro ao encerrar tasks de aquisição: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self._close_worker_connections()
+        self.executor.shutdown(wait=False)
+
+    def _close_worker_connections(self, timeout=5):
+        """Fecha a conexão SQLite thread-local de cada worker antes de descartar o pool.
+
+        Uma tarefa por worker: a barreira segura cada thread até todas terem recebido a sua,
+        senão um mesmo worker livre poderia executar todas. Worker travado em uma leitura além
+        do timeout fica com a conexão aberta (fechada pelo close_all do desligamento).
+        """
+        from src.database_handler import DatabaseHandler
+        barrier = threading.Barrier(self.max_workers)
+
+        def close_connection():
+            try:
+                barrier.wait(timeout)
+            except threading.BrokenBarrierError:
+                pass
+            DatabaseHandler.close_connection()
+
+        futures = [self.executor.submit(close_connection) for _ in range(self.max_workers)]
+        _, pending = wait(futures, timeout=timeout + 1)
+        if pending:
+            logging.warning(f"{len(pending)} worker(s) de aquisição não liberaram a conexão SQLite a tempo.")
+
+    async def _add_machine(self, plc_name, config):
+        await self._remove_machine(plc_name)
+        self.tasks[plc_name] = self.loop.create_task(self._machine_task(plc_name, config), name=f"Monitor-{plc_name}")
+
+    async def _remove_machine(self, plc_name):
+        task = self.tasks.pop(plc_name, None)
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _remove_all(self):
+        for plc_name in list(self.tasks):
+            await self._remove_machine(plc_name)
+
+    async def _machine_task(self, plc_name, config):
+        """Equivalente assíncrono do _monitor_loop: mesmo ciclo, mesmas esperas."""
+        handler = None
+        task = asyncio.current_task()
+        # Chamado de dentro do worker: remoção/reinício trocam a task registrada para a máquina
+        is_active = lambda: self.tasks.get(plc_name) is task
+        try:
+            while True:
+                handler, delay = await self.loop.run_in_executor(
+                    self.executor, functools.partial(
+                        self.manager._run_cycle, config, plc_name, handler,
+                        self.manager.email_notifier, self.manager.lock_dir, is_active=is_active)
+                )
+                await asyncio.sleep(delay)
+        finally:
+            logging.info(f"Loop de monitoramento encerrado para {plc_name}")
@@ -1,16 +1,23 @@
 from fastapi import APIRouter, Form, Request, Depends, HTTPException, Query
 from typing import List, Optional
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response
 from fastapi.templating import Jinja2Templates
-from src.models import PLCStatsResponse, AllPLCsResponse, ShiftProductionSummary, LotProductionSummary, CoilConsumptionLot, ProductionShiftBreakdown
+from src.models import PLCStatsResponse, AllPLCsResponse, ShiftProductionSummary, ShiftProductionRollup, LotProductionSummary, CoilConsumptionLot, CoilConsumptionSummary, ProductionShiftBreakdown
 from src.database_handler import DatabaseHandler
+from src.async_db import async_db, report_db, run_blocking
+from src.lote_pipeline import lote_pipeline
+from src.email_outbox import email_outbox
+from src.db_maintenance import db_maintenance, TASKS as MAINTENANCE_TASKS
+from src.rate_limiter import rate_limiter
+from src.hostname_resolver import hostname_resolver
+from src.metrics import registry as metrics_registry
 from src.monitor_utils import get_current_shift
 from timezone_utils import get_current_sao_paulo_time
-from email_utils import EmailNotifier, send_email_direct
-from email_templates import format_lote_notification
+from email_utils import EmailNotifier, recipient_cache
 import logging
-import socket
-import subprocess
+import json
+import asyncio
+import math
 from datetime import datetime, timedelta
 
 router = APIRouter()
@@ -36,35 +43,6 @@ else:
     if AUTHORIZED_IP: security_info.append(f"IP={AUTHORIZED_IP}")
     logging.info(f"🛡️ Segurança: Token carregado ({' + '.join(security_info) if security_info else 'Token Livre'}).")
 
-# Rate Limiter Simples (In-Memory)
-class SimpleRateLimiter:
-    def __init__(self, requests_limit: int, window_seconds: int):
-        self.limit = requests_limit
-        self.window = window_seconds
-        self.history = {}
-
-    def is_allowed(self, client_id: str) -> bool:
-        now = datetime.now()
-        if client_id not in self.history:
-            self.history[client_id] = []
-        
-        # Remove registros antigos
-        self.history[client_id] = [t for t in self.history[client_id] if now - t < timedelta(seconds=self.window)]
-        
-        if len(self.history[client_id]) < self.limit:
-            self.history[client_id].append(now)
-            return True
-        return False
-
-# Rate Limiters: Configuráveis via .env
-DATA_MAX = int(os.getenv("RATE_LIMIT_DATA_MAX", 60))
-DATA_WINDOW = int(os.getenv("RATE_LIMIT_DATA_WINDOW", 10))
-CMD_MAX = int(os.getenv("RATE_LIMIT_COMMAND_MAX", 5))
-CMD_WINDOW = int(os.getenv("RATE_LIMIT_COMMAND_WINDOW", 60))
-
-data_limiter = SimpleRateLimiter(DATA_MAX, DATA_WINDOW)
-command_limiter = SimpleRateLimiter(CMD_MAX, CMD_WINDOW)
-
 # Variável global para acessar os dados compartilhados
 shared_data_manager = None
 plc_configs = {}
@@ -76,55 +54,6 @@ def init_api(sdm, configs, mm):
     plc_configs = configs
     monitor_manager = mm
 
-# Cache global para nomes de máquinas para acelerar requisições repetitivas
-hostname_cache = {}
-
-def resolve_hostname(ip_address: str) -> str:
-    """Resolve IP para Hostname com cache para performance extrema."""
-    if ip_address == "127.0.0.1":
-        return socket.gethostname().upper()
-    
-    # Retorna do cache se já resolveu este IP nos últimos 30 minutos
-    cached_info = hostname_cache.get(ip_address)
-    if cached_info:
-        cached_name, timestamp = cached_info
-        if datetime.now() - timestamp < timedelta(minutes=30):
-            return cached_name
-
-    # Lógica de resolução (DNS -> NBTSAT)
-    result_name = "UNKNOWN"
-    
-    # 1. Tentativa via DNS Reverso
-    try:
-        hostname_info = socket.gethostbyaddr(ip_address)
-        result_name = hostname_info[0].split('.')[0].upper()
-    except Exception:
-        # 2. Tentativa via FQDN
-        try:
-            fqdn = socket.getfqdn(ip_address)
-            if fqdn and fqdn != ip_address:
-                result_name = fqdn.split('.')[0].upper()
-        except Exception:
-            # 3. Tentativa via NBTSTAT (Específico Windows)
-            try:
-                result = subprocess.run(['nbtstat', '-A', ip_address], 
-                                    capture_output=True, text=True, timeout=2)
-                if result.returncode == 0:
-                    import re
-                    lines = result.stdout.splitlines()
-                    for line in lines:
-                        if "<00>" in line and "UNIQUE" in line:
-                            match = re.search(r'^\s*([A-Za-z0-9\-]+)', line)
-                            if match:
-                                result_name = match.group(1).upper()
-                                break
-            except Exception:
-                pass
-
-    # Salva no cache antes de retornar (mesmo se for UNKNOWN, para evitar retentativas lentas imediatas)
-    hostname_cache[ip_address] = (result_name, datetime.now())
-    return result_name
-
 @router.get("/", response_class=HTMLResponse, include_in_schema=False)
 @router.get("/lote.html", response_class=HTMLResponse, include_in_schema=False)
 async def read_root(request: Request):
@@ -165,7 +94,7 @@ async def admin_panel(request: Request):
 @router.get("/api/admin/plcs", tags=["Administração / Admin"])
 async def list_plcs_admin():
     """Lista todos os PLCs configurados no banco de dados."""
-    return DatabaseHandler.get_all_plcs()
+    return await async_db.get_all_plcs()
 
 @router.post("/api/admin/plcs", tags=["Administração / Admin"])
 async def save_plc_admin(request: Request):
@@ -175,7 +104,7 @@ async def save_plc_admin(request: Request):
     if client_token != MASTER_TOKEN:
         raise HTTPException(status_code=403, detail="Acesso administrativo negado.")
     
-    success = DatabaseHandler.save_plc(data)
+    success = await async_db.save_plc(data)
     if success:
         plc_name = data.get('name')
         # Atualiza o dicionário global de configurações para a API
@@ -200,6 +129,7 @@ async def save_plc_admin(request: Request):
             }
         }
         plc_configs[plc_name] = config
+        shared_data_manager.invalidate_snapshot()
         
         # Gerencia a thread de monitoramento dinamicamente
         if monitor_manager:
@@ -218,12 +148,13 @@ async def delete_plc_admin(name: str, request: Request):
     if client_token != MASTER_TOKEN:
         raise HTTPException(status_code=403, detail="Acesso administrativo negado.")
     
-    success = DatabaseHandler.delete_plc(name)
+    success = await async_db.delete_plc(name)
     if success:
         if monitor_manager:
             monitor_manager.remove_machine(name)
         if name in plc_configs:
             del plc_configs[name]
+        shared_data_manager.invalidate_snapshot()
         return {"success": True, "message": f"PLC {name} removido com sucesso."}
     return JSONResponse(status_code=500, content={"success": False, "message": "Erro ao deletar."})
 
@@ -232,7 +163,7 @@ async def delete_plc_admin(name: str, request: Request):
 @router.get("/api/admin/recipients", tags=["Administração / Admin"])
 async def list_recipients_admin():
     """Lista todos os destinatários de e-mail."""
-    return DatabaseHandler.get_all_recipients()
+    return await async_db.get_all_recipients()
 
 @router.post("/api/admin/recipients", tags=["Administração / Admin"])
 async def save_recipient_admin(request: Request):
@@ -242,7 +173,8 @@ async def save_recipient_admin(request: Request):
     if client_token != MASTER_TOKEN:
         raise HTTPException(status_code=403, detail="Acesso administrativo negado.")
     
-    success = DatabaseHandler.save_recipient(data['name'], data['email'], data.get('is_active', 1))
+    success = await async_db.save_recipient(data['name'], data['email'], data.get('is_active', 1))
+    recipient_cache.invalidate()
     if success:
         return {"success": True, "message": "Destinatário salvo."}
     return JSONResponse(status_code=500, content={"success": False, "message": "Erro ao salvar."})
@@ -254,11 +186,47 @@ async def delete_recipient_admin(recipient_id: int, request: Request):
     if client_token != MASTER_TOKEN:
         raise HTTPException(status_code=403, detail="Acesso administrativo negado.")
     
-    success = DatabaseHandler.delete_recipient(recipient_id)
+    success = await async_db.delete_recipient(recipient_id)
+    recipient_cache.invalidate()
     if success:
         return {"success": True, "message": "Destinatário removido."}
     return JSONResponse(status_code=500, content={"success": False, "message": "Erro ao deletar."})
 
+@router.get("/api/admin/email/outbox", tags=["Administração / Admin"])
+async def email_outbox_metrics():
+    """Métricas da outbox de e-mails: profundidade da fila, falhas e latência de envio."""
+    return await run_blocking(email_outbox.metrics)
+
+@router.get("/api/metrics", tags=["Manutenção / Maintenance"])
+async def prometheus_metrics():
+    """Métricas no formato texto do Prometheus: duração de leitura/ciclo/escritas por PLC, deriva do loop,
+    reconexões, falhas de leitura e eventos de trigger."""
+    return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/api/admin/rate_limit", tags=["Administração / Admin"])
+async def rate_limit_stats(request: Request):
+    """Requisições permitidas/bloqueadas por política e ocupação da tabela de clientes."""
+    client_token = request.headers.get("X-Terminal-Token")
+    if client_token != MASTER_TOKEN:
+        raise HTTPException(status_code=403, detail="Acesso administrativo negado.")
+    return rate_limiter.stats()
+
+@router.get("/api/admin/manutencao", tags=["Administração / Admin"])
+async def database_maintenance_status():
+    """Tamanho do banco/WAL, páginas livres e duração da última execução de cada tarefa de manutenção."""
+    return await run_blocking(db_maintenance.status)
+
+@router.post("/api/admin/manutencao/{tarefa}", tags=["Administração / Admin"])
+async def run_database_maintenance(tarefa: str, request: Request):
+    """Executa imediatamente uma tarefa de manutenção (checkpoint, optimize ou vacuum)."""
+    client_token = request.headers.get("X-Terminal-Token")
+    if client_token != MASTER_TOKEN:
+        raise HTTPException(status_code=403, detail="Acesso administrativo negado.")
+    if tarefa not in MAINTENANCE_TASKS:
+        raise HTTPException(status_code=404, detail=f"Tarefa desconhecida. Opções: {', '.join(MAINTENANCE_TASKS)}")
+    # Pool de relatórios: um checkpoint/vacuum demorado não ocupa os workers das consultas rápidas
+    return await run_blocking(db_maintenance.run_task, tarefa, True, pool="report")
+
 @router.post("/enviar_lote", response_class=JSONResponse, summary="✍️ Enviar Novo Lote / Send New Batch", tags=["Operação de Lotes / Batch Operations"])
 async def enviar_lote(request: Request,
                        lote: str = Form(..., description="Código do lote (mínimo 3 caracteres)"), 
@@ -269,14 +237,17 @@ async def enviar_lote(request: Request,
     """
     client_ip = request.client.host
     
-    # 1. Rate Limiting (Proteção contra Brute Force / DoS) - Usando command_limiter para escrita
-    if not command_limiter.is_allowed(client_ip):
+    # 1. Rate Limiting (Proteção contra Brute Force / DoS) - Política "command" para escrita
+    allowed, retry_after = rate_limiter.check(client_ip, "command")
+    if not allowed:
         logging.warning(f"RATE LIMIT (COMMAND): Tentativas excessivas de {client_ip}")
-        return JSONResponse(status_code=429, content={"success": False, "message": "Muitas solicitações de envio. Aguarde um minuto."})
+        return JSONResponse(status_code=429, content={"success": False, "message": "Muitas solicitações de envio. Aguarde um minuto."},
+                            headers={"Retry-After": str(math.ceil(retry_after))})
 
     try:
         client_token = request.headers.get("X-Terminal-Token")
-        client_hostname = resolve_hostname(client_ip)
+        # Decisão de autorização: exige resolução recente, nunca o nome vencido do cache
+        client_hostname = await hostname_resolver.resolve(client_ip, fresh=True)
         logging.info(f"Requisição de Lote: {client_hostname} ({client_ip}) -> PLC: {plc}")
         is_localhost = client_ip == "127.0.0.1"
         if not is_localhost:
@@ -311,40 +282,36 @@ async def enviar_lote(request: Request,
              return JSONResponse(status_code=404, content={"success": False, "message": f"PLC {plc} não encontrado."})
 
         # Lógica de salvar e notificar
-        DatabaseHandler.save_lote_to_db(plc, lote)
-        DatabaseHandler.save_bobina_type_to_db(plc, tipo_bobina)
+        await async_db.save_lote_to_db(plc, lote)
+        await async_db.save_bobina_type_to_db(plc, tipo_bobina)
+        if shared_data_manager:
+            shared_data_manager.notify_lote_change(plc, lote, tipo_bobina)
         
-        # Tenta escrever no PLC se o monitoramento estiver ativo
-        plc_write_success = False
-        if monitor_manager and plc in monitor_manager.handlers:
-            handler = monitor_manager.handlers[plc]
-            plc_write_success = handler.write_lote(lote)
-        
-        # Notificação por e-mail
-        try:
-            email_message = format_lote_notification(lote, plc, config)
-            # Destinatários carregados do banco de dados (Escalável via Admin)
-            active_recipients = DatabaseHandler.get_all_recipients(only_active=True)
-            recipients = [r['email'] for r in active_recipients]
-            
-            if recipients:
-                send_email_direct(
-                    to=recipients,
-                    subject=f"✅ Lote {lote} Inserido - {plc}",
-                    message=email_message
-                )
-        except Exception as e:
-            logging.error(f"Erro ao enviar notificação de lote: {e}")
-
-        msg = f"✅ Lote {lote} processado com sucesso para {plc}."
-        if not plc_write_success:
-            msg += " (Nota: Não foi possível gravar no PLC no momento, mas foi salvo no sistema)"
-
-        return JSONResponse(content={"success": True, "message": msg, "plc_written": plc_write_success})
+        # Gravação no PLC e e-mail seguem em segundo plano; o operador não espera pelo SMTP
+        handler = monitor_manager.handlers.get(plc) if monitor_manager else None
+        job = lote_pipeline.submit(plc, lote, tipo_bobina, config, handler)
+
+        msg = f"✅ Lote {lote} salvo para {plc}. Gravação no PLC e notificação em andamento."
+        return JSONResponse(content={
+            "success": True,
+            "message": msg,
+            "job_id": job["job_id"],
+            "status_url": f"/api/lote/status/{job['job_id']}"
+        })
     except Exception as e:
         logging.error(f"Erro em enviar_lote: {e}")
         return JSONResponse(content={"success": False, "message": str(e)}, status_code=500)
 
+@router.get("/api/lote/status/{job_id}", summary="⏳ Status do Envio de Lote / Batch Submission Status", tags=["Operação de Lotes / Batch Operations"])
+async def get_lote_job_status(job_id: str):
+    """
+    Acompanha as etapas em segundo plano de um envio de lote (gravação no PLC e e-mail).
+    """
+    job = lote_pipeline.get(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Envio não encontrado ou expirado"})
+    return job
+
 @router.get("/api/lote/{plc_name}", response_model=PLCStatsResponse, summary="📊 Status em Tempo Real / Real-time Status", tags=["Monitoramento / Monitoring"])
 async def get_plc_stats(plc_name: str):
     """
@@ -352,7 +319,10 @@ async def get_plc_stats(plc_name: str):
     """
     if plc_name not in plc_configs:
         return JSONResponse(status_code=404, content={"error": "Máquina não encontrada"})
+    return await run_blocking(_build_plc_stats, plc_name)
 
+def _build_plc_stats(plc_name: str) -> dict:
+    """Monta o status (tempo real + configuração) de uma máquina."""
     # Dados em tempo real do manager
     real_time_data = shared_data_manager.get_plc_data(plc_name)
     
@@ -399,19 +369,62 @@ async def get_all_plc_stats(request: Request):
     """
     Retorna o status consolidado de todas as máquinas monitoradas pelo sistema.
     """
-    if not data_limiter.is_allowed(request.client.host):
-        return JSONResponse(status_code=429, content={"error": "Muitas requisições. O sistema permite refreshes rápidos."})
-    dados_completos = {}
-    for plc_name in plc_configs:
-        stats = await get_plc_stats(plc_name)
-        dados_completos[plc_name] = stats
+    allowed, retry_after = rate_limiter.check(request.client.host, "data")
+    if not allowed:
+        return JSONResponse(status_code=429, content={"error": "Muitas requisições. O sistema permite refreshes rápidos."},
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+
+    # Snapshot reconstruído só quando algo muda; polls sem mudança custam uma comparação de ETag
+    shift = get_current_shift()
+    cached = shared_data_manager.peek_snapshot(key=shift)
+    etag, body = cached or await run_blocking(shared_data_manager.get_snapshot, _build_lotes_snapshot, key=shift)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _build_lotes_snapshot() -> bytes:
+    dados_completos = {plc_name: _build_plc_stats(plc_name) for plc_name in list(plc_configs)}
+    response = AllPLCsResponse(
+        dados_plcs=dados_completos,
+        lotes={name: dados["lote_atual"] for name, dados in dados_completos.items()},
+        timestamp=get_current_sao_paulo_time().strftime("%d/%m/%Y %H:%M:%S"),
+        total_plcs=len(dados_completos)
+    )
+    return response.model_dump_json().encode("utf-8")
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
 
-    return {
-        "dados_plcs": dados_completos,
-        "lotes": {name: dados["lote_atual"] for name, dados in dados_completos.items()},
-        "timestamp": get_current_sao_paulo_time().strftime("%d/%m/%Y %H:%M:%S"),
-        "total_plcs": len(dados_completos)
-    }
+STREAM_HEARTBEAT_SECONDS = int(os.getenv("STREAM_HEARTBEAT_SECONDS", 15))
+
+@router.get("/api/stream", summary="📡 Stream de Eventos em Tempo Real / Real-time Event Stream", tags=["Monitoramento / Monitoring"])
+async def stream_events(request: Request):
+    """
+    Server-Sent Events com as alterações das máquinas (evento `plc`), lotes enviados (`lote`)
+    e novos registros de produção (`producao`). Em `resync` o cliente deve recarregar /api/lotes.
+    """
+    queue = shared_data_manager.subscribe()
+
+    async def event_generator():
+        try:
+            yield "retry: 5000\nevent: hello\ndata: {}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            shared_data_manager.unsubscribe(queue)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @router.get("/api/producao/turno", response_model=List[ShiftProductionSummary], summary="📅 Histórico por Turno / Shift History", tags=["Relatórios de Produção / Production Reports"])
 async def get_shift_production(
@@ -427,9 +440,23 @@ async def get_shift_production(
     if start_date and not end_date:
         end_date = start_date
         
-    data = DatabaseHandler.get_production_by_shift(machine_name, start_date, end_date)
+    data = await report_db.get_production_by_shift(machine_name, start_date, end_date)
     return data
 
+@router.get("/api/producao/turno/resumo", response_model=List[ShiftProductionRollup], summary="🧮 Resumo por Turno / Shift Summary", tags=["Relatórios de Produção / Production Reports"])
+async def get_shift_production_summary(
+    machine_name: Optional[str] = Query(None, description="Filtrar por nome da máquina / Machine name"),
+    start_date: Optional[str] = Query(None, description="Data de início (YYYY-MM-DD) / Start date"),
+    end_date: Optional[str] = Query(None, description="Data de fim (YYYY-MM-DD) / End date")
+):
+    """
+    Retorna a produção agregada por dia industrial, turno, lote, formato e tipo de reporte
+    (uma linha por grupo, lida das tabelas de rollup). Para os registros individuais use /api/producao/turno.
+    """
+    if start_date and not end_date:
+        end_date = start_date
+    return await report_db.get_production_shift_summary(machine_name, start_date, end_date)
+
 @router.get("/api/producao/lote", response_model=List[CoilConsumptionLot], summary="📦 Histórico de Consumo por Bobina / Coil Consumption History", tags=["Relatórios de Produção / Production Reports"])
 async def get_lot_production(
     machine_name: Optional[str] = Query(None, description="Filtrar por nome da máquina (e.g., Cupper_22). Se omitido, retorna o último registro de cada máquina."),
@@ -447,7 +474,7 @@ async def get_lot_production(
 
     if machine_name:
         # Busca registros da máquina, limitando a 1 apenas se não houver filtros específicos
-        data = DatabaseHandler.get_coil_consumption_records(
+        data = await report_db.get_coil_consumption_records(
             machine_name=machine_name,
             start_date=start_date,
             end_date=end_date,
@@ -455,25 +482,23 @@ async def get_lot_production(
             limit=should_limit
         )
     else:
-        # If no machine_name, get all recent records and then filter to get the latest per machine
-        # This is a simplification; a more efficient way for SQLite would be a subquery with MAX(end_time)
-        # but requires more changes in DatabaseHandler. For now, fetch a reasonable limit and process.
-        all_records = DatabaseHandler.get_coil_consumption_records(
+        # Sem máquina: último registro de cada máquina direto no banco (ROW_NUMBER por máquina)
+        data = await report_db.get_latest_coil_consumption_per_machine(
             start_date=start_date,
             end_date=end_date,
-            lot_number=lot_number,
-            limit=50 # Fetch a reasonable number of recent records to find the latest for each machine
+            lot_number=lot_number
         )
-        
-        latest_records_per_machine = {}
-        for record in all_records:
-            if record['machine_name'] not in latest_records_per_machine:
-                latest_records_per_machine[record['machine_name']] = record
-        data = list(latest_records_per_machine.values())
 
-    # Preenche o detalhamento de turnos para cada lote encontrado
+    # Bobinas fechadas já trazem o detalhamento gravado na troca; só registros legados
+    # são recalculados, todos em uma única consulta (sem N+1)
+    stored = await report_db.get_stored_shift_breakdowns([r['id'] for r in data if r.get('breakdown_stored')])
+    legacy = {i: r for i, r in enumerate(data) if not r.get('breakdown_stored')}
+    computed = await report_db.get_shift_breakdowns(list(legacy.values())) if legacy else {}
+    breakdowns = {index: computed.get(pos, []) for pos, index in enumerate(legacy)}
+    breakdowns.update({i: stored.get(r['id'], []) for i, r in enumerate(data) if r.get('breakdown_stored')})
+
     results = []
-    for record in data:
+    for index, record in enumerate(data):
         # Extrai valores originais para processamento
         orig_start = record.get('start_time')
         orig_end = record.get('end_time')
@@ -486,29 +511,36 @@ async def get_lot_production(
         # Removemos production_date se não estiver no modelo Pydantic para evitar erros de validação
         if 'production_date' in proc_record:
             del proc_record['production_date']
+        proc_record.pop('breakdown_stored', None)
 
         model_record = CoilConsumptionLot(**proc_record)
         
-        # Busca o detalhamento usando os horários originais
         if orig_start and orig_end:
-            breakdown = DatabaseHandler.get_shift_breakdown(
-                machine_name=model_record.machine_name,
-                coil_number=model_record.lot_number,
-                start_time=orig_start,
-                end_time=orig_end
-            )
-            model_record.detalhe_turnos = [ProductionShiftBreakdown(**b) for b in breakdown]
+            model_record.detalhe_turnos = [ProductionShiftBreakdown(**b) for b in breakdowns.get(index, [])]
         results.append(model_record)
 
     return results
 
+@router.get("/api/producao/bobinas/resumo", response_model=List[CoilConsumptionSummary], summary="🧮 Resumo de Bobinas por Turno / Coil Summary by Shift", tags=["Relatórios de Produção / Production Reports"])
+async def get_coil_summary(
+    machine_name: Optional[str] = Query(None, description="Filtrar por nome da máquina / Machine name"),
+    start_date: Optional[str] = Query(None, description="Data de início (YYYY-MM-DD) / Start date"),
+    end_date: Optional[str] = Query(None, description="Data de fim (YYYY-MM-DD) / End date")
+):
+    """
+    Retorna a quantidade de bobinas e o total consumido por dia industrial, turno e lote.
+    """
+    if start_date and not end_date:
+        end_date = start_date
+    return await report_db.get_coil_consumption_summary(machine_name, start_date, end_date)
+
 @router.get("/api/producao/recente", summary="🕒 Últimos Registros de Produção / Recent Production Records", tags=["Relatórios de Produção / Production Reports"])
 async def get_recent_production_records(machine_name: Optional[str] = None, limit: int = 20):
     """
     Retorna os últimos registros de produção gravados no banco de dados. / Returns the last production records saved in the database.
     Útil para verificar as últimas atividades de troca de bobina ou fechamento de turno. / Useful for checking recent coil changes or shift closings.
     """
-    data = DatabaseHandler.get_recent_production(limit=limit, machine_name=machine_name)
+    data = await async_db.get_recent_production(limit=limit, machine_name=machine_name)
     return data
 
 @router.get("/api/totvs/producao", summary="🔄 Integração TOTVS / TOTVS Integration", tags=["Integração ERP / ERP Integration"])
@@ -517,7 +549,7 @@ async def get_totvs_production(limit: int = 100, since_id: int = None):
     Endpoint otimizado para o ERP TOTVS consumir dados de produção. / Optimized endpoint for TOTVS ERP to consume production data.
     Suporta filtros por ID para sincronização incremental. / Supports ID filters for incremental synchronization.
     """
-    data = DatabaseHandler.get_recent_production(limit=limit, since_id=since_id)
+    data = await report_db.get_recent_production(limit=limit, since_id=since_id)
     return {
         "count": len(data),
         "results": data,
@@ -533,8 +565,10 @@ async def get_datasul_production(
     """
     Endpoint otimizado para o ERP Datasul (Reporte de Produção).
     """
-    if not data_limiter.is_allowed(request.client.host):
-        return JSONResponse(status_code=429, content={"error": "Muitas requisições. O sistema permite refreshes rápidos."})
+    allowed, retry_after = rate_limiter.check(request.client.host, "erp")
+    if not allowed:
+        return JSONResponse(status_code=429, content={"error": "Muitas requisições. O sistema permite refreshes rápidos."},
+                            headers={"Retry-After": str(math.ceil(retry_after))})
     # Normalização da máquina (ex: '22' -> 'Cupper_22')
     if machine_name and "Cupper_" not in machine_name:
         machine_name = f"Cupper_{machine_name}"
@@ -552,7 +586,7 @@ async def get_datasul_production(
         # Calcula a data industrial atual
         date = (now - timedelta(hours=6, seconds=30)).strftime('%Y-%m-%d')
         
-    data = DatabaseHandler.get_api_production_report(machine_name, date)
+    data = await report_db.get_api_production_report(machine_name, date)
     return {
         "count": len(data),
         "results": data,
@@ -566,10 +600,12 @@ async def get_client_info(request: Request):
     client_ip = request.client.host
     
     # Rate Limit na identificação para evitar brute force do hostname resolution
-    if not data_limiter.is_allowed(client_ip):
-         return JSONResponse(status_code=429, content={"error": "Too many requests"})
+    allowed, retry_after = rate_limiter.check(client_ip, "identity")
+    if not allowed:
+        return JSONResponse(status_code=429, content={"error": "Too many requests"},
+                            headers={"Retry-After": str(math.ceil(retry_after))})
 
-    hostname = resolve_hostname(client_ip)
+    hostname = await hostname_resolver.resolve(client_ip)
     client_token = request.headers.get("X-Terminal-Token")
     
     is_authorized = (client_ip == "127.0.0.1") or (client_token == MASTER_TOKEN)
@@ -0,0 +1,69 @@
+import os
+import asyncio
+import functools
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from src.database_handler import DatabaseHandler
+
+# Pools separados: um relatório pesado do ERP não pode ocupar os workers das consultas rápidas
+# (lotes, cadastro), e um SMTP/DNS lento não pode ocupar nenhum dos dois.
+DB_API_WORKERS = int(os.getenv("DB_API_WORKERS", 4))
+DB_REPORT_WORKERS = int(os.getenv("DB_REPORT_WORKERS", 2))
+IO_WORKERS = int(os.getenv("IO_WORKERS", 4))
+DNS_WORKERS = int(os.getenv("DNS_WORKERS", 2))
+
+_POOL_SIZES = {"db": DB_API_WORKERS, "report": DB_REPORT_WORKERS, "io": IO_WORKERS, "dns": DNS_WORKERS}
+_executors = {}
+_executors_lock = threading.Lock()
+
+def _get_executor(pool: str) -> ThreadPoolExecutor:
+    executor = _executors.get(pool)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(pool)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=_POOL_SIZES[pool], thread_name_prefix=f"API-{pool}")
+                _executors[pool] = executor
+    return executor
+
+async def run_blocking(func, *args, pool: str = "db", **kwargs):
+    """Executa uma função bloqueante no pool indicado sem travar o event loop do uvicorn."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(pool), functools.partial(func, *args, **kwargs))
+
+async def run_io(func, *args, **kwargs):
+    """Atalho para chamadas de rede (DNS, nbtstat, SMTP, escrita no PLC)."""
+    return await run_blocking(func, *args, pool="io", **kwargs)
+
+class AsyncDatabaseHandler:
+    """Fachada assíncrona do DatabaseHandler.
+
+    `await async_db.get_all_plcs()` executa `DatabaseHandler.get_all_plcs()` em um worker do pool.
+    Cada worker reutiliza sua conexão SQLite thread-local (ver db_connection.ConnectionManager).
+    """
+    def __init__(self, pool: str):
+        self._pool = pool
+
+    def __getattr__(self, name):
+        method = getattr(DatabaseHandler, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await run_blocking(method, *args, pool=self._pool, **kwargs)
+        call.__name__ = name
+        return call
+
+async_db = AsyncDatabaseHandler("db")
+report_db = AsyncDatabaseHandler("report")
+
+def shutdown_executors():
+    """Aguarda as chamadas em andamento e encerra os pools (desligamento do servidor)."""
+    with _executors_lock:
+        executors = list(_executors.items())
+        _executors.clear()
+    for pool, executor in executors:
+        executor.shutdown(wait=True, cancel_futures=True)
+    if executors:
+        logging.info("Pools de acesso assíncrono encerrados.")
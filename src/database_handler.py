@@ -1,19 +1,98 @@
-import sqlite3
 import os
+import json
+import time
 import logging
-from datetime import datetime
 from timezone_utils import get_current_sao_paulo_time
+from src.lote_cache import lote_cache
+from src.db_connection import connection_manager
+from src.monitor_utils import get_production_date
 
-DB_FILE = os.getenv("DB_FILE", "production_data.db")
-DB_TIMEOUT = 10.0  # Timeout de 20 segundos para operações concorrentes no BD
+# Regra da data industrial em SQL (usada apenas para migrar linhas antigas)
+PROD_DATE_SQL = "CASE WHEN time(timestamp) < '06:00:30' THEN date(timestamp, '-1 day') ELSE date(timestamp) END"
+
+# Classificação do reporte a partir do consumption_type
+REPORT_TYPE_SQL = """
+    CASE 
+        WHEN consumption_type LIKE '%Completa%' THEN 'TOTAL - COMPLETA'
+        WHEN consumption_type LIKE '%Parcial%' THEN 'TOTAL - PARCIAL'
+        ELSE 'TURNO'
+    END
+"""
 
 class DatabaseHandler:
+    # Escritor em lote opcional (write-behind) para as escritas por ciclo dos PLCs
+    _writer = None
+
+    _SQL_INSERT_DETAIL = """
+        INSERT INTO production_detail (machine_name, timestamp, cups_produced, feed_value, can_size)
+        VALUES (?, ?, ?, ?, ?)
+    """
+    _SQL_UPSERT_CURRENT = """
+        INSERT INTO current_production 
+        (machine_name, current_cups, last_update, shift, coil_number, feed_value, size, status, daily_total)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(machine_name) DO UPDATE SET
+            current_cups=excluded.current_cups,
+            last_update=excluded.last_update,
+            shift=excluded.shift,
+            coil_number=excluded.coil_number,
+            feed_value=excluded.feed_value,
+            size=excluded.size,
+            status=excluded.status,
+            daily_total=excluded.daily_total
+        WHERE excluded.last_update >= current_production.last_update
+    """
+
+    # Rollups: atualizados na mesma transação do INSERT a partir da linha recém inserida
+    _SQL_ROLLUP_PRODUCTION = """
+        INSERT INTO production_rollup
+        (machine_name, production_date, shift, coil_number, can_size, consumption_type, coil_type, total_cups, record_count, first_event, last_event)
+        SELECT machine_name, production_date, shift, coil_number, COALESCE(can_size, ''), COALESCE(consumption_type, ''),
+               coil_type, cups_produced, 1, timestamp, timestamp
+        FROM production_records WHERE id = ?
+        ON CONFLICT(machine_name, production_date, shift, coil_number, can_size, consumption_type) DO UPDATE SET
+            total_cups = total_cups + excluded.total_cups,
+            record_count = record_count + 1,
+            coil_type = COALESCE(excluded.coil_type, coil_type),
+            first_event = MIN(first_event, excluded.first_event),
+            last_event = MAX(last_event, excluded.last_event)
+    """
+    _SQL_ROLLUP_COIL = """
+        INSERT INTO coil_rollup
+        (machine_name, production_date, shift, lot_number, consumption_type, coil_type, coil_count, consumed_quantity, first_start, last_end)
+        SELECT machine_name, production_date, shift, lot_number, consumption_type, coil_type, 1, consumed_quantity, start_time, end_time
+        FROM coil_consumption_lot WHERE id = ?
+        ON CONFLICT(machine_name, production_date, shift, lot_number, consumption_type) DO UPDATE SET
+            coil_count = coil_count + 1,
+            consumed_quantity = consumed_quantity + excluded.consumed_quantity,
+            coil_type = COALESCE(excluded.coil_type, coil_type),
+            first_start = MIN(first_start, excluded.first_start),
+            last_end = MAX(last_end, excluded.last_end)
+    """
+
+    @staticmethod
+    def attach_writer(writer):
+        """Direciona as escritas por ciclo (detalhe e status atual) para o escritor em lote."""
+        DatabaseHandler._writer = writer
+
+    @staticmethod
+    def detach_writer():
+        DatabaseHandler._writer = None
+
     @staticmethod
     def _get_connection():
-        """Centraliza a criação da conexão e configuração do Row Factory."""
-        conn = sqlite3.connect(DB_FILE, timeout=DB_TIMEOUT)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Conexão persistente da thread atual (Row Factory e PRAGMAs já aplicados)."""
+        return connection_manager.get()
+
+    @staticmethod
+    def close_connection():
+        """Fecha a conexão da thread atual. Chamado pelas threads de monitoramento ao encerrar."""
+        connection_manager.close_current()
+
+    @staticmethod
+    def close_all_connections():
+        """Fecha as conexões de todas as threads (desligamento do servidor)."""
+        connection_manager.close_all()
 
     @staticmethod
     def init_db():
@@ -35,7 +114,8 @@ class DatabaseHandler:
                     shift TEXT NOT NULL,
                     absolute_counter INTEGER DEFAULT 0,
                     coil_type TEXT,
-                    can_size TEXT
+                    can_size TEXT,
+                    production_date TEXT
                 )
                 """)
                 
@@ -53,7 +133,8 @@ class DatabaseHandler:
                     production_date TEXT NOT NULL,
                     shift TEXT NOT NULL,
                     consumption_type TEXT NOT NULL,
-                    coil_type TEXT
+                    coil_type TEXT,
+                    breakdown_stored INTEGER DEFAULT 0
                 )
                 """)
                 
@@ -125,6 +206,81 @@ class DatabaseHandler:
                 )
                 """)
 
+                # Detalhamento por turno de cada bobina, gravado no momento da troca
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS coil_shift_breakdown (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    coil_consumption_id INTEGER NOT NULL,
+                    shift TEXT NOT NULL,
+                    production_date TEXT NOT NULL,
+                    total_cups INTEGER NOT NULL
+                )
+                """)
+
+                # Rollups incrementais para os relatórios (custo proporcional ao resultado)
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS production_rollup (
+                    machine_name TEXT NOT NULL,
+                    production_date TEXT NOT NULL,
+                    shift TEXT NOT NULL,
+                    coil_number TEXT NOT NULL,
+                    can_size TEXT NOT NULL DEFAULT '',
+                    consumption_type TEXT NOT NULL DEFAULT '',
+                    coil_type TEXT,
+                    total_cups INTEGER NOT NULL DEFAULT 0,
+                    record_count INTEGER NOT NULL DEFAULT 0,
+                    first_event TEXT,
+                    last_event TEXT,
+                    PRIMARY KEY (machine_name, production_date, shift, coil_number, can_size, consumption_type)
+                )
+                """)
+
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS coil_rollup (
+                    machine_name TEXT NOT NULL,
+                    production_date TEXT NOT NULL,
+                    shift TEXT NOT NULL,
+                    lot_number TEXT NOT NULL,
+                    consumption_type TEXT NOT NULL,
+                    coil_type TEXT,
+                    coil_count INTEGER NOT NULL DEFAULT 0,
+                    consumed_quantity INTEGER NOT NULL DEFAULT 0,
+                    first_start TEXT,
+                    last_end TEXT,
+                    PRIMARY KEY (machine_name, production_date, shift, lot_number, consumption_type)
+                )
+                """)
+
+                # Fila persistente de e-mails (outbox): sobrevive a reinícios, com retentativa e coalescência
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS email_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    subject TEXT NOT NULL,
+                    body_text TEXT NOT NULL,
+                    body_html TEXT NOT NULL,
+                    recipients TEXT,
+                    is_error INTEGER NOT NULL DEFAULT 0,
+                    coalesce_key TEXT,
+                    occurrences INTEGER NOT NULL DEFAULT 1,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at TEXT NOT NULL,
+                    last_seen_at TEXT NOT NULL,
+                    created_ts REAL NOT NULL,
+                    next_attempt_ts REAL NOT NULL,
+                    sent_ts REAL
+                )
+                """)
+
+                # Dedupe persistente de e-mails (opcional, EMAIL_DEDUPE_PERSIST)
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS email_dedupe (
+                    dedupe_key TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                )
+                """)
+
                 # Índices fundamentais para buscas via API (filtros de data e máquina)
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_prod_timestamp ON production_records (timestamp);")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_prod_machine ON production_records (machine_name);")
@@ -132,7 +288,12 @@ class DatabaseHandler:
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_detail_machine_time ON production_detail (machine_name, timestamp);")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_coil_consumption_machine ON coil_consumption_lot (machine_name);")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_coil_consumption_date ON coil_consumption_lot (production_date);")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_coil_consumption_machine_end ON coil_consumption_lot (machine_name, end_time);")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_prod_machine_time ON production_records (machine_name, timestamp);")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_coil_breakdown_coil ON coil_shift_breakdown (coil_consumption_id);")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_current_prod_machine ON current_production (machine_name);")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON email_outbox (status, next_attempt_ts);")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_key ON email_outbox (coalesce_key, status);")
                 
                 # Verificação de migrações (Casos legados)
                 cursor.execute("PRAGMA table_info(production_records)")
@@ -145,17 +306,36 @@ class DatabaseHandler:
                     cursor.execute("ALTER TABLE production_records ADD COLUMN shift TEXT DEFAULT 'Unknown'")
                 if 'absolute_counter' not in cols:
                     cursor.execute("ALTER TABLE production_records ADD COLUMN absolute_counter INTEGER DEFAULT 0")
+                if 'production_date' not in cols:
+                    cursor.execute("ALTER TABLE production_records ADD COLUMN production_date TEXT")
+
+                # Data industrial persistida: backfill de registros antigos e índice para filtros por dia
+                cursor.execute(f"UPDATE production_records SET production_date = {PROD_DATE_SQL} WHERE production_date IS NULL")
+                if cursor.rowcount > 0:
+                    logging.info(f"Migração: data de produção preenchida em {cursor.rowcount} registros.")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_prod_date_machine ON production_records (production_date, machine_name);")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_prod_machine_date ON production_records (machine_name, production_date);")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_prod_rollup_date ON production_rollup (production_date);")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_coil_rollup_date ON coil_rollup (production_date);")
 
                 cursor.execute("PRAGMA table_info(coil_consumption_lot)")
                 cols_coil = [col[1] for col in cursor.fetchall()]
                 if 'coil_type' not in cols_coil:
                     cursor.execute("ALTER TABLE coil_consumption_lot ADD COLUMN coil_type TEXT")
+                if 'breakdown_stored' not in cols_coil:
+                    cursor.execute("ALTER TABLE coil_consumption_lot ADD COLUMN breakdown_stored INTEGER DEFAULT 0")
 
                 cursor.execute("PRAGMA table_info(current_production)")
                 cols_curr = [col[1] for col in cursor.fetchall()]
                 if 'daily_total' not in cols_curr:
                     cursor.execute("ALTER TABLE current_production ADD COLUMN daily_total INTEGER DEFAULT 0")
 
+                # Primeira execução com histórico existente: popula os rollups
+                has_rollup = cursor.execute("SELECT 1 FROM production_rollup LIMIT 1").fetchone()
+                has_records = cursor.execute("SELECT 1 FROM production_records LIMIT 1").fetchone()
+                if has_records and not has_rollup:
+                    DatabaseHandler._rebuild_rollups(conn)
+
                 conn.commit()
             logging.info("Banco de dados pronto para consumo via API.")
         except Exception as e:
@@ -166,11 +346,12 @@ class DatabaseHandler:
         """Insere um log detalhado de produção no banco de dados."""
         try:
             timestamp = get_current_sao_paulo_time().strftime("%Y-%m-%d %H:%M:%S")
+            params = (machine_name, timestamp, cups_produced, feed_value, can_size)
+            writer = DatabaseHandler._writer
+            if writer and writer.submit(DatabaseHandler._SQL_INSERT_DETAIL, params):
+                return
             with DatabaseHandler._get_connection() as conn:
-                conn.execute("""
-                INSERT INTO production_detail (machine_name, timestamp, cups_produced, feed_value, can_size)
-                VALUES (?, ?, ?, ?, ?)
-                """, (machine_name, timestamp, cups_produced, feed_value, can_size))
+                conn.execute(DatabaseHandler._SQL_INSERT_DETAIL, params)
                 conn.commit()
         except Exception as e:
             logging.error(f"Erro ao inserir detalhe de produção: {e}")
@@ -272,16 +453,155 @@ class DatabaseHandler:
             logging.error(f"Erro ao deletar destinatário {recipient_id}: {e}")
             return False
 
+    # --- OUTBOX DE E-MAILS ---
+
+    @staticmethod
+    def enqueue_email(subject, body_text, body_html, recipients=None, is_error=False, coalesce_key=None, coalesce_window=0):
+        """Grava um e-mail na outbox e retorna o id da linha.
+
+        Com `coalesce_key`, um e-mail ainda pendente com a mesma chave apenas tem `occurrences`
+        incrementado; se o último da chave foi enviado há menos de `coalesce_window` segundos (ou
+        está sendo enviado agora, status 'sending'), o novo só sai ao fim da janela, acumulando as
+        repetições em um único resumo. Linhas em envio nunca recebem ocorrências novas: o que foi
+        lido pelo despachante é exatamente o que será marcado como enviado.
+        """
+        now_ts = time.time()
+        now_str = get_current_sao_paulo_time().strftime("%Y-%m-%d %H:%M:%S")
+        conn = DatabaseHandler._get_connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            next_attempt = now_ts
+            if coalesce_key:
+                row = conn.execute(
+                    "SELECT id FROM email_outbox WHERE coalesce_key = ? AND status = 'pending' ORDER BY id DESC LIMIT 1",
+                    (coalesce_key,)
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE email_outbox SET occurrences = occurrences + 1, last_seen_at = ? WHERE id = ?",
+                        (now_str, row['id'])
+                    )
+                    return row['id']
+                last_sent = conn.execute(
+                    "SELECT MAX(CASE WHEN status = 'sending' THEN ? ELSE sent_ts END) FROM email_outbox "
+                    "WHERE coalesce_key = ? AND status IN ('sent', 'sending')",
+                    (now_ts, coalesce_key)
+                ).fetchone()[0]
+                if last_sent:
+                    next_attempt = max(now_ts, last_sent + coalesce_window)
+            cursor = conn.execute("""
+                INSERT INTO email_outbox (subject, body_text, body_html, recipients, is_error, coalesce_key,
+                                          created_at, last_seen_at, created_ts, next_attempt_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (subject, body_text, body_html, json.dumps(recipients) if recipients else None, int(bool(is_error)),
+                  coalesce_key, now_str, now_str, now_ts, next_attempt))
+            return cursor.lastrowid
+
+    @staticmethod
+    def claim_due_emails(limit=20):
+        """Reserva ('sending') e retorna os e-mails pendentes cujo horário de (re)tentativa já chegou,
+        mais antigos primeiro. A reserva impede que enqueue_email agrupe ocorrências neles durante o envio."""
+        try:
+            conn = DatabaseHandler._get_connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.execute("""
+                    SELECT * FROM email_outbox
+                    WHERE status = 'pending' AND next_attempt_ts <= ?
+                    ORDER BY next_attempt_ts, id
+                    LIMIT ?
+                """, (time.time(), limit))
+                rows = [dict(row) for row in cursor.fetchall()]
+                conn.executemany("UPDATE email_outbox SET status = 'sending' WHERE id = ?", [(row['id'],) for row in rows])
+            for row in rows:
+                row['recipients'] = json.loads(row['recipients']) if row['recipients'] else None
+            return rows
+        except Exception as e:
+            logging.error(f"Erro ao buscar e-mails pendentes: {e}")
+            return []
+
+    @staticmethod
+    def release_claimed_emails():
+        """Devolve para 'pending' os e-mails reservados e não concluídos (reinício ou erro do despachante)."""
+        with DatabaseHandler._get_connection() as conn:
+            cursor = conn.execute("UPDATE email_outbox SET status = 'pending' WHERE status = 'sending'")
+            return cursor.rowcount
+
+    @staticmethod
+    def mark_emails_sent(email_ids, sent_ts=None):
+        if not email_ids:
+            return
+        sent_ts = sent_ts or time.time()
+        with DatabaseHandler._get_connection() as conn:
+            conn.executemany(
+                "UPDATE email_outbox SET status = 'sent', sent_ts = ?, attempts = attempts + 1, last_error = NULL WHERE id = ?",
+                [(sent_ts, email_id) for email_id in email_ids]
+            )
+
+    @staticmethod
+    def reschedule_email(email_id, next_attempt_ts, error, give_up=False):
+        """Registra uma falha de envio: agenda nova tentativa ou marca como 'failed'."""
+        with DatabaseHandler._get_connection() as conn:
+            conn.execute("""
+                UPDATE email_outbox
+                SET attempts = attempts + 1, last_error = ?, next_attempt_ts = ?, status = ?
+                WHERE id = ?
+            """, (str(error)[:500], next_attempt_ts, 'failed' if give_up else 'pending', email_id))
+
+    @staticmethod
+    def get_email_outbox_stats():
+        """Contagem por status e idade do e-mail pendente mais antigo."""
+        with DatabaseHandler._get_connection() as conn:
+            counts = {row['status']: row['total'] for row in conn.execute(
+                "SELECT status, COUNT(*) AS total FROM email_outbox GROUP BY status"
+            ).fetchall()}
+            oldest = conn.execute(
+                "SELECT MIN(created_ts) FROM email_outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+        return {
+            "pending": counts.get('pending', 0),
+            "sending": counts.get('sending', 0),
+            "sent": counts.get('sent', 0),
+            "failed": counts.get('failed', 0),
+            "oldest_pending_age_seconds": round(time.time() - oldest, 1) if oldest else 0
+        }
+
+    @staticmethod
+    def purge_sent_emails(older_than_ts):
+        """Remove da outbox os e-mails já enviados antes de `older_than_ts` (retenção)."""
+        with DatabaseHandler._get_connection() as conn:
+            cursor = conn.execute("DELETE FROM email_outbox WHERE status = 'sent' AND sent_ts < ?", (older_than_ts,))
+            return cursor.rowcount
+
+    @staticmethod
+    def load_email_dedupe(now_ts):
+        """Remove as chaves vencidas e retorna [(chave, expira_em)] das ainda ativas."""
+        with DatabaseHandler._get_connection() as conn:
+            conn.execute("DELETE FROM email_dedupe WHERE expires_at <= ?", (now_ts,))
+            rows = conn.execute("SELECT dedupe_key, expires_at FROM email_dedupe ORDER BY expires_at").fetchall()
+        return [(row['dedupe_key'], row['expires_at']) for row in rows]
+
+    @staticmethod
+    def save_email_dedupe(dedupe_key, expires_at):
+        with DatabaseHandler._get_connection() as conn:
+            conn.execute("""
+                INSERT INTO email_dedupe (dedupe_key, expires_at) VALUES (?, ?)
+                ON CONFLICT(dedupe_key) DO UPDATE SET expires_at = excluded.expires_at
+            """, (dedupe_key, expires_at))
+
     @staticmethod
     def insert_production_record(machine_name, coil_number, cups_produced, consumption_type, shift, absolute_counter, coil_type=None, can_size=None):
         """Insere um novo registro de produção no banco de dados."""
         try:
-            timestamp = get_current_sao_paulo_time().strftime("%Y-%m-%d %H:%M:%S")
+            now = get_current_sao_paulo_time()
+            timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+            production_date = get_production_date(now).strftime("%Y-%m-%d")
             with DatabaseHandler._get_connection() as conn:
-                conn.execute("""
-                INSERT INTO production_records (timestamp, machine_name, coil_number, cups_produced, consumption_type, shift, absolute_counter, coil_type, can_size)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (timestamp, machine_name, coil_number, cups_produced, consumption_type, shift, absolute_counter, coil_type, can_size))
+                cursor = conn.execute("""
+                INSERT INTO production_records (timestamp, machine_name, coil_number, cups_produced, consumption_type, shift, absolute_counter, coil_type, can_size, production_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (timestamp, machine_name, coil_number, cups_produced, consumption_type, shift, absolute_counter, coil_type, can_size, production_date))
+                conn.execute(DatabaseHandler._SQL_ROLLUP_PRODUCTION, (cursor.lastrowid,))
                 conn.commit()
             logging.info(f"Registro inserido: {machine_name} - Lote {coil_number}")
         except Exception as e:
@@ -292,21 +612,13 @@ class DatabaseHandler:
         """Atualiza status atual usando UPSERT (ON CONFLICT). Essencial para dashboard live."""
         try:
             timestamp = get_current_sao_paulo_time().strftime("%Y-%m-%d %H:%M:%S")
+            params = (machine_name, current_cups, timestamp, shift, coil_number, feed_value, size, status, daily_total)
+            writer = DatabaseHandler._writer
+            # Coalescido por máquina: dentro da janela de flush só o último status é gravado
+            if writer and writer.submit(DatabaseHandler._SQL_UPSERT_CURRENT, params, key=f"current:{machine_name}"):
+                return
             with DatabaseHandler._get_connection() as conn:
-                conn.execute("""
-                INSERT INTO current_production 
-                (machine_name, current_cups, last_update, shift, coil_number, feed_value, size, status, daily_total)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(machine_name) DO UPDATE SET
-                    current_cups=excluded.current_cups,
-                    last_update=excluded.last_update,
-                    shift=excluded.shift,
-                    coil_number=excluded.coil_number,
-                    feed_value=excluded.feed_value,
-                    size=excluded.size,
-                    status=excluded.status,
-                    daily_total=excluded.daily_total
-                """, (machine_name, current_cups, timestamp, shift, coil_number, feed_value, size, status, daily_total))
+                conn.execute(DatabaseHandler._SQL_UPSERT_CURRENT, params)
                 conn.commit()
         except Exception as e:
             logging.error(f"Erro no Upsert do status atual: {e}")
@@ -318,19 +630,10 @@ class DatabaseHandler:
         Aplica a regra de negócio de virada de turno às 06:00:30.
         """
         try:
-            calc_prod_date = "CASE WHEN time(timestamp) < '06:00:30' THEN date(timestamp, '-1 day') ELSE date(timestamp) END"
-            calc_report_type = """
-                CASE 
-                    WHEN consumption_type LIKE '%Completa%' THEN 'TOTAL - COMPLETA'
-                    WHEN consumption_type LIKE '%Parcial%' THEN 'TOTAL - PARCIAL'
-                    ELSE 'TURNO'
-                END
-            """
-            
             query = f"""
                 SELECT 
                     id,
-                    {calc_prod_date} as data_turno,
+                    production_date as data_turno,
                     timestamp as data_hora_real,
                     shift as turno,
                     machine_name as maquina,
@@ -338,26 +641,26 @@ class DatabaseHandler:
                     cups_produced as quantidade,
                     can_size as tamanho,
                     coil_type as tipo_bobina,
-                    {calc_report_type} as tipo_saida
+                    {REPORT_TYPE_SQL} as tipo_saida
                 FROM production_records
             """
             params = []
             conditions = []
             
-            if machine_name:
-                conditions.append("maquina = ?")
-                params.append(machine_name)
-            
-            query_with_filter = f"SELECT * FROM ({query}) AS sub"
-            
+            # Filtros direto nas colunas (range scan em idx_prod_date_machine)
             if date:
-                conditions.append("data_turno = ?")
+                conditions.append("production_date = ?")
                 params.append(date)
+
+            if machine_name:
+                conditions.append("machine_name = ?")
+                params.append(machine_name)
             
+            query_with_filter = query
             if conditions:
                 query_with_filter += " WHERE " + " AND ".join(conditions)
             
-            query_with_filter += " ORDER BY data_hora_real ASC"
+            query_with_filter += " ORDER BY timestamp ASC"
 
             with DatabaseHandler._get_connection() as conn:
                 cursor = conn.execute(query_with_filter, params)
@@ -370,26 +673,16 @@ class DatabaseHandler:
     def get_production_by_shift(machine_name=None, start_date=None, end_date=None):
         """Legado: Retorna as passagens de produção individuais formatadas para o Reporte ERP."""
         try:
-            calc_prod_date = "CASE WHEN time(timestamp) < '06:00:30' THEN date(timestamp, '-1 day') ELSE date(timestamp) END"
-            calc_linha = "REPLACE(machine_name, 'Cupper_', '')"
-            calc_report_type = """
-                CASE 
-                    WHEN consumption_type LIKE '%Completa%' THEN 'TOTAL - COMPLETA'
-                    WHEN consumption_type LIKE '%Parcial%' THEN 'TOTAL - PARCIAL'
-                    ELSE 'TURNO'
-                END
-            """
-            
             query = f"""
                 SELECT 
-                    {calc_linha} as Linha,
+                    REPLACE(machine_name, 'Cupper_', '') as Linha,
                     machine_name as Maquina, 
                     shift as Turno, 
-                    {calc_prod_date} as Dt_turno,
+                    production_date as Dt_turno,
                     coil_number as Lote, 
                     cups_produced as Quantidade, 
                     can_size as Tamanho,
-                    {calc_report_type} as Tipo_Reporte,
+                    {REPORT_TYPE_SQL} as Tipo_Reporte,
                     coil_type as Coil_Type,
                     timestamp as Horário_Evento
                 FROM production_records
@@ -397,30 +690,71 @@ class DatabaseHandler:
             params = []
             conditions = []
             
+            if start_date:
+                conditions.append("production_date >= ?")
+                params.append(start_date)
+            if end_date:
+                conditions.append("production_date <= ?")
+                params.append(end_date)
             if machine_name:
                 conditions.append("machine_name = ?")
                 params.append(machine_name)
             
-            sub_query = f"SELECT * FROM ({query}) AS sub"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            
+            query += " ORDER BY timestamp DESC"
+            
+            with DatabaseHandler._get_connection() as conn:
+                cursor = conn.execute(query, params)
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"Erro ao buscar reporte de produção: {e}")
+            return []
+
+    @staticmethod
+    def get_production_shift_summary(machine_name=None, start_date=None, end_date=None):
+        """Produção consolidada por dia industrial, turno, lote, formato e tipo de reporte (lida do rollup)."""
+        try:
+            query = f"""
+                SELECT 
+                    REPLACE(machine_name, 'Cupper_', '') as Linha,
+                    machine_name as Maquina, 
+                    shift as Turno, 
+                    production_date as Dt_turno,
+                    coil_number as Lote, 
+                    total_cups as Quantidade, 
+                    NULLIF(can_size, '') as Tamanho,
+                    {REPORT_TYPE_SQL} as Tipo_Reporte,
+                    coil_type as Coil_Type,
+                    record_count as Registros,
+                    first_event as Primeiro_Evento,
+                    last_event as Ultimo_Evento
+                FROM production_rollup
+            """
+            params = []
+            conditions = []
             
             if start_date:
-                conditions.append("Dt_turno >= ?")
+                conditions.append("production_date >= ?")
                 params.append(start_date)
             if end_date:
-                conditions.append("Dt_turno <= ?")
+                conditions.append("production_date <= ?")
                 params.append(end_date)
+            if machine_name:
+                conditions.append("machine_name = ?")
+                params.append(machine_name)
             
-            final_query = sub_query
             if conditions:
-                final_query += " WHERE " + " AND ".join(conditions)
+                query += " WHERE " + " AND ".join(conditions)
             
-            final_query += " ORDER BY Horário_Evento DESC"
+            query += " ORDER BY last_event DESC"
             
             with DatabaseHandler._get_connection() as conn:
-                cursor = conn.execute(final_query, params)
+                cursor = conn.execute(query, params)
                 return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
-            logging.error(f"Erro ao buscar reporte de produção: {e}")
+            logging.error(f"Erro ao buscar resumo de produção por turno: {e}")
             return []
 
     @staticmethod
@@ -452,6 +786,121 @@ class DatabaseHandler:
             logging.error(f"Erro ao buscar produção por lote: {e}")
             return []
 
+    @staticmethod
+    def get_coil_consumption_summary(machine_name=None, start_date=None, end_date=None):
+        """Resumo de consumo de bobinas por dia industrial, turno e lote (lido do rollup)."""
+        try:
+            query = """
+                SELECT machine_name, production_date, shift, lot_number, consumption_type, coil_type,
+                       coil_count, consumed_quantity, first_start, last_end
+                FROM coil_rollup
+            """
+            params = []
+            conditions = []
+            if start_date:
+                conditions.append("production_date >= ?")
+                params.append(start_date)
+            if end_date:
+                conditions.append("production_date <= ?")
+                params.append(end_date)
+            if machine_name:
+                conditions.append("machine_name = ?")
+                params.append(machine_name)
+
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += " ORDER BY production_date DESC, machine_name, shift"
+
+            with DatabaseHandler._get_connection() as conn:
+                cursor = conn.execute(query, params)
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"Erro ao buscar resumo de consumo de bobinas: {e}")
+            return []
+
+    @staticmethod
+    def _rebuild_rollups(conn):
+        conn.execute("DELETE FROM production_rollup")
+        conn.execute("""
+            INSERT INTO production_rollup
+            (machine_name, production_date, shift, coil_number, can_size, consumption_type, coil_type, total_cups, record_count, first_event, last_event)
+            SELECT machine_name, production_date, shift, coil_number, COALESCE(can_size, ''), COALESCE(consumption_type, ''),
+                   MAX(coil_type), SUM(cups_produced), COUNT(*), MIN(timestamp), MAX(timestamp)
+            FROM production_records
+            GROUP BY machine_name, production_date, shift, coil_number, COALESCE(can_size, ''), COALESCE(consumption_type, '')
+        """)
+        conn.execute("DELETE FROM coil_rollup")
+        conn.execute("""
+            INSERT INTO coil_rollup
+            (machine_name, production_date, shift, lot_number, consumption_type, coil_type, coil_count, consumed_quantity, first_start, last_end)
+            SELECT machine_name, production_date, shift, lot_number, consumption_type,
+                   MAX(coil_type), COUNT(*), SUM(consumed_quantity), MIN(start_time), MAX(end_time)
+            FROM coil_consumption_lot
+            GROUP BY machine_name, production_date, shift, lot_number, consumption_type
+        """)
+        logging.info("Rollups de produção reconstruídos a partir do histórico.")
+
+    @staticmethod
+    def rebuild_rollups():
+        """Reconstrói os rollups a partir de todo o histórico (uma única transação)."""
+        try:
+            with DatabaseHandler._get_connection() as conn:
+                DatabaseHandler._rebuild_rollups(conn)
+                conn.commit()
+                return True
+        except Exception as e:
+            logging.error(f"Erro ao reconstruir rollups: {e}")
+            return False
+
+    # --- MANUTENÇÃO (usado por src/db_maintenance.py) ---
+
+    @staticmethod
+    def wal_checkpoint(mode="PASSIVE"):
+        """Executa PRAGMA wal_checkpoint no modo indicado (PASSIVE, FULL, RESTART ou TRUNCATE)."""
+        mode = mode.upper()
+        if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+            raise ValueError(f"Modo de checkpoint inválido: {mode}")
+        conn = DatabaseHandler._get_connection()
+        busy, wal_pages, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        return {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed_pages": checkpointed}
+
+    @staticmethod
+    def optimize_database(analysis_limit=400):
+        """Atualiza as estatísticas do planejador (PRAGMA optimize) com ANALYZE limitado."""
+        conn = DatabaseHandler._get_connection()
+        conn.execute(f"PRAGMA analysis_limit={int(analysis_limit)}")
+        conn.execute("PRAGMA optimize")
+
+    @staticmethod
+    def incremental_vacuum(max_pages):
+        """Devolve ao sistema até `max_pages` páginas livres (requer auto_vacuum=INCREMENTAL)."""
+        conn = DatabaseHandler._get_connection()
+        # executescript avança o PRAGMA até o fim (execute libera apenas uma página por chamada)
+        conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+
+    @staticmethod
+    def enable_incremental_vacuum():
+        """Converte o banco para auto_vacuum=INCREMENTAL (VACUUM completo, bloqueia as escritas)."""
+        conn = DatabaseHandler._get_connection()
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+
+    @staticmethod
+    def get_storage_stats():
+        """Tamanho do banco e do WAL, páginas livres e modo de auto_vacuum."""
+        conn = DatabaseHandler._get_connection()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        db_file = connection_manager.db_file
+        wal_file = f"{db_file}-wal"
+        return {
+            "db_bytes": os.path.getsize(db_file) if os.path.exists(db_file) else 0,
+            "wal_bytes": os.path.getsize(wal_file) if os.path.exists(wal_file) else 0,
+            "page_size": page_size,
+            "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+            "freelist_pages": conn.execute("PRAGMA freelist_count").fetchone()[0],
+            "auto_vacuum": {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0]),
+        }
+
     @staticmethod
     def get_current_production(machine_name=None):
         """Retorna o status atual de produção de uma ou todas as máquinas."""
@@ -490,9 +939,8 @@ class DatabaseHandler:
     def get_recent_production(limit=100, since_id=None, machine_name=None):
         """Busca os registros de produção mais recentes com lógica de Data_Turno."""
         try:
-            calc_prod_date = "CASE WHEN time(timestamp) < '06:00:30' THEN date(timestamp, '-1 day') ELSE date(timestamp) END"
-            query = f"""
-                SELECT id, {calc_prod_date} as Data_Turno, timestamp as Horário_Evento,
+            query = """
+                SELECT id, production_date as Data_Turno, timestamp as Horário_Evento,
                        timestamp, machine_name, coil_number, cups_produced, consumption_type, shift 
                 FROM production_records
             """
@@ -516,31 +964,78 @@ class DatabaseHandler:
             logging.error(f"Erro ao buscar produção recente: {e}")
             return []
 
+    @staticmethod
+    def _normalize_timestamp(value):
+        """Converte ISO (com 'T', micros ou fuso) para o formato 'YYYY-MM-DD HH:MM:SS' das tabelas."""
+        if value is None:
+            return None
+        return str(value).replace('T', ' ')[:19]
+
     @staticmethod
     def get_shift_breakdown(machine_name, coil_number, start_time, end_time):
         """Busca a produção detalhada por turno para uma bobina."""
+        breakdowns = DatabaseHandler.get_shift_breakdowns([{
+            'machine_name': machine_name,
+            'lot_number': coil_number,
+            'start_time': start_time,
+            'end_time': end_time
+        }])
+        return breakdowns.get(0, [])
+
+    @staticmethod
+    def get_shift_breakdowns(coils, chunk_size=500):
+        """Detalhamento por turno de várias bobinas em uma única consulta por bloco.
+
+        `coils` é uma lista de dicts com machine_name, lot_number, start_time e end_time
+        (bobinas sem início/fim são ignoradas).
+        Retorna {índice_na_lista: [{shift, production_date, total_cups}, ...]}.
+        """
+        results = {}
+        indexed = [(i, c) for i, c in enumerate(coils) if c.get('start_time') and c.get('end_time')]
         try:
-            calc_prod_date = "CASE WHEN time(timestamp) < '06:00:30' THEN date(timestamp, '-1 day') ELSE date(timestamp) END"
-            query = f"""
-                SELECT shift, {calc_prod_date} as production_date, SUM(cups_produced) as total_cups
-                FROM production_records
-                WHERE machine_name = ? AND (coil_number = ? OR coil_number = '') 
-                AND timestamp >= ? AND timestamp <= ?
-                GROUP BY shift, production_date
-                ORDER BY timestamp ASC
-            """
             with DatabaseHandler._get_connection() as conn:
-                if 'T' in start_time: start_time = start_time.replace('T', ' ').split('.')[0]
-                if 'T' in end_time: end_time = end_time.replace('T', ' ').split('.')[0]
-                cursor = conn.execute(query, (machine_name, coil_number, start_time, end_time))
-                return [dict(row) for row in cursor.fetchall()]
+                for offset in range(0, len(indexed), chunk_size):
+                    chunk = indexed[offset:offset + chunk_size]
+                    values = []
+                    params = []
+                    for i, coil in chunk:
+                        values.append("(?, ?, ?, ?, ?)")
+                        params.extend([
+                            i,
+                            coil['machine_name'],
+                            coil['lot_number'],
+                            DatabaseHandler._normalize_timestamp(coil['start_time']),
+                            DatabaseHandler._normalize_timestamp(coil['end_time'])
+                        ])
+                    query = f"""
+                        WITH coils(idx, machine_name, coil_number, start_time, end_time) AS (VALUES {", ".join(values)})
+                        SELECT c.idx, p.shift, p.production_date, SUM(p.cups_produced) as total_cups, MIN(p.timestamp) as first_event
+                        FROM coils c
+                        JOIN production_records p
+                          ON p.machine_name = c.machine_name
+                         AND p.timestamp >= c.start_time AND p.timestamp <= c.end_time
+                         AND (p.coil_number = c.coil_number OR p.coil_number = '')
+                        GROUP BY c.idx, p.shift, p.production_date
+                        ORDER BY c.idx, first_event ASC
+                    """
+                    for row in conn.execute(query, params):
+                        results.setdefault(row['idx'], []).append({
+                            'shift': row['shift'],
+                            'production_date': row['production_date'],
+                            'total_cups': row['total_cups']
+                        })
+            return results
         except Exception as e:
             logging.error(f"Erro no detalhamento por turno: {e}")
-            return []
+            return results
 
     @staticmethod
-    def insert_coil_consumption_record(machine_name, coil_id, lot_number, start_time, end_time, consumed_quantity, unit, production_date, shift, consumption_type, coil_type=None):
-        """Insere registro de consumo de bobina finalizado."""
+    def insert_coil_consumption_record(machine_name, coil_id, lot_number, start_time, end_time, consumed_quantity, unit, production_date, shift, consumption_type, coil_type=None, shift_breakdown=None):
+        """Insere registro de consumo de bobina finalizado.
+
+        `shift_breakdown` ([{shift, production_date, total_cups}]) é gravado junto, na mesma transação,
+        para que a API sirva bobinas fechadas sem reagregar production_records.
+        """
         try:
             with DatabaseHandler._get_connection() as conn:
                 cursor = conn.cursor()
@@ -554,10 +1049,17 @@ class DatabaseHandler:
                 if last_record and last_record['lot_number'] == lot_number:
                     lot_to_save = "" 
                 
-                conn.execute("""
-                INSERT INTO coil_consumption_lot (machine_name, coil_id, lot_number, start_time, end_time, consumed_quantity, unit, production_date, shift, consumption_type, coil_type)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (machine_name, coil_id, lot_to_save, start_time.isoformat(), end_time.isoformat(), consumed_quantity, unit, production_date, shift, consumption_type, coil_type))
+                cursor = conn.execute("""
+                INSERT INTO coil_consumption_lot (machine_name, coil_id, lot_number, start_time, end_time, consumed_quantity, unit, production_date, shift, consumption_type, coil_type, breakdown_stored)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (machine_name, coil_id, lot_to_save, start_time.isoformat(), end_time.isoformat(), consumed_quantity, unit, production_date, shift, consumption_type, coil_type, 1 if shift_breakdown is not None else 0))
+                coil_record_id = cursor.lastrowid
+                if shift_breakdown:
+                    conn.executemany("""
+                    INSERT INTO coil_shift_breakdown (coil_consumption_id, shift, production_date, total_cups)
+                    VALUES (?, ?, ?, ?)
+                    """, [(coil_record_id, b['shift'], b['production_date'], b['total_cups']) for b in shift_breakdown])
+                conn.execute(DatabaseHandler._SQL_ROLLUP_COIL, (coil_record_id,))
                 conn.commit()
                 return True
         except Exception as e:
@@ -588,7 +1090,8 @@ class DatabaseHandler:
                 query += " WHERE " + " AND ".join(conditions)
             query += " ORDER BY end_time DESC"
             if limit:
-                query += f" LIMIT {limit}"
+                query += " LIMIT ?"
+                params.append(int(limit))
 
             with DatabaseHandler._get_connection() as conn:
                 cursor = conn.execute(query, params)
@@ -603,11 +1106,97 @@ class DatabaseHandler:
             logging.error(f"Erro ao buscar registros de consumo: {e}")
             return []
 
+    @staticmethod
+    def get_stored_shift_breakdowns(coil_ids, chunk_size=500):
+        """Detalhamento por turno gravado na troca de bobina. Retorna {coil_consumption_id: [...]}."""
+        results = {}
+        try:
+            with DatabaseHandler._get_connection() as conn:
+                for offset in range(0, len(coil_ids), chunk_size):
+                    chunk = coil_ids[offset:offset + chunk_size]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    cursor = conn.execute(f"""
+                        SELECT coil_consumption_id, shift, production_date, total_cups
+                        FROM coil_shift_breakdown
+                        WHERE coil_consumption_id IN ({placeholders})
+                        ORDER BY coil_consumption_id, id
+                    """, chunk)
+                    for row in cursor:
+                        results.setdefault(row['coil_consumption_id'], []).append({
+                            'shift': row['shift'],
+                            'production_date': row['production_date'],
+                            'total_cups': row['total_cups']
+                        })
+            return results
+        except Exception as e:
+            logging.error(f"Erro ao buscar detalhamento gravado das bobinas: {e}")
+            return results
+
+    @staticmethod
+    def get_latest_coil_consumption_per_machine(start_date=None, end_date=None, lot_number=None):
+        """Último registro de consumo de bobina de cada máquina (respeitando os filtros)."""
+        try:
+            conditions = []
+            params = []
+            if start_date:
+                conditions.append("production_date >= ?")
+                params.append(start_date)
+            if end_date:
+                conditions.append("production_date <= ?")
+                params.append(end_date)
+            if lot_number:
+                conditions.append("lot_number = ?")
+                params.append(lot_number)
+            where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+
+            query = f"""
+                SELECT * FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY machine_name ORDER BY end_time DESC) as rn
+                    FROM coil_consumption_lot{where}
+                ) WHERE rn = 1
+                ORDER BY machine_name
+            """
+            with DatabaseHandler._get_connection() as conn:
+                records = []
+                for row in conn.execute(query, params):
+                    record = dict(row)
+                    record.pop('rn', None)
+                    for field in ['start_time', 'end_time']:
+                        if not record.get(field): record[field] = None
+                    records.append(record)
+                return records
+        except Exception as e:
+            logging.error(f"Erro ao buscar último consumo por máquina: {e}")
+            return []
+
+    @staticmethod
+    def _fetch_lote_config(conn, machine_name):
+        cursor = conn.execute(
+            "SELECT machine_name, current_lote, tipo_bobina, bobina_saida, data_saida FROM lote_config WHERE machine_name = ?",
+            (machine_name,)
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+    @staticmethod
+    def _get_lote_config(machine_name):
+        """Linha de lote_config via cache; consulta o banco apenas em falta/expiração."""
+        row = lote_cache.get(machine_name)
+        if row is not None:
+            return row
+        # Carrega sob o lock de escrita para não sobrescrever uma gravação concorrente com dado antigo
+        with lote_cache.write_lock:
+            with DatabaseHandler._get_connection() as conn:
+                row = DatabaseHandler._fetch_lote_config(conn, machine_name)
+            if row:
+                lote_cache.set(machine_name, row)
+            return row
+
     @staticmethod
     def save_lote_to_db(machine_name, lote_value):
         """Salva o número do lote no banco de dados (substitui config.json)."""
         try:
-            with DatabaseHandler._get_connection() as conn:
+            with lote_cache.write_lock, DatabaseHandler._get_connection() as conn:
                 current_time = get_current_sao_paulo_time().strftime("%d/%m/%Y %H:%M:%S")
                 
                 # Buscar lote anterior
@@ -629,9 +1218,13 @@ class DatabaseHandler:
                     VALUES (?, ?, ?)
                     """, (machine_name, lote_value, current_time))
                 
+                cached_row = DatabaseHandler._fetch_lote_config(conn, machine_name)
                 conn.commit()
+                # Write-through: o cache só muda depois do commit e ainda sob o lock
+                lote_cache.set(machine_name, cached_row)
                 return True
         except Exception as e:
+            lote_cache.invalidate(machine_name)
             logging.error(f"Erro ao salvar lote no DB: {e}")
             return False
 
@@ -639,71 +1232,60 @@ class DatabaseHandler:
     def save_bobina_type_to_db(machine_name, tipo_bobina):
         """Salva o tipo da bobina no banco de dados."""
         try:
-            with DatabaseHandler._get_connection() as conn:
+            with lote_cache.write_lock, DatabaseHandler._get_connection() as conn:
                 conn.execute("""
                 UPDATE lote_config 
                 SET tipo_bobina = ?
                 WHERE machine_name = ?
                 """, (tipo_bobina, machine_name))
+                cached_row = DatabaseHandler._fetch_lote_config(conn, machine_name)
                 conn.commit()
+                if cached_row:
+                    lote_cache.set(machine_name, cached_row)
                 return True
         except Exception as e:
+            lote_cache.invalidate(machine_name)
             logging.error(f"Erro ao salvar tipo de bobina no DB: {e}")
             return False
 
     @staticmethod
     def get_lote_from_db(machine_name):
-        """Lê o lote atual do banco de dados."""
+        """Lê o lote atual (cache em memória com fallback para o banco)."""
         try:
-            with DatabaseHandler._get_connection() as conn:
-                cursor = conn.execute(
-                    "SELECT current_lote FROM lote_config WHERE machine_name = ?",
-                    (machine_name,)
-                )
-                row = cursor.fetchone()
-                if row:
-                    return row[0]
-                # Se não encontrar, tenta criar um registro padrão
-                logging.warning(f"Nenhum lote encontrado para {machine_name}, criando padrão...")
-                try:
-                    DatabaseHandler.save_lote_to_db(machine_name, "N/A")
-                    return "N/A"
-                except:
-                    return "Nenhum lote definido"
+            row = DatabaseHandler._get_lote_config(machine_name)
+            if row:
+                return row['current_lote']
+            # Se não encontrar, tenta criar um registro padrão
+            logging.warning(f"Nenhum lote encontrado para {machine_name}, criando padrão...")
+            try:
+                DatabaseHandler.save_lote_to_db(machine_name, "N/A")
+                return "N/A"
+            except:
+                return "Nenhum lote definido"
         except Exception as e:
             logging.error(f"Erro crítico ao buscar lote do DB ({machine_name}): {e}")
             return "Nenhum lote definido"
 
     @staticmethod
     def get_bobina_type_from_db(machine_name):
-        """Lê o tipo de bobina do banco de dados."""
+        """Lê o tipo de bobina (cache em memória com fallback para o banco)."""
         try:
-            with DatabaseHandler._get_connection() as conn:
-                cursor = conn.execute(
-                    "SELECT tipo_bobina FROM lote_config WHERE machine_name = ?",
-                    (machine_name,)
-                )
-                row = cursor.fetchone()
-                if row:
-                    return row[0]
-                return None
+            row = DatabaseHandler._get_lote_config(machine_name)
+            if row:
+                return row['tipo_bobina']
+            return None
         except Exception as e:
             logging.error(f"Erro ao buscar tipo de bobina do DB ({machine_name}): {e}")
             return None
 
     @staticmethod
     def get_bobina_saida_from_db(machine_name):
-        """Lê a bobina de saída do banco de dados."""
+        """Lê a bobina de saída (cache em memória com fallback para o banco)."""
         try:
-            with DatabaseHandler._get_connection() as conn:
-                cursor = conn.execute(
-                    "SELECT bobina_saida, data_saida FROM lote_config WHERE machine_name = ?",
-                    (machine_name,)
-                )
-                row = cursor.fetchone()
-                if row:
-                    return {'lote': row[0] or 'Nenhuma bobina saída', 'data_saida': row[1] or ''}
-                return {'lote': 'Nenhuma bobina saída', 'data_saida': ''}
+            row = DatabaseHandler._get_lote_config(machine_name)
+            if row:
+                return {'lote': row['bobina_saida'] or 'Nenhuma bobina saída', 'data_saida': row['data_saida'] or ''}
+            return {'lote': 'Nenhuma bobina saída', 'data_saida': ''}
         except Exception as e:
             logging.error(f"Erro ao buscar bobina de saída do DB ({machine_name}): {e}")
-            return {'lote': 'Nenhuma bobina saída', 'data_saida': ''}
\ No newline at end of file
+            return {'lote': 'Nenhuma bobina saída', 'data_saida': ''}
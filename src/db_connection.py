@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import logging
+
+DB_FILE = os.getenv("DB_FILE", "production_data.db")
+DB_TIMEOUT = 10.0
+
+# PRAGMAs aplicados uma única vez por conexão (configuráveis via .env)
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")       # OFF | NORMAL | FULL | EXTRA
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", -16000))      # Negativo = KiB (16 MB)
+DB_TEMP_STORE = os.getenv("DB_TEMP_STORE", "MEMORY")         # DEFAULT | FILE | MEMORY
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 268435456))     # 256 MB
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", 256))  # Prepared statements por conexão
+
+_ALLOWED = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+class ConnectionManager:
+    """Mantém uma conexão SQLite persistente por thread.
+
+    Cada thread (monitor de PLC, worker do FastAPI, escritor em lote) reutiliza a mesma conexão,
+    com os PRAGMAs aplicados na criação e cache de prepared statements do módulo sqlite3.
+    `close_all` encerra as conexões de todas as threads no desligamento do servidor.
+    """
+    def __init__(self, db_file=DB_FILE, timeout=DB_TIMEOUT):
+        self.db_file = db_file
+        self.timeout = timeout
+        self.pragmas = self._build_pragmas()
+        self._local = threading.local()
+        self._registry = {}  # {thread_ident: conexão}
+        self._lock = threading.Lock()
+        self._generation = 0  # Incrementado por close_all para invalidar conexões locais
+
+    @staticmethod
+    def _build_pragmas():
+        # auto_vacuum precisa vir antes do journal_mode: só vale para banco novo (antes da 1ª escrita);
+        # bancos existentes mantêm o modo atual (ver DB_ENABLE_INCREMENTAL_VACUUM em db_maintenance)
+        pragmas = ["PRAGMA auto_vacuum=INCREMENTAL;"]
+        for name, value in (("journal_mode", DB_JOURNAL_MODE), ("synchronous", DB_SYNCHRONOUS), ("temp_store", DB_TEMP_STORE)):
+            value = value.upper()
+            if value in _ALLOWED[name]:
+                pragmas.append(f"PRAGMA {name}={value};")
+            else:
+                logging.warning(f"Valor inválido para PRAGMA {name}: {value} (ignorado)")
+        pragmas.append(f"PRAGMA cache_size={DB_CACHE_SIZE};")
+        pragmas.append(f"PRAGMA mmap_size={DB_MMAP_SIZE};")
+        return pragmas
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=self.timeout,
+            cached_statements=DB_STATEMENT_CACHE,
+            check_same_thread=False  # Apenas para permitir close_all a partir da thread de desligamento
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def get(self):
+        """Retorna a conexão da thread atual, criando-a se necessário."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.generation == self._generation:
+            return conn
+
+        conn = self._connect()
+        with self._lock:
+            self._purge_dead_threads()
+            self._registry[threading.get_ident()] = conn
+            self._local.conn = conn
+            self._local.generation = self._generation
+        return conn
+
+    def close_current(self):
+        """Fecha a conexão da thread atual (chamado ao fim dos loops de monitoramento)."""
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        with self._lock:
+            self._registry.pop(threading.get_ident(), None)
+        if conn is not None:
+            self._safe_close(conn)
+
+    def close_all(self):
+        """Fecha as conexões de todas as threads (desligamento do servidor)."""
+        with self._lock:
+            conns = list(self._registry.values())
+            self._registry.clear()
+            self._generation += 1
+        for conn in conns:
+            self._safe_close(conn)
+        self._local.conn = None
+        if conns:
+            logging.info(f"{len(conns)} conexões SQLite encerradas.")
+
+    def _purge_dead_threads(self):
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._registry if i not in alive]:
+            self._safe_close(self._registry.pop(ident))
+
+    @staticmethod
+    def _safe_close(conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.close()
+        except Exception as e:
+            logging.warning(f"Erro ao fechar conexão SQLite: {e}")
+
+connection_manager = ConnectionManager()
@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+import logging
+from timezone_utils import get_current_sao_paulo_time
+from src.database_handler import DatabaseHandler
+
+DB_MAINT_INTERVAL = float(os.getenv("DB_MAINT_INTERVAL", 60))                        # Verificação (s)
+DB_WAL_CHECKPOINT_BYTES = int(os.getenv("DB_WAL_CHECKPOINT_BYTES", 64 * 1024 * 1024)) # Limite do -wal
+DB_OPTIMIZE_INTERVAL_HOURS = float(os.getenv("DB_OPTIMIZE_INTERVAL_HOURS", 6))
+DB_OPTIMIZE_ANALYSIS_LIMIT = int(os.getenv("DB_OPTIMIZE_ANALYSIS_LIMIT", 400))
+DB_VACUUM_FREELIST_PAGES = int(os.getenv("DB_VACUUM_FREELIST_PAGES", 2000))          # Páginas livres toleradas
+DB_VACUUM_PAGES_PER_STEP = int(os.getenv("DB_VACUUM_PAGES_PER_STEP", 500))
+DB_VACUUM_STEP_SLEEP = float(os.getenv("DB_VACUUM_STEP_SLEEP", 0.2))
+# Conversão única de bancos antigos (auto_vacuum=NONE) via VACUUM completo: bloqueia as escritas
+DB_ENABLE_INCREMENTAL_VACUUM = os.getenv("DB_ENABLE_INCREMENTAL_VACUUM", "false").lower() in ("1", "true", "yes", "sim")
+# Janela ociosa (horário de São Paulo, ex.: "2-5") em que o checkpoint agendado pode escalar para TRUNCATE; vazio desativa
+DB_MAINT_IDLE_HOURS = os.getenv("DB_MAINT_IDLE_HOURS", "")
+
+TASKS = ("checkpoint", "optimize", "vacuum")
+
+class DatabaseMaintenance:
+    """Manutenção periódica do SQLite em uma thread própria.
+
+    - checkpoint: PASSIVE quando o -wal passa de DB_WAL_CHECKPOINT_BYTES. TRUNCATE (que espera
+      leitores e escritores) só quando o PASSIVE deixou páginas para trás e, no agendamento,
+      apenas dentro de DB_MAINT_IDLE_HOURS; pelo endpoint administrativo, a qualquer hora.
+    - optimize: PRAGMA optimize (ANALYZE limitado) a cada DB_OPTIMIZE_INTERVAL_HOURS.
+    - vacuum: incremental_vacuum em etapas quando há páginas livres acumuladas ou após
+      exclusões de retenção (`request_vacuum`).
+
+    Cada execução é cronometrada e o histórico fica disponível em /api/admin/manutencao.
+    """
+    def __init__(self, interval=DB_MAINT_INTERVAL):
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self._vacuum_requested = False
+        self._next_optimize = time.monotonic() + DB_OPTIMIZE_INTERVAL_HOURS * 3600
+        self.tasks = {name: {"runs": 0, "errors": 0, "last_run": None, "last_duration_ms": None,
+                             "last_result": None, "last_error": None} for name in TASKS}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="DB-Maintenance")
+        self._thread.start()
+
+    def stop(self, timeout=15):
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def request_vacuum(self):
+        """Sinaliza que houve exclusões de retenção (chamado pela outbox, dedupe etc.)."""
+        self._vacuum_requested = True
+        self._wakeup.set()
+
+    def _run(self):
+        try:
+            if DB_ENABLE_INCREMENTAL_VACUUM:
+                self._convert_auto_vacuum()
+            while not self._stop_event.is_set():
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+                if self._stop_event.is_set():
+                    break
+                self.run_due()
+        finally:
+            DatabaseHandler.close_connection()
+
+    def run_due(self):
+        """Executa as tarefas cujo gatilho foi atingido."""
+        try:
+            stats = DatabaseHandler.get_storage_stats()
+        except Exception as e:
+            logging.error(f"Manutenção do banco: erro ao ler estatísticas: {e}")
+            return
+        if stats["wal_bytes"] > DB_WAL_CHECKPOINT_BYTES:
+            self.run_task("checkpoint")
+        if time.monotonic() >= self._next_optimize:
+            self.run_task("optimize")
+        # Sem auto_vacuum incremental não há o que devolver: só roda quando solicitado (registra o motivo)
+        freelist_due = stats["auto_vacuum"] == "INCREMENTAL" and stats["freelist_pages"] > DB_VACUUM_FREELIST_PAGES
+        if self._vacuum_requested or freelist_due:
+            self.run_task("vacuum")
+
+    def run_task(self, name, manual=False):
+        """Executa uma tarefa e registra a duração. `manual=True` vem do endpoint administrativo."""
+        if name not in TASKS:
+            raise ValueError(f"Tarefa de manutenção desconhecida: {name}")
+        task = self.tasks[name]
+        with self._run_lock:
+            started = time.monotonic()
+            try:
+                if name == "checkpoint":
+                    result = self._checkpoint(allow_truncate=manual or self._in_idle_hours())
+                else:
+                    result = getattr(self, f"_{name}")()
+                task["last_error"] = None
+            except Exception as e:
+                result = None
+                task["errors"] += 1
+                task["last_error"] = str(e)
+                logging.error(f"Manutenção do banco ({name}) falhou: {e}")
+            duration_ms = round((time.monotonic() - started) * 1000, 1)
+            task["runs"] += 1
+            task["last_run"] = get_current_sao_paulo_time().strftime("%d/%m/%Y %H:%M:%S")
+            task["last_duration_ms"] = duration_ms
+            task["last_result"] = result
+        if result is not None:
+            logging.info(f"Manutenção do banco ({name}) em {duration_ms} ms: {result}")
+        return dict(task)
+
+    @staticmethod
+    def _in_idle_hours():
+        """True se o horário atual está na janela DB_MAINT_IDLE_HOURS ("início-fim", pode virar a meia-noite)."""
+        if not DB_MAINT_IDLE_HOURS:
+            return False
+        try:
+            start, end = (int(part) for part in DB_MAINT_IDLE_HOURS.split("-"))
+        except ValueError:
+            logging.error(f"DB_MAINT_IDLE_HOURS inválido: {DB_MAINT_IDLE_HOURS!r} (use, por exemplo, 2-5)")
+            return False
+        hour = get_current_sao_paulo_time().hour
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def _checkpoint(self, allow_truncate=False):
+        wal_before = DatabaseHandler.get_storage_stats()["wal_bytes"]
+        result = DatabaseHandler.wal_checkpoint("PASSIVE")
+        result["mode"] = "PASSIVE"
+        # PASSIVE não bloqueia ninguém; se leitores/escritores deixaram frames para trás, TRUNCATE
+        # espera por eles (segura as gravações da aquisição), por isso só fora do horário produtivo
+        if allow_truncate and result["checkpointed_pages"] < result["wal_pages"]:
+            truncated = DatabaseHandler.wal_checkpoint("TRUNCATE")
+            result["mode"] = "PASSIVE+TRUNCATE" if not truncated["busy"] else "PASSIVE+TRUNCATE(busy)"
+        result["wal_bytes_before"] = wal_before
+        result["wal_bytes_after"] = DatabaseHandler.get_storage_stats()["wal_bytes"]
+        return result
+
+    def _optimize(self):
+        DatabaseHandler.optimize_database(DB_OPTIMIZE_ANALYSIS_LIMIT)
+        self._next_optimize = time.monotonic() + DB_OPTIMIZE_INTERVAL_HOURS * 3600
+        return {"analysis_limit": DB_OPTIMIZE_ANALYSIS_LIMIT}
+
+    def _vacuum(self):
+        self._vacuum_requested = False
+        stats = DatabaseHandler.get_storage_stats()
+        free_before = stats["freelist_pages"]
+        if stats["auto_vacuum"] != "INCREMENTAL":
+            return {"skipped": f"auto_vacuum={stats['auto_vacuum']} (use DB_ENABLE_INCREMENTAL_VACUUM)",
+                    "freelist_pages": free_before}
+        # Em etapas curtas para não segurar o lock de escrita da aquisição
+        remaining = free_before
+        while remaining > 0 and not self._stop_event.is_set():
+            DatabaseHandler.incremental_vacuum(DB_VACUUM_PAGES_PER_STEP)
+            previous, remaining = remaining, DatabaseHandler.get_storage_stats()["freelist_pages"]
+            if remaining >= previous:
+                break  # Sem progresso (ex.: banco ocupado por outra escrita): tenta na próxima rodada
+            if remaining > 0:
+                time.sleep(DB_VACUUM_STEP_SLEEP)
+        return {"freelist_before": free_before, "freelist_after": remaining,
+                "bytes_released": (free_before - remaining) * stats["page_size"]}
+
+    def _convert_auto_vacuum(self):
+        try:
+            if DatabaseHandler.get_storage_stats()["auto_vacuum"] == "INCREMENTAL":
+                return
+            started = time.monotonic()
+            logging.warning("Convertendo o banco para auto_vacuum=INCREMENTAL (VACUUM completo)...")
+            DatabaseHandler.enable_incremental_vacuum()
+            logging.info(f"Conversão para auto_vacuum=INCREMENTAL concluída em {time.monotonic() - started:.1f}s.")
+        except Exception as e:
+            logging.error(f"Falha ao converter auto_vacuum: {e}")
+
+    def status(self):
+        """Estado do armazenamento, configuração e histórico de cada tarefa."""
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "storage": DatabaseHandler.get_storage_stats(),
+            "config": {
+                "interval_seconds": self.interval,
+                "wal_checkpoint_bytes": DB_WAL_CHECKPOINT_BYTES,
+                "optimize_interval_hours": DB_OPTIMIZE_INTERVAL_HOURS,
+                "vacuum_freelist_pages": DB_VACUUM_FREELIST_PAGES,
+                "idle_hours": DB_MAINT_IDLE_HOURS or None,
+            },
+            "tasks": {name: dict(task) for name, task in self.tasks.items()},
+        }
+
+db_maintenance = DatabaseMaintenance()
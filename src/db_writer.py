@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+import time
+import logging
+from src.metrics import DB_WRITER_FLUSH_SECONDS, DB_WRITER_ITEMS
+
+DB_WRITER_FLUSH_INTERVAL = float(os.getenv("DB_WRITER_FLUSH_INTERVAL", 1.0))  # Latência máxima (s)
+DB_WRITER_MAX_BATCH = int(os.getenv("DB_WRITER_MAX_BATCH", 500))
+DB_WRITER_QUEUE_SIZE = int(os.getenv("DB_WRITER_QUEUE_SIZE", 5000))
+DB_WRITER_PUT_TIMEOUT = float(os.getenv("DB_WRITER_PUT_TIMEOUT", 2.0))  # Backpressure no produtor (s)
+
+_STOP = object()
+
+class BatchDatabaseWriter:
+    """Escritor único em segundo plano (write-behind) para o tráfego por ciclo dos PLCs.
+
+    Os produtores enfileiram (sql, params) e a thread do escritor agrupa tudo que chegar
+    dentro da janela de flush em uma única transação (um único fsync no WAL).
+    - Latência limitada: nenhum item espera mais que `flush_interval` na fila.
+    - Backpressure: fila limitada; o produtor bloqueia até `put_timeout` e, se ainda
+      estiver cheia, `submit` retorna False para o chamador gravar de forma síncrona.
+    - Itens com `key` são coalescidos dentro do lote (vale o último, ex.: UPSERT de status).
+    """
+    def __init__(self, connection_factory, connection_closer=None, flush_interval=DB_WRITER_FLUSH_INTERVAL,
+                 max_batch=DB_WRITER_MAX_BATCH, queue_size=DB_WRITER_QUEUE_SIZE,
+                 put_timeout=DB_WRITER_PUT_TIMEOUT):
+        self.connection_factory = connection_factory
+        self.connection_closer = connection_closer
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.put_timeout = put_timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._running = False
+        self.flushed_batches = 0
+        self.flushed_items = 0
+        self.rejected_items = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="DB-Writer")
+        self._thread.start()
+        logging.info(f"Escritor em lote do banco iniciado (janela {self.flush_interval}s, lote máx. {self.max_batch}).")
+
+    def submit(self, sql, params, key=None) -> bool:
+        """Enfileira uma escrita. Retorna False se o escritor não puder aceitá-la."""
+        if not self._running:
+            return False
+        try:
+            self.queue.put((sql, params, key), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.rejected_items += 1
+            logging.warning("Fila do escritor do banco cheia; gravando de forma síncrona.")
+            return False
+
+    def stop(self, timeout=10):
+        """Para de aceitar escritas e garante o flush de tudo que já foi enfileirado."""
+        if not self._running:
+            return
+        self._running = False
+        self.queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+        logging.info(f"Escritor do banco encerrado ({self.flushed_items} escritas em {self.flushed_batches} lotes).")
+
+    def _run(self):
+        conn = self.connection_factory()
+        try:
+            stopping = False
+            while not stopping:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                if item is _STOP:
+                    break
+
+                batch = [item]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._flush(conn, batch)
+
+            # Drena o que sobrou na fila antes de encerrar
+            leftover = []
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    leftover.append(item)
+            if leftover:
+                self._flush(conn, leftover)
+        finally:
+            if self.connection_closer:
+                self.connection_closer()
+            else:
+                conn.close()
+
+    def _flush(self, conn, batch):
+        started = time.perf_counter()
+        ops = {}
+        for i, (sql, params, key) in enumerate(batch):
+            ops[key if key is not None else i] = (sql, params)
+        try:
+            with conn:
+                for sql, params in ops.values():
+                    conn.execute(sql, params)
+        except Exception as e:
+            logging.error(f"Erro no flush em lote ({len(ops)} escritas), gravando individualmente: {e}")
+            for sql, params in ops.values():
+                try:
+                    with conn:
+                        conn.execute(sql, params)
+                except Exception as row_error:
+                    logging.error(f"Escrita descartada pelo escritor do banco: {row_error}")
+        self.flushed_batches += 1
+        self.flushed_items += len(ops)
+        DB_WRITER_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        DB_WRITER_ITEMS.inc(amount=len(ops))
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+import logging
+from collections import deque
+from src.database_handler import DatabaseHandler
+from src.db_maintenance import db_maintenance
+
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", 5))   # Varredura da fila (s)
+EMAIL_OUTBOX_BATCH = int(os.getenv("EMAIL_OUTBOX_BATCH", 20))                    # E-mails por rodada
+EMAIL_RETRY_BASE = float(os.getenv("EMAIL_RETRY_BASE", 30))                      # 1ª retentativa (s), dobra a cada falha
+EMAIL_RETRY_MAX = float(os.getenv("EMAIL_RETRY_MAX", 3600))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 8))
+EMAIL_COALESCE_WINDOW = float(os.getenv("EMAIL_COALESCE_WINDOW", 600))           # Janela de agrupamento (s)
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", 7))
+
+class EmailOutbox:
+    """Despachante da tabela email_outbox.
+
+    `enqueue` grava o e-mail no SQLite (durável) e acorda a thread despachante, que envia em
+    lotes pela sessão SMTP reutilizada do pool. Falhas são reagendadas com backoff exponencial
+    (EMAIL_RETRY_BASE * 2^tentativas, até EMAIL_RETRY_MAX); após EMAIL_MAX_ATTEMPTS o e-mail fica
+    como 'failed'. Alertas com a mesma `coalesce_key` dentro da janela viram um único resumo.
+    """
+    def __init__(self, coalesce_window=EMAIL_COALESCE_WINDOW, batch_size=EMAIL_OUTBOX_BATCH,
+                 poll_interval=EMAIL_OUTBOX_POLL_INTERVAL):
+        self.coalesce_window = coalesce_window
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.sender = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+        self._last_purge = 0.0
+        # Métricas (desde o início do processo)
+        self.sent_count = 0
+        self.failed_attempts = 0
+        self.given_up = 0
+        self._latencies = deque(maxlen=200)       # Enfileirado -> enviado (s)
+        self._send_durations = deque(maxlen=200)  # Duração da chamada SMTP (s)
+
+    def start(self, sender):
+        """`sender` é o EmailNotifier (usa `deliver`)."""
+        if self._running:
+            return
+        self.sender = sender
+        self._running = True
+        released = DatabaseHandler.release_claimed_emails()  # Reservas de uma execução interrompida
+        if released:
+            logging.warning(f"Outbox: {released} e-mails em envio no desligamento anterior voltaram para a fila.")
+        self._thread = threading.Thread(target=self._run, daemon=True, name="Email-Outbox")
+        self._thread.start()
+        stats = DatabaseHandler.get_email_outbox_stats()
+        logging.info(f"Outbox de e-mails iniciada ({stats['pending']} pendentes).")
+
+    def stop(self, timeout=10):
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        self._thread.join(timeout=timeout)
+
+    def enqueue(self, subject, message, is_error=False, recipients=None, coalesce_key=None):
+        email_id = DatabaseHandler.enqueue_email(
+            subject, message['text'], message['html'], recipients=recipients, is_error=is_error,
+            coalesce_key=coalesce_key, coalesce_window=self.coalesce_window
+        )
+        self._wakeup.set()
+        return email_id
+
+    def _run(self):
+        try:
+            while self._running:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                if not self._running:
+                    break
+                try:
+                    while self._dispatch_due() == self.batch_size:
+                        pass  # Lote cheio: provavelmente há mais na fila
+                    self._purge_if_due()
+                except Exception as e:
+                    logging.error(f"Erro no despachante de e-mails: {e}")
+                    try:
+                        DatabaseHandler.release_claimed_emails()  # Não deixa reservas presas até o reinício
+                    except Exception:
+                        pass
+        finally:
+            DatabaseHandler.close_connection()
+
+    def _dispatch_due(self):
+        rows = DatabaseHandler.claim_due_emails(self.batch_size)
+        sent_ids = []
+        for row in rows:
+            subject, message = self._build_message(row)
+            started = time.monotonic()
+            try:
+                delivered = self.sender.deliver(subject, message, bool(row['is_error']), recipients=row['recipients'])
+            except Exception as e:
+                self._schedule_retry(row, e)
+                continue
+            if not delivered:
+                self.given_up += 1
+                DatabaseHandler.reschedule_email(row['id'], time.time(), "Nenhum destinatário configurado", give_up=True)
+                continue
+            self._send_durations.append(time.monotonic() - started)
+            self._latencies.append(time.time() - row['created_ts'])
+            sent_ids.append(row['id'])
+        DatabaseHandler.mark_emails_sent(sent_ids)
+        self.sent_count += len(sent_ids)
+        return len(rows)
+
+    def _schedule_retry(self, row, error):
+        attempts = row['attempts'] + 1
+        give_up = attempts >= EMAIL_MAX_ATTEMPTS
+        delay = min(EMAIL_RETRY_BASE * (2 ** (attempts - 1)), EMAIL_RETRY_MAX)
+        DatabaseHandler.reschedule_email(row['id'], time.time() + delay, error, give_up=give_up)
+        self.failed_attempts += 1
+        if give_up:
+            self.given_up += 1
+            logging.error(f"E-mail '{row['subject']}' descartado após {attempts} tentativas: {error}")
+        else:
+            logging.warning(f"Falha ao enviar '{row['subject']}' (tentativa {attempts}), nova tentativa em {delay:.0f}s: {error}")
+
+    @staticmethod
+    def _build_message(row):
+        """Monta assunto e corpo; alertas agrupados ganham o resumo das repetições."""
+        subject = row['subject']
+        message = {'text': row['body_text'], 'html': row['body_html']}
+        occurrences = row['occurrences']
+        if occurrences > 1:
+            note = f"Este alerta ocorreu {occurrences} vezes entre {row['created_at']} e {row['last_seen_at']}."
+            subject = f"{subject} ({occurrences}x)"
+            message = {
+                'text': f"{message['text']}\n\n{note}",
+                'html': f"{message['html']}<p style=\"font-size:12px;color:#64748b;\">{note}</p>"
+            }
+        return subject, message
+
+    def _purge_if_due(self):
+        now = time.time()
+        if now - self._last_purge < 3600:
+            return
+        self._last_purge = now
+        removed = DatabaseHandler.purge_sent_emails(now - EMAIL_OUTBOX_RETENTION_DAYS * 86400)
+        if removed:
+            logging.info(f"Outbox: {removed} e-mails enviados antigos removidos.")
+            db_maintenance.request_vacuum()
+
+    def metrics(self):
+        """Profundidade da fila, falhas e latências (para /api/admin/email/outbox)."""
+        stats = DatabaseHandler.get_email_outbox_stats()
+        latencies = list(self._latencies)
+        durations = list(self._send_durations)
+        stats.update({
+            "dispatcher_running": self._running,
+            "sent_since_start": self.sent_count,
+            "failed_attempts_since_start": self.failed_attempts,
+            "given_up_since_start": self.given_up,
+            "queue_latency_avg_seconds": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "queue_latency_max_seconds": round(max(latencies), 3) if latencies else None,
+            "send_duration_avg_seconds": round(sum(durations) / len(durations), 3) if durations else None,
+        })
+        return stats
+
+email_outbox = EmailOutbox()
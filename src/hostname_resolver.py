@@ -0,0 +1,174 @@
+import os
+import re
+import time
+import socket
+import asyncio
+import logging
+from collections import OrderedDict
+from src.async_db import run_blocking, DNS_WORKERS
+
+HOSTNAME_CACHE_MAX = int(os.getenv("HOSTNAME_CACHE_MAX", 1024))         # IPs mantidos no LRU
+HOSTNAME_CACHE_TTL = float(os.getenv("HOSTNAME_CACHE_TTL", 1800))       # Nome resolvido válido por (s)
+HOSTNAME_NEGATIVE_TTL = float(os.getenv("HOSTNAME_NEGATIVE_TTL", 300))  # UNKNOWN válido por (s)
+HOSTNAME_STEP_TIMEOUT = float(os.getenv("HOSTNAME_STEP_TIMEOUT", 1.5))  # Orçamento de cada etapa (s)
+HOSTNAME_WAIT_BUDGET = float(os.getenv("HOSTNAME_WAIT_BUDGET", 3.0))    # Espera máxima da requisição (s)
+HOSTNAME_AUTH_TTL = float(os.getenv("HOSTNAME_AUTH_TTL", 60))           # Idade máxima aceita em autorização (s)
+
+UNKNOWN = "UNKNOWN"
+_NBTSTAT_NAME = re.compile(r'^\s*([A-Za-z0-9\-]+)')
+
+def _short_name(name: str) -> str:
+    return name.split('.')[0].upper()
+
+def _reverse_dns(ip_address):
+    return _short_name(socket.gethostbyaddr(ip_address)[0])
+
+def _fqdn(ip_address):
+    fqdn = socket.getfqdn(ip_address)
+    return _short_name(fqdn) if fqdn and fqdn != ip_address else None
+
+class HostnameResolver:
+    """Resolução IP -> hostname sem bloquear o event loop.
+
+    - LRU limitado a HOSTNAME_CACHE_MAX entradas.
+    - Entrada vencida é devolvida na hora e renovada em segundo plano.
+    - Consultas simultâneas ao mesmo IP compartilham a mesma resolução.
+    - Cada etapa (DNS reverso -> FQDN -> nbtstat) tem seu próprio prazo; a requisição espera no
+      máximo HOSTNAME_WAIT_BUDGET e, se estourar, recebe UNKNOWN enquanto a resolução continua.
+    - resolve(ip, fresh=True) é para decisões de autorização: só aceita do cache nomes consultados
+      há até HOSTNAME_AUTH_TTL segundos; caso contrário espera a consulta. Se o DNS falhar ou estourar
+      o prazo, vale o último nome resolvido com sucesso dentro de HOSTNAME_CACHE_TTL.
+    - Consultas DNS bloqueantes não podem ser canceladas: enquanto `dns_slots` delas ainda estiverem
+      rodando (travadas), novas etapas DNS são puladas em vez de enfileirar atrás delas no pool.
+    Deve ser usado apenas a partir do event loop da API.
+    """
+    def __init__(self, max_entries=HOSTNAME_CACHE_MAX, ttl=HOSTNAME_CACHE_TTL,
+                 negative_ttl=HOSTNAME_NEGATIVE_TTL, step_timeout=HOSTNAME_STEP_TIMEOUT,
+                 wait_budget=HOSTNAME_WAIT_BUDGET, auth_ttl=HOSTNAME_AUTH_TTL, dns_slots=DNS_WORKERS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.step_timeout = step_timeout
+        self.wait_budget = wait_budget
+        self.auth_ttl = auth_ttl
+        self.dns_slots = dns_slots
+        self._cache = OrderedDict()  # {ip: (nome, resolvido_em, consultado_em)}
+        self._inflight = {}          # {ip: asyncio.Task}
+        self._dns_running = 0        # Chamadas bloqueantes ainda ocupando o pool "dns"
+        self.dns_skipped = 0
+
+    async def resolve(self, ip_address: str, fresh: bool = False) -> str:
+        if ip_address == "127.0.0.1":
+            return socket.gethostname().upper()
+
+        entry = self._cache.get(ip_address)
+        if entry:
+            self._cache.move_to_end(ip_address)
+            name, resolved_at, checked_at = entry
+            now = time.monotonic()
+            expired = now - resolved_at >= self._ttl_for(name)
+            if fresh:
+                if not expired and now - checked_at < self.auth_ttl:
+                    return name
+                # Autorização: não serve nome sem consulta recente; segue para a consulta abaixo
+            else:
+                if expired:
+                    self._refresh(ip_address)  # Serve o nome antigo; renova em segundo plano
+                return name
+
+        task = self._refresh(ip_address)
+        try:
+            # shield: o prazo da requisição não cancela a resolução compartilhada
+            return await asyncio.wait_for(asyncio.shield(task), timeout=self.wait_budget)
+        except asyncio.TimeoutError:
+            name = self._last_known(ip_address)
+            logging.warning(f"Resolução de hostname de {ip_address} excedeu {self.wait_budget}s; seguindo como {name}.")
+            return name
+
+    def _last_known(self, ip_address):
+        """Último nome resolvido com sucesso ainda dentro do TTL normal (ou UNKNOWN)."""
+        entry = self._cache.get(ip_address)
+        if entry and entry[0] != UNKNOWN and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return UNKNOWN
+
+    def _ttl_for(self, name):
+        # UNKNOWN vale menos para não fixar uma falha de resolução por muito tempo
+        return self.ttl if name != UNKNOWN else self.negative_ttl
+
+    def _refresh(self, ip_address):
+        """Retorna a resolução em andamento para o IP ou inicia uma nova (coalescência)."""
+        task = self._inflight.get(ip_address)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._lookup(ip_address))
+            self._inflight[ip_address] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(ip_address, None))
+        return task
+
+    async def _lookup(self, ip_address):
+        name = None
+        for step in (self._step_reverse_dns, self._step_fqdn, self._step_nbtstat):
+            try:
+                name = await step(ip_address)
+            except Exception:
+                name = None
+            if name:
+                break
+        now = time.monotonic()
+        if name:
+            self._cache[ip_address] = (name, now, now)
+        else:
+            # Falha do DNS não apaga um nome conhecido ainda válido: só registra a tentativa
+            name = self._last_known(ip_address)
+            resolved_at = self._cache[ip_address][1] if name != UNKNOWN else now
+            # Salva mesmo UNKNOWN (com validade menor) para evitar retentativas lentas imediatas
+            self._cache[ip_address] = (name, resolved_at, now)
+        self._cache.move_to_end(ip_address)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return name
+
+    async def _run_dns(self, func, ip_address):
+        """Executa uma consulta bloqueante no pool "dns" com prazo, sem acumular threads travadas."""
+        if self._dns_running >= self.dns_slots:
+            self.dns_skipped += 1
+            return None
+        self._dns_running += 1
+        call = asyncio.ensure_future(run_blocking(func, ip_address, pool="dns"))
+        call.add_done_callback(self._dns_call_done)
+        # shield: o prazo libera a requisição, mas a vaga só é devolvida quando a thread terminar
+        return await asyncio.wait_for(asyncio.shield(call), timeout=self.step_timeout)
+
+    def _dns_call_done(self, call):
+        self._dns_running -= 1
+        if not call.cancelled():
+            call.exception()  # Evita o aviso de exceção não lida quando o prazo já estourou
+
+    async def _step_reverse_dns(self, ip_address):
+        # Pool "dns" dedicado: uma consulta travada não ocupa os workers de SMTP/PLC
+        return await self._run_dns(_reverse_dns, ip_address)
+
+    async def _step_fqdn(self, ip_address):
+        return await self._run_dns(_fqdn, ip_address)
+
+    async def _step_nbtstat(self, ip_address):
+        # NBTSTAT (Específico Windows); processo encerrado se estourar o prazo
+        proc = await asyncio.create_subprocess_exec(
+            'nbtstat', '-A', ip_address, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=self.step_timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return None
+        if proc.returncode != 0:
+            return None
+        for line in stdout.decode(errors='ignore').splitlines():
+            if "<00>" in line and "UNIQUE" in line:
+                match = _NBTSTAT_NAME.search(line)
+                if match:
+                    return match.group(1).upper()
+        return None
+
+hostname_resolver = HostnameResolver()
@@ -0,0 +1,133 @@
+import os
+import gzip
+import heapq
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", 1000))   # Registros mantidos por nível
+LOG_FILE_PREFIX = "plc_system_"
+_READ_BLOCK = 64 * 1024
+
+class RingBufferHandler(logging.Handler):
+    """Mantém os últimos LOG_BUFFER_SIZE registros formatados de cada nível em memória.
+
+    Alimenta o /api/logs sem reler o arquivo do dia: a consulta custa O(limit), não O(arquivo).
+    """
+    def __init__(self, capacity=LOG_BUFFER_SIZE):
+        super().__init__()
+        self.capacity = capacity
+        self._buffers = {}  # {levelname: deque[(seq, created, linha)]}
+        self._seq = 0
+        self._buffer_lock = threading.Lock()
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._buffer_lock:
+            self._seq += 1
+            buffer = self._buffers.get(record.levelname)
+            if buffer is None:
+                buffer = self._buffers[record.levelname] = deque(maxlen=self.capacity)
+            buffer.append((self._seq, record.created, line))
+
+    @staticmethod
+    def _recent(buffer, limit, since):
+        # Percorre do fim para o início: para no limite ou no primeiro registro anterior a `since`
+        entries = []
+        for entry in reversed(buffer):
+            if (since is not None and entry[1] < since) or len(entries) >= limit:
+                break
+            entries.append(entry)
+        entries.reverse()
+        return entries
+
+    def tail(self, limit, level=None, since=None):
+        """Últimas `limit` linhas registradas a partir de `since` (epoch), de um nível ou de todos,
+        em ordem cronológica."""
+        with self._buffer_lock:
+            if level:
+                entries = self._recent(self._buffers.get(level.upper(), ()), limit, since)
+            else:
+                tails = [self._recent(buffer, limit, since) for buffer in self._buffers.values()]
+                entries = list(heapq.merge(*tails))[-limit:]
+                # Os níveis descartam em ritmos diferentes: antes do registro mais antigo ainda retido
+                # por um buffer cheio pode faltar linha. Corta ali; o /api/logs completa pelo arquivo.
+                horizon = max((buffer[0][0] for buffer in self._buffers.values() if len(buffer) == self.capacity),
+                              default=0)
+                entries = [entry for entry in entries if entry[0] >= horizon]
+        return [line for _, _, line in entries]
+
+def _matches(line, level):
+    # Texto: "%(asctime)s - %(levelname)s - ..."; JSON Lines (LOG_FORMAT=json): "level": "..."
+    if not level:
+        return True
+    level = level.upper()
+    return f" - {level} - " in line or f'"level": "{level}"' in line
+
+def _tail_gzip(path, limit, level=None):
+    # Arquivo comprimido não permite seek do fim: leitura sequencial mantendo só as últimas linhas
+    lines = deque(maxlen=limit)
+    with gzip.open(path, 'rt', encoding='utf-8', errors='replace') as f:
+        for raw in f:
+            line = raw.strip()
+            if line and _matches(line, level):
+                lines.append(line)
+    return list(lines)
+
+def tail_file(path, limit, level=None):
+    """Lê o arquivo de trás para frente em blocos até juntar `limit` linhas (ordem cronológica)."""
+    lines = []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0 and len(lines) < limit:
+            size = min(_READ_BLOCK, position)
+            position -= size
+            f.seek(position)
+            chunk = f.read(size) + remainder
+            parts = chunk.split(b"\n")
+            # A 1ª parte pode ser uma linha incompleta: fica para o próximo bloco (exceto no início)
+            remainder = parts.pop(0) if position > 0 else b""
+            for raw in reversed(parts):
+                line = raw.decode('utf-8', errors='replace').strip()
+                if line and _matches(line, level):
+                    lines.append(line)
+                    if len(lines) >= limit:
+                        break
+    lines.reverse()
+    return lines
+
+def log_file_for(log_dir, day):
+    return os.path.join(log_dir, f"{LOG_FILE_PREFIX}{day.strftime('%Y%m%d')}.log")
+
+def read_logs(log_dir, limit, level=None, start_date=None, end_date=None):
+    """Últimas `limit` linhas entre `start_date` e `end_date` (dias inclusive), do mais recente
+    para o mais antigo: só os arquivos e blocos necessários são lidos."""
+    end_date = end_date or start_date
+    lines = []
+    day = end_date
+    while day >= start_date and len(lines) < limit:
+        path = log_file_for(log_dir, day)
+        if os.path.exists(path):
+            lines = tail_file(path, limit - len(lines), level) + lines
+        elif os.path.exists(f"{path}.gz"):  # Dia anterior comprimido (LOG_COMPRESS_ROTATED)
+            lines = _tail_gzip(f"{path}.gz", limit - len(lines), level) + lines
+        day -= timedelta(days=1)
+    return lines
+
+def parse_log_date(value):
+    """Aceita YYYY-MM-DD ou DD/MM/YYYY."""
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {value}")
+
+log_buffer = RingBufferHandler()
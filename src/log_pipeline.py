@@ -0,0 +1,116 @@
+import os
+import sys
+import gzip
+import json
+import queue
+import shutil
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, time as dt_time, timedelta
+from timezone_utils import SAO_PAULO_TZ, get_current_sao_paulo_time
+from src.log_buffer import log_buffer, log_file_for
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()   # text | json (arquivo em JSON Lines)
+LOG_COMPRESS_ROTATED = os.getenv("LOG_COMPRESS_ROTATED", "false").lower() in ("1", "true", "yes", "sim")
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - [%(name)s] %(message)s'
+
+class JsonLinesFormatter(logging.Formatter):
+    """Um objeto JSON por linha (para ingestão em ferramentas de log)."""
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class DailyFileHandler(logging.FileHandler):
+    """Grava em logs/plc_system_YYYYMMDD.log e troca de arquivo à meia-noite (horário de São Paulo).
+
+    O arquivo do dia anterior pode ser comprimido (.log.gz) em uma thread separada.
+    """
+    def __init__(self, log_dir, compress=LOG_COMPRESS_ROTATED):
+        self.log_dir = log_dir
+        self.compress = compress
+        today = get_current_sao_paulo_time().date()
+        self._rollover_at = self._next_midnight(today)
+        super().__init__(log_file_for(log_dir, today), encoding='utf-8', delay=True)
+
+    @staticmethod
+    def _next_midnight(day):
+        return SAO_PAULO_TZ.localize(datetime.combine(day + timedelta(days=1), dt_time())).timestamp()
+
+    def emit(self, record):
+        if record.created >= self._rollover_at:
+            self._rollover(record.created)
+        super().emit(record)
+
+    def _rollover(self, created):
+        previous = self.baseFilename
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        day = datetime.fromtimestamp(created, SAO_PAULO_TZ).date()
+        self.baseFilename = os.path.abspath(log_file_for(self.log_dir, day))
+        self._rollover_at = self._next_midnight(day)
+        if self.compress and previous != self.baseFilename and os.path.exists(previous):
+            threading.Thread(target=self._compress, args=(previous,), daemon=True, name="Log-Compress").start()
+
+    @staticmethod
+    def _compress(path):
+        try:
+            with open(path, 'rb') as src, gzip.open(f"{path}.gz", 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.remove(path)
+        except Exception as e:
+            logging.warning(f"Falha ao comprimir log {path}: {e}")
+
+_listener = None
+
+def start_logging(log_dir, level=logging.INFO):
+    """Raiz -> QueueHandler -> QueueListener (arquivo diário, console e buffer do /api/logs).
+
+    As threads de monitoramento só enfileiram o registro; formatação e escrita em disco
+    acontecem na thread do listener.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    os.makedirs(log_dir, exist_ok=True)
+
+    text_formatter = logging.Formatter(TEXT_FORMAT)
+    file_handler = DailyFileHandler(log_dir)
+    file_handler.setFormatter(JsonLinesFormatter() if LOG_FORMAT == "json" else text_formatter)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(text_formatter)
+    log_buffer.setFormatter(text_formatter)  # Painel admin sempre em texto
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, log_buffer, respect_handler_level=True
+    )
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Esvazia a fila e fecha os arquivos (desligamento do servidor)."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
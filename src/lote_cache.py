@@ -0,0 +1,42 @@
+import os
+import threading
+import time
+
+# Revalidação de segurança para alterações feitas fora do processo (scripts de manutenção).
+# 0 = nunca expira (só as rotas de escrita atualizam o cache).
+LOTE_CACHE_TTL = float(os.getenv("LOTE_CACHE_TTL", 300))
+
+class LoteConfigCache:
+    """Cache em memória (por processo) da tabela lote_config.
+
+    As escritas (save_lote_to_db / save_bobina_type_to_db) atualizam a entrada sob `write_lock`
+    na mesma operação que grava no banco (write-through), então o loop de aquisição lê o lote
+    e o tipo de bobina sem nenhum SELECT. Cada entrada é substituída inteira (nunca mutada),
+    de modo que os leitores não precisam de lock.
+    """
+    def __init__(self, ttl=LOTE_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}  # {machine_name: (dict_da_linha, carimbo_monotônico)}
+        self.write_lock = threading.RLock()
+
+    def get(self, machine_name):
+        """Retorna a linha cacheada (dict) ou None se ausente/expirada."""
+        entry = self._entries.get(machine_name)
+        if entry is None:
+            return None
+        row, loaded_at = entry
+        if self.ttl and time.monotonic() - loaded_at > self.ttl:
+            return None
+        return row
+
+    def set(self, machine_name, row):
+        self._entries[machine_name] = (dict(row), time.monotonic())
+
+    def invalidate(self, machine_name=None):
+        with self.write_lock:
+            if machine_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(machine_name, None)
+
+lote_cache = LoteConfigCache()
@@ -0,0 +1,109 @@
+import os
+import asyncio
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from timezone_utils import get_current_sao_paulo_time
+from src.async_db import run_blocking, run_io
+from email_utils import send_email_direct, recipient_cache
+from email_templates import format_lote_notification
+from plc_handler import PLC_COMMAND_TIMEOUT
+
+LOTE_JOBS_MAX = int(os.getenv("LOTE_JOBS_MAX", 200))  # Quantos envios recentes ficam consultáveis
+
+# Estados de cada etapa em segundo plano
+PENDING, DONE, FAILED, SKIPPED = "pendente", "concluido", "falhou", "ignorado"
+
+class LoteSubmissionPipeline:
+    """Etapas lentas do /enviar_lote executadas depois da resposta ao operador.
+
+    O lote já está gravado no banco quando `submit` é chamado; a gravação no PLC (pela fila de
+    comandos da máquina) e o e-mail rodam como tasks no event loop da API e cada etapa
+    atualiza o job, consultável em /api/lote/status/{job_id}.
+    """
+    def __init__(self, max_jobs=LOTE_JOBS_MAX):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()  # {job_id: dict}, os mais antigos são descartados
+        self._tasks = set()  # Referências fortes para as tasks não serem coletadas
+        self._lock = threading.Lock()
+
+    def submit(self, plc, lote, tipo_bobina, config, handler=None) -> dict:
+        """Registra o job e agenda as etapas em segundo plano (chamar de dentro do event loop)."""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "plc": plc,
+            "lote": lote,
+            "tipo_bobina": tipo_bobina,
+            "criado_em": get_current_sao_paulo_time().strftime("%d/%m/%Y %H:%M:%S"),
+            "plc_status": PENDING if handler else SKIPPED,
+            "email_status": PENDING,
+            "detalhe": None,
+            "concluido": False,
+        }
+        if not handler:
+            job["detalhe"] = "Monitoramento inativo: lote salvo apenas no sistema."
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+        task = asyncio.get_running_loop().create_task(self._run(job, config, handler))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    async def _run(self, job, config, handler):
+        # Etapas independentes: um SMTP lento não atrasa a gravação no PLC e vice-versa
+        await asyncio.gather(self._write_plc(job, handler), self._send_email(job, config))
+        job["concluido"] = True
+
+    async def _write_plc(self, job, handler):
+        if not handler:
+            return
+        # A escrita entra na fila de comandos do PLC e é executada pela thread de aquisição
+        future = handler.submit_write_lote(job["lote"], timeout=PLC_COMMAND_TIMEOUT)
+        try:
+            written = await asyncio.wait_for(asyncio.wrap_future(future), timeout=PLC_COMMAND_TIMEOUT + 1)
+        except asyncio.TimeoutError:
+            future.cancel()
+            logging.error(f"Prazo esgotado ao gravar lote {job['lote']} no PLC {job['plc']}.")
+            written = False
+        except Exception as e:
+            logging.error(f"Erro ao gravar lote {job['lote']} no PLC {job['plc']}: {e}")
+            written = False
+        job["plc_status"] = DONE if written else FAILED
+        if not written:
+            job["detalhe"] = "Não foi possível gravar no PLC no momento, mas o lote foi salvo no sistema."
+            logging.warning(f"Lote {job['lote']} salvo, mas não gravado no PLC {job['plc']}.")
+
+    async def _send_email(self, job, config):
+        try:
+            # Destinatários carregados do banco de dados (Escalável via Admin)
+            recipients = await run_blocking(recipient_cache.get)
+            if not recipients:
+                job["email_status"] = SKIPPED
+                return
+            email_message = format_lote_notification(job["lote"], job["plc"], config)
+            sent = await run_io(
+                send_email_direct,
+                to=recipients,
+                subject=f"✅ Lote {job['lote']} Inserido - {job['plc']}",
+                message=email_message
+            )
+            job["email_status"] = DONE if sent else FAILED
+        except Exception as e:
+            logging.error(f"Erro ao enviar notificação de lote: {e}")
+            job["email_status"] = FAILED
+
+    async def drain(self, timeout=10):
+        """Aguarda os envios em andamento (desligamento do servidor)."""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+lote_pipeline = LoteSubmissionPipeline()
@@ -0,0 +1,130 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Limites (s) pensados para leituras CIP/EtherNet-IP e escritas SQLite: de 1 ms a 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DRIFT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Contador monotônico por combinação de labels."""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+class Histogram:
+    """Histograma cumulativo no formato Prometheus (_bucket, _sum, _count)."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # {labels: [contagens por bucket..., soma, total]}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def collect(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            inf_labels = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Formato de exposição texto do Prometheus (version=0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+# --- Ciclo de aquisição (por máquina) ---
+PLC_READ_SECONDS = registry.histogram("plc_read_seconds", "Duração do plc.Read das tags do ciclo.", ("plc",))
+PLC_CYCLE_SECONDS = registry.histogram("plc_cycle_seconds", "Duração total do process_plc_data.", ("plc",))
+PLC_LOOP_DRIFT_SECONDS = registry.histogram(
+    "plc_loop_drift_seconds", "Período real entre ciclos menos o read_interval configurado.", ("plc",), DRIFT_BUCKETS
+)
+PLC_DB_WRITE_SECONDS = registry.histogram(
+    "plc_db_write_seconds", "Latência das escritas no banco feitas pelo ciclo do PLC.", ("plc", "operation")
+)
+PLC_RECONNECTS = registry.counter("plc_reconnects_total", "Tentativas de conexão/reconexão com o PLC.", ("plc", "result"))
+PLC_READ_FAILURES = registry.counter("plc_read_failures_total", "Leituras de tags com status diferente de Success.", ("plc",))
+PLC_CYCLE_ERRORS = registry.counter("plc_cycle_errors_total", "Ciclos interrompidos por exceção.", ("plc",))
+PLC_TRIGGER_EVENTS = registry.counter("plc_trigger_events_total", "Eventos de trigger processados.", ("plc", "event"))
+
+# --- Escritor em lote do banco ---
+DB_WRITER_FLUSH_SECONDS = registry.histogram("db_writer_flush_seconds", "Duração de cada flush (transação) do escritor em lote.")
+DB_WRITER_ITEMS = registry.counter("db_writer_items_total", "Escritas gravadas pelo escritor em lote.")
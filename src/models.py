@@ -57,6 +57,20 @@ class ShiftProductionSummary(BaseModel):
     Coil_Type: Optional[str] = Field(None, description="Tipo do material")
     Horário_Evento: Optional[str] = Field(None, description="Horário exato do registro")
 
+class ShiftProductionRollup(BaseModel):
+    Linha: str = Field(..., description="Número da linha (ex: 22, 23)")
+    Maquina: str = Field(..., description="Nome da máquina (ex: Cupper_22)")
+    Turno: str = Field(..., description="Turno de produção (A, B ou DIA, NOITE)")
+    Dt_turno: str = Field(..., description="Data lógica de produção (YYYY-MM-DD)")
+    Lote: str = Field(..., description="Número do lote/bobina")
+    Quantidade: int = Field(..., description="Soma dos copos dos registros do grupo")
+    Tamanho: Optional[str] = Field(None, description="Tamanho/formato do copo")
+    Tipo_Reporte: Optional[str] = Field(None, description="Tipo: Turno ou Total")
+    Coil_Type: Optional[str] = Field(None, description="Tipo do material")
+    Registros: int = Field(..., description="Quantidade de registros de produção agregados")
+    Primeiro_Evento: Optional[str] = Field(None, description="Horário do primeiro registro do grupo")
+    Ultimo_Evento: Optional[str] = Field(None, description="Horário do último registro do grupo")
+
 class LotProductionSummary(BaseModel):
     machine_name: str = Field(..., description="Nome da linha de produção / Production line name")
     coil_number: str = Field(..., description="Número identificador do lote/bobina / Batch/Coil identifier number")
@@ -66,6 +80,18 @@ class LotProductionSummary(BaseModel):
     end_time: str = Field(..., description="Horário de término do processamento do lote / Batch processing end time")
     consumption_type: Optional[str] = Field(None, description="Tipo de consumo da bobina (Completa/Parcial) / Coil consumption type")
 
+class CoilConsumptionSummary(BaseModel):
+    machine_name: str = Field(..., description="Nome da máquina (e.g., Cupper_22)")
+    production_date: str = Field(..., description="Data lógica de produção (YYYY-MM-DD)")
+    shift: str = Field(..., description="Turno de consumo (DIA/NOITE)")
+    lot_number: str = Field(..., description="Número do lote")
+    consumption_type: str = Field(..., description="Tipo de consumo (Completa/Parcial)")
+    coil_type: Optional[str] = Field(None, description="Tipo da bobina")
+    coil_count: int = Field(..., description="Quantidade de bobinas finalizadas")
+    consumed_quantity: int = Field(..., description="Total produzido pelas bobinas")
+    first_start: Optional[str] = Field(None, description="Início da primeira bobina")
+    last_end: Optional[str] = Field(None, description="Fim da última bobina")
+
 class ProductionShiftBreakdown(BaseModel):
     shift: str
     production_date: str
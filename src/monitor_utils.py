@@ -1,59 +1,100 @@
 import os
 import hashlib
 import logging
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
 
-EMAIL_LOCK_DURATION_MINUTES = 10
+EMAIL_LOCK_DURATION_MINUTES = int(os.getenv("EMAIL_LOCK_DURATION_MINUTES", 10))
+EMAIL_DEDUPE_MAX_ENTRIES = int(os.getenv("EMAIL_DEDUPE_MAX_ENTRIES", 1000))
+EMAIL_DEDUPE_PERSIST = os.getenv("EMAIL_DEDUPE_PERSIST", "False") == "True"  # Sobrevive a reinícios (tabela email_dedupe)
 
-def create_email_lock(plcs_list_for_report, lock_dir):
-    """Cria um arquivo de trava para evitar o envio de e-mails repetidos."""
-    report_identifier = ";".join(
-        sorted([f"{p.plc_name}:{p.main_value}:{p.size}" for p in plcs_list_for_report]))
-    
-    hasher = hashlib.sha256(report_identifier.encode())
-    hex_identifier = hasher.hexdigest()
-    binary_digest = hasher.digest()
+class EmailDedupeStore:
+    """Memória de e-mails enviados recentemente (chave -> expiração), sem I/O de arquivo.
 
-    lock_filename = f"lock_{hex_identifier}.tmp"
-    lock_file_path = os.path.join(lock_dir, lock_filename)
-    
-    try:
-        with open(lock_file_path, 'wb') as f:
-            f.write(binary_digest)
-        logging.info(f"Lock file created/updated: {lock_file_path}")
-    except Exception as e:
-        logging.error(f"Failed to create lock file: {e}")
+    Limitada a `max_entries` (descarta as chaves mais antigas) e, opcionalmente, espelhada na
+    tabela email_dedupe do banco principal para que um reinício não reenvie o mesmo relatório.
+    """
+    def __init__(self, ttl_seconds=EMAIL_LOCK_DURATION_MINUTES * 60, max_entries=EMAIL_DEDUPE_MAX_ENTRIES,
+                 persist=EMAIL_DEDUPE_PERSIST):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries = OrderedDict()  # {chave: expira_em (epoch)}, ordem de inserção/renovação
+        self._lock = threading.Lock()
+        self._loaded = not persist
 
-def should_send_email(plcs_list_for_report, lock_dir):
-    """Verifica se um e-mail idêntico foi enviado recentemente."""
-    current_report_identifier = ";".join(
-        sorted([f"{p.plc_name}:{p.main_value}:{p.size}" for p in plcs_list_for_report]))
-    
-    current_hasher = hashlib.sha256(current_report_identifier.encode())
-    hex_identifier = current_hasher.hexdigest()
-    current_binary_digest = current_hasher.digest()
+    def _load(self):
+        from src.database_handler import DatabaseHandler
+        try:
+            for key, expires_at in DatabaseHandler.load_email_dedupe(time.time()):
+                self._entries[key] = expires_at
+        except Exception as e:
+            logging.error(f"Falha ao carregar dedupe de e-mails do banco: {e}")
+        self._loaded = True
 
-    lock_file_path = os.path.join(lock_dir, f"lock_{hex_identifier}.tmp")
+    def is_active(self, key):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False
+            return True
 
-    if not os.path.exists(lock_file_path):
-        return True
+    def mark(self, key):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._entries.pop(key, None)
+            self._entries[key] = expires_at
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.persist:
+            from src.database_handler import DatabaseHandler
+            try:
+                DatabaseHandler.save_email_dedupe(key, expires_at)
+            except Exception as e:
+                logging.error(f"Falha ao persistir dedupe de e-mail: {e}")
 
-    file_mod_time = datetime.fromtimestamp(os.path.getmtime(lock_file_path))
-    is_lock_active = (datetime.now() - file_mod_time) < timedelta(minutes=EMAIL_LOCK_DURATION_MINUTES)
+email_dedupe = EmailDedupeStore()
 
-    if is_lock_active:
-        return False
-    
-    try:
-        with open(lock_file_path, 'rb') as f:
-            stored_digest = f.read()
+def _report_key(plcs_list_for_report):
+    report_identifier = ";".join(
+        sorted([f"{p.plc_name}:{p.main_value}:{p.size}" for p in plcs_list_for_report]))
+    return hashlib.sha256(report_identifier.encode()).hexdigest()
 
-        if current_binary_digest == stored_digest:
-            create_email_lock(plcs_list_for_report, lock_dir) # Refresh lock
-            return False
-        return True
-    except Exception:
-        return True
+def create_email_lock(plcs_list_for_report, lock_dir=None):
+    """Marca o relatório como enviado (evita e-mails repetidos por EMAIL_LOCK_DURATION_MINUTES).
+
+    `lock_dir` é mantido apenas por compatibilidade; não há mais arquivos de trava.
+    """
+    email_dedupe.mark(_report_key(plcs_list_for_report))
+
+def should_send_email(plcs_list_for_report, lock_dir=None):
+    """Verifica se um e-mail idêntico foi enviado recentemente."""
+    return not email_dedupe.is_active(_report_key(plcs_list_for_report))
+
+def cleanup_legacy_email_locks(lock_dir):
+    """Remove os arquivos lock_<sha>.tmp deixados pela versão antiga do dedupe."""
+    if not lock_dir or not os.path.isdir(lock_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(lock_dir):
+        if name.startswith("lock_") and name.endswith(".tmp"):
+            try:
+                os.remove(os.path.join(lock_dir, name))
+                removed += 1
+            except OSError as e:
+                logging.warning(f"Não foi possível remover trava antiga {name}: {e}")
+    if removed:
+        logging.info(f"{removed} arquivos de trava de e-mail antigos removidos de {lock_dir}.")
+    return removed
 
 def get_current_shift():
     """Retorna o turno atual baseado nas regras: Dia (06-18), Noite (18-06)."""
@@ -65,3 +106,7 @@ def get_current_shift():
         return "DIA (06-18)"
     else:
         return "NOITE (18-06)"
+
+def get_production_date(dt):
+    """Data industrial de produção: o dia começa às 06:00:30 (buffer de 30s da virada)."""
+    return (dt - timedelta(hours=6, seconds=30)).date()
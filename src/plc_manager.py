@@ -6,6 +6,13 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from timezone_utils import get_current_sao_paulo_time
 from src.models import PLCReportData
+from src.metrics import PLC_CYCLE_SECONDS, PLC_LOOP_DRIFT_SECONDS
+
+# Campos que definem uma mudança real de valores (update_time muda a cada ciclo)
+_DELTA_FIELDS = ('feed_value', 'size', 'main_value', 'total_cups', 'status', 'bobina_consumida', 'count_discharge_total')
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 100))
+# Idade máxima do snapshot de /api/lotes: limita o quanto 'ultima_atualizacao' pode atrasar sem mudanças
+LOTES_SNAPSHOT_MAX_AGE = float(os.getenv("LOTES_SNAPSHOT_MAX_AGE", 30))
 
 class SharedPLCData:
     def __init__(self):
@@ -13,10 +20,30 @@ class SharedPLCData:
         self.lock = threading.Lock()
         self.last_email_time = None
         self.email_cooldown_seconds = int(os.getenv("EMAIL_COOLDOWN_SECONDS", 60))
+        self._subscribers = {}  # {asyncio.Queue: event loop do assinante}
+        self._version = 0  # Incrementado a cada mudança real de dados ou de lote
+        self._snapshot = None  # (versão, chave, etag, bytes JSON, carimbo monotônico)
+        self._snapshot_seq = 0
+        self._boot_id = format(int(time.time()), 'x')  # Evita colisão de ETag entre reinícios
 
     def update_plc_data(self, plc_name: str, data: PLCReportData):
         with self.lock:
+            previous = self._plcs_data.get(plc_name)
             self._plcs_data[plc_name] = data
+        if previous is None or any(getattr(previous, f) != getattr(data, f) for f in _DELTA_FIELDS):
+            self.invalidate_snapshot()
+            delta = {f: getattr(data, f) for f in _DELTA_FIELDS}
+            delta['update_time'] = data.update_time
+            self.publish('plc', {'plc': plc_name, 'data': delta})
+
+    def notify_lote_change(self, plc_name: str, lote: str, tipo_bobina: str = None):
+        """Sinaliza aos painéis que um novo lote foi enviado para a máquina."""
+        self.invalidate_snapshot()
+        self.publish('lote', {'plc': plc_name, 'lote': lote, 'tipo_bobina': tipo_bobina})
+
+    def notify_production_record(self, plc_name: str):
+        """Sinaliza que um novo registro de produção (turno/bobina) foi gravado."""
+        self.publish('producao', {'plc': plc_name})
 
     def get_all_data(self) -> List[PLCReportData]:
         with self.lock:
@@ -27,27 +54,129 @@ class SharedPLCData:
         with self.lock:
             return self._plcs_data.get(plc_name)
 
+    # --- Snapshot versionado (/api/lotes) ---
+    def invalidate_snapshot(self):
+        """Marca o snapshot como desatualizado (dados da máquina, lote ou cadastro mudaram)."""
+        with self.lock:
+            self._version += 1
+
+    def peek_snapshot(self, key=None):
+        """Retorna (etag, corpo_json) se o snapshot atual ainda vale, sem reconstruir (None caso contrário)."""
+        with self.lock:
+            version = self._version
+            snapshot = self._snapshot
+        if (snapshot and snapshot[0] == version and snapshot[1] == key
+                and time.monotonic() - snapshot[4] < LOTES_SNAPSHOT_MAX_AGE):
+            return snapshot[2], snapshot[3]
+        return None
+
+    def get_snapshot(self, builder, key=None):
+        """Retorna (etag, corpo_json) do snapshot atual.
+
+        `builder()` só é chamado quando a versão mudou, quando `key` mudou (ex.: turno atual)
+        ou quando o snapshot passou de LOTES_SNAPSHOT_MAX_AGE; fora isso, todas as requisições
+        recebem os mesmos bytes já serializados.
+        """
+        cached = self.peek_snapshot(key)
+        if cached:
+            return cached
+
+        with self.lock:
+            version = self._version
+        body = builder()
+        with self.lock:
+            current = self._snapshot
+            # Outra requisição pode ter reconstruído uma versão mais nova enquanto este builder rodava
+            if current and current[0] > version:
+                return current[2], current[3]
+            self._snapshot_seq += 1
+            etag = f'"{self._boot_id}-{self._snapshot_seq}"'
+            self._snapshot = (version, key, etag, body, time.monotonic())
+        return etag, body
+
+    # --- Stream (SSE) ---
+    def subscribe(self):
+        """Registra um assinante; deve ser chamado de dentro do event loop da API."""
+        import asyncio
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        with self.lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self.lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, event_type: str, payload: dict):
+        """Entrega o evento a todos os assinantes (seguro para chamar das threads de monitoramento)."""
+        with self.lock:
+            subscribers = list(self._subscribers.items())
+        event = {'type': event_type, **payload}
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # Loop encerrado: descarta o assinante
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _offer(queue, event):
+        if queue.full():
+            # Cliente lento: descarta o atraso e pede para ele recarregar o estado completo
+            while not queue.empty():
+                queue.get_nowait()
+            event = {'type': 'resync'}
+        queue.put_nowait(event)
+
+ACQUISITION_MODE = os.getenv("ACQUISITION_MODE", "threads").lower()  # threads | async
+ACQUISITION_WORKERS = int(os.getenv("ACQUISITION_WORKERS", 4))
+
 class PLCMonitorManager:
     """Manages the lifecycle of PLC monitoring threads."""
-    def __init__(self, shared_data: SharedPLCData):
+    def __init__(self, shared_data: SharedPLCData, mode: str = ACQUISITION_MODE):
         self.shared_data = shared_data
+        self.mode = mode
         self.threads = {} # Alterado para dicionário {name: thread}
         self.handlers = {} # Armazena os handlers ativos por nome
         self.stop_events = {} # Eventos para parar threads individuais
         self.running = False
         self.email_notifier = None
         self.lock_dir = None
+        self.engine = None # Motor asyncio (apenas no modo 'async')
+        self._handlers_lock = threading.Lock() # Registro do handler x remoção da máquina
 
     def start_monitoring(self, plcs_config: List[dict], email_notifier, lock_dir):
         self.running = True
         self.email_notifier = email_notifier
         self.lock_dir = lock_dir
+
+        if self.mode == "async":
+            from src.acquisition_engine import AsyncAcquisitionEngine
+            self.engine = AsyncAcquisitionEngine(self, max_workers=ACQUISITION_WORKERS)
+            self.engine.start()
         
         for config in plcs_config:
             self.add_machine(config['name'], config['config'])
 
+    def stop_monitoring(self):
+        """Para todas as máquinas (usado no desligamento do servidor)."""
+        self.running = False
+        for plc_name in list(self.stop_events):
+            self.remove_machine(plc_name)
+        if self.engine:
+            self.engine.stop()
+            self.handlers.clear()
+            self.engine = None
+
     def add_machine(self, plc_name: str, config: dict):
         """Inicia o monitoramento de uma nova máquina."""
+        if self.engine:
+            if self.engine.is_running(plc_name):
+                logging.warning(f"Monitoramento já ativo para {plc_name}. Reiniciando...")
+            self.engine.add_machine(plc_name, config)
+            logging.info(f"Monitoramento iniciado dinamicamente para {plc_name} (async)")
+            return
+
         if plc_name in self.threads and self.threads[plc_name].is_alive():
             logging.warning(f"Monitoramento já ativo para {plc_name}. Reiniciando...")
             self.remove_machine(plc_name)
@@ -67,6 +196,15 @@ class PLCMonitorManager:
 
     def remove_machine(self, plc_name: str):
         """Para o monitoramento de uma máquina específica."""
+        if self.engine:
+            self.engine.remove_machine(plc_name)
+            with self._handlers_lock:
+                handler = self.handlers.pop(plc_name, None)
+            if handler:
+                handler.fail_pending_commands()
+            logging.info(f"Monitoramento parado para {plc_name}")
+            return
+
         if plc_name in self.stop_events:
             self.stop_events[plc_name].set()
             # Aguarda a thread encerrar (timeout curto para não travar API)
@@ -75,53 +213,86 @@ class PLCMonitorManager:
             
             self.stop_events.pop(plc_name, None)
             self.threads.pop(plc_name, None)
-            self.handlers.pop(plc_name, None)
+            with self._handlers_lock:
+                handler = self.handlers.pop(plc_name, None)
+            if handler:
+                handler.fail_pending_commands()
             logging.info(f"Monitoramento parado para {plc_name}")
 
     def _monitor_loop(self, config, plc_name, email_notifier, lock_dir, stop_event):
-        from plc_handler import PLCHandler
         handler = None
-        retry_wait = config.get('connection_config', {}).get('retry_delay', 5)
-        
         while not stop_event.is_set():
-            try:
-                if not handler:
-                    handler = PLCHandler(config, plc_name, self.shared_data, email_notifier, lock_dir)
-                    if not handler.attempt_plc_connection():
-                        # Espera respeitando o evento de parada
-                        stop_event.wait(retry_wait)
-                        handler = None
-                        continue
-                    
-                    # Registra o handler para acesso externo
-                    self.handlers[plc_name] = handler
+            handler, wait = self._run_cycle(config, plc_name, handler, email_notifier, lock_dir,
+                                            is_active=lambda: not stop_event.is_set())
+            # Espera respeitando o intervalo e o sinal de parada
+            stop_event.wait(wait)
 
-                handler.process_plc_data()
+        from src.database_handler import DatabaseHandler
+        DatabaseHandler.close_connection()
+        logging.info(f"Loop de monitoramento encerrado para {plc_name}")
+
+    def _run_cycle(self, config, plc_name, handler, email_notifier, lock_dir, is_active=None):
+        """Executa um ciclo de aquisição (bloqueante).
+
+        Compartilhado pelo modo thread-por-PLC e pelo motor assíncrono.
+        `is_active` diz se este loop ainda é o monitoramento vigente da máquina: um ciclo em
+        andamento durante `remove_machine` não pode registrar de volta uma máquina parada.
+        Retorna (handler, segundos_de_espera): read_interval após sucesso, retry_delay em falha.
+        """
+        from plc_handler import PLCHandler
+        retry_wait = config.get('connection_config', {}).get('retry_delay', 5)
+
+        try:
+            if not handler:
+                handler = PLCHandler(config, plc_name, self.shared_data, email_notifier, lock_dir)
+                if not handler.attempt_plc_connection():
+                    return None, retry_wait
                 
-                # Update shared data for API access (Melhorado para refletir o status real)
-                from src.models import PLCReportData
-                report_data = PLCReportData(
-                    plc_name=plc_name.replace("Cupper_", ""),
-                    feed_value=handler.feed_value,
-                    size=handler.size,
-                    main_value=handler.main_value,
-                    total_cups=handler.count_discharge_total,
-                    status=handler.status_maquina if hasattr(handler, 'status_maquina') else 'ATIVO',
-                    bobina_saida=getattr(handler, 'bobina_saida_name', 'N/A'),
-                    bobina_consumida=handler.bobina_saida,
-                    count_discharge_total=handler.count_discharge_total,
-                    update_time=get_current_sao_paulo_time().strftime("%d/%m/%Y %H:%M:%S")
-                )
-                self.shared_data.update_plc_data(plc_name, report_data)
-
-                # Espera respeitando o intervalo e o sinal de parada
-                interval = config.get('connection_config', {}).get('read_interval', 5)
-                stop_event.wait(interval)
-
-            except Exception as e:
-                logging.error(f"[{plc_name}] Erro no loop de monitoramento: {e}")
-                self.handlers.pop(plc_name, None)
-                handler = None
-                stop_event.wait(retry_wait)
+                # Registra o handler para acesso externo (só se a máquina não foi removida nesse meio tempo)
+                with self._handlers_lock:
+                    registered = is_active is None or is_active()
+                    if registered:
+                        self.handlers[plc_name] = handler
+                if not registered:
+                    handler.plc.Close()
+                    return None, 0
 
-        logging.info(f"Loop de monitoramento encerrado para {plc_name}")
+            # Deriva: período real desde o início do ciclo anterior menos o read_interval configurado
+            cycle_started = time.monotonic()
+            if handler.last_cycle_started is not None:
+                drift = cycle_started - handler.last_cycle_started - config.get('connection_config', {}).get('read_interval', 5)
+                PLC_LOOP_DRIFT_SECONDS.observe(max(drift, 0.0), plc_name)
+            handler.last_cycle_started = cycle_started
+
+            with PLC_CYCLE_SECONDS.time(plc_name):
+                handler.process_plc_data()
+            # Escritas pedidas pela API entram entre uma leitura e outra, nunca em paralelo
+            handler.drain_commands()
+            
+            # Update shared data for API access (Melhorado para refletir o status real)
+            from src.models import PLCReportData
+            report_data = PLCReportData(
+                plc_name=plc_name.replace("Cupper_", ""),
+                feed_value=handler.feed_value,
+                size=handler.size,
+                main_value=handler.main_value,
+                total_cups=handler.count_discharge_total,
+                status=handler.status_maquina if hasattr(handler, 'status_maquina') else 'ATIVO',
+                bobina_saida=getattr(handler, 'bobina_saida_name', 'N/A'),
+                bobina_consumida=handler.bobina_saida,
+                count_discharge_total=handler.count_discharge_total,
+                update_time=get_current_sao_paulo_time().strftime("%d/%m/%Y %H:%M:%S")
+            )
+            self.shared_data.update_plc_data(plc_name, report_data)
+
+            return handler, config.get('connection_config', {}).get('read_interval', 5)
+
+        except Exception as e:
+            logging.error(f"[{plc_name}] Erro no loop de monitoramento: {e}")
+            with self._handlers_lock:
+                # Não remove o handler de um monitoramento novo da mesma máquina
+                if self.handlers.get(plc_name) is handler:
+                    self.handlers.pop(plc_name, None)
+            if handler:
+                handler.fail_pending_commands()
+            return None, retry_wait
@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", 10000))   # Chaves (política, cliente) em memória
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", 60))
+
+class RatePolicy:
+    """Até `limit` requisições por `window` segundos, com rajada de até `limit`.
+
+    `bucket` faz a política consumir a cota de outra (mesmo TAT por cliente); None = cota própria.
+    """
+    def __init__(self, limit: int, window: float, bucket: str = None):
+        self.limit = limit
+        self.window = window
+        self.bucket = bucket
+        self.interval = window / limit          # Intervalo de emissão (T)
+        self.tolerance = window - self.interval  # Tolerância de rajada (tau)
+
+class GCRARateLimiter:
+    """Rate limiter GCRA (equivalente a token bucket) com custo O(1) por requisição.
+
+    Cada cliente guarda apenas o "theoretical arrival time" (TAT). As chaves ficam em um LRU
+    limitado a `max_clients`; a varredura periódica remove quem já recuperou toda a cota
+    (estado idêntico a um cliente novo), então a memória não cresce com IPs antigos.
+    """
+    def __init__(self, policies: dict, max_clients=RATE_LIMIT_MAX_CLIENTS, sweep_interval=RATE_LIMIT_SWEEP_INTERVAL):
+        self.policies = policies
+        self.max_clients = max_clients
+        self.sweep_interval = sweep_interval
+        self._tat = OrderedDict()  # {(política, cliente): TAT}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.counters = {name: {"allowed": 0, "blocked": 0} for name in policies}
+        self.evicted = 0
+        self.swept = 0
+
+    def check(self, client_id: str, policy: str):
+        """Retorna (permitido, segundos até a próxima requisição aceita)."""
+        rule = self.policies[policy]
+        key = (rule.bucket or policy, client_id)
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tat = max(self._tat.get(key, now), now)
+            if tat - now > rule.tolerance:
+                self.counters[policy]["blocked"] += 1
+                return False, tat - now - rule.tolerance
+            self._tat[key] = tat + rule.interval
+            self._tat.move_to_end(key)
+            if len(self._tat) > self.max_clients:
+                self._tat.popitem(last=False)
+                self.evicted += 1
+            self.counters[policy]["allowed"] += 1
+            return True, 0.0
+
+    def is_allowed(self, client_id: str, policy: str) -> bool:
+        return self.check(client_id, policy)[0]
+
+    def _sweep(self, now):
+        expired = [key for key, tat in self._tat.items() if tat <= now]
+        for key in expired:
+            del self._tat[key]
+        self.swept += len(expired)
+        self._next_sweep = now + self.sweep_interval
+
+    def stats(self):
+        """Contadores por política (permitidas/bloqueadas) e ocupação do LRU."""
+        with self._lock:
+            return {
+                "tracked_clients": len(self._tat),
+                "max_clients": self.max_clients,
+                "evicted": self.evicted,
+                "swept": self.swept,
+                "policies": {
+                    name: {"limit": rule.limit, "window_seconds": rule.window, "bucket": rule.bucket or name,
+                           **self.counters[name]}
+                    for name, rule in self.policies.items()
+                },
+            }
+
+# Políticas por rota: Configuráveis via .env
+DATA_MAX = int(os.getenv("RATE_LIMIT_DATA_MAX", 60))
+DATA_WINDOW = int(os.getenv("RATE_LIMIT_DATA_WINDOW", 10))
+CMD_MAX = int(os.getenv("RATE_LIMIT_COMMAND_MAX", 5))
+CMD_WINDOW = int(os.getenv("RATE_LIMIT_COMMAND_WINDOW", 60))
+
+def _read_policy(name):
+    """Política de leitura de uma rota. Sem RATE_LIMIT_<NOME>_MAX no .env, divide a cota "data"
+    (mesmo orçamento total de leitura por cliente); com ela, passa a ter cota própria."""
+    limit = os.getenv(f"RATE_LIMIT_{name}_MAX")
+    if limit is None:
+        return RatePolicy(DATA_MAX, DATA_WINDOW, bucket="data")
+    return RatePolicy(int(limit), int(os.getenv(f"RATE_LIMIT_{name}_WINDOW", DATA_WINDOW)))
+
+rate_limiter = GCRARateLimiter({
+    "data": RatePolicy(DATA_MAX, DATA_WINDOW),                  # /api/lotes e leituras do painel
+    "command": RatePolicy(CMD_MAX, CMD_WINDOW),                 # /enviar_lote
+    "erp": _read_policy("ERP"),                                 # /api/datasul/producao
+    "identity": _read_policy("IDENTITY"),                       # /api/client_info (resolução de hostname)
+})